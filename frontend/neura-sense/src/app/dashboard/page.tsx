@@ -5,7 +5,15 @@ import { useEffect, useMemo, useState } from "react";
 import { useRouter } from "next/navigation";
 import { auth, db } from "@/lib/firebase";
 import { onAuthStateChanged, User } from "firebase/auth";
-import { doc, getDoc } from "firebase/firestore";
+import {
+  collection,
+  doc,
+  getDoc,
+  getDocs,
+  limit,
+  orderBy,
+  query,
+} from "firebase/firestore";
 
 import Header from "./components/Header";
 import TopStats from "./components/TopStats";
@@ -173,7 +181,18 @@ export default function DashboardPage() {
     const data = snap.data();
     setProfile(data);
 
-    const recent = (data?.recent_text_insights as TextLevelItem[]) ?? [];
+    // Per-text insights live in users/{uid}/insights (newest first);
+    // older documents still carry them inline.
+    const insightsSnap = await getDocs(
+      query(
+        collection(db, "users", uid, "insights"),
+        orderBy("timestamp", "desc"),
+        limit(500)
+      )
+    );
+    const recent = insightsSnap.empty
+      ? (data?.recent_text_insights as TextLevelItem[]) ?? []
+      : insightsSnap.docs.map((d) => d.data() as TextLevelItem);
     const mental_preds = (data?.mental_health_preds as number[]) ?? [];
     const sentiment_preds = (data?.sentiment_preds as number[]) ?? [];
 
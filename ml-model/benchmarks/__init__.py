@@ -0,0 +1,18 @@
+"""
+Micro-benchmarks for the preprocessing, tokenization and inference hot paths.
+
+Run from ml-model/:
+
+    python -m benchmarks.run                 # full suite, results → benchmarks/results/
+    python -m benchmarks.run --quick         # smaller corpora / fewer repeats
+    python -m benchmarks.run --only mh.      # name-prefix filter
+    python -m benchmarks.run --save-baseline # store this run as benchmarks/baseline.json
+    python -m benchmarks.baseline            # baseline.json from the pre-optimization tree
+
+Runs compare against benchmarks/baseline.json. The committed one was
+recorded by `benchmarks.baseline` on the repo's first commit; timings are
+machine-specific, so regenerate it before comparing on another machine.
+
+Everything runs offline: corpora are synthetic and the transformer is a small
+randomly initialized BERT (pass --model-dir to time a real checkpoint).
+"""
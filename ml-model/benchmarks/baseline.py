@@ -0,0 +1,72 @@
+# benchmarks/baseline.py
+# -------------------------------------------------------------
+# 📌 Record benchmarks/baseline.json from an older tree
+# -------------------------------------------------------------
+"""
+Runs the current benchmark suite against another revision and saves the
+result as the baseline that `python -m benchmarks.run` compares with:
+
+    python -m benchmarks.baseline                 # the repo's first commit (pre-optimization)
+    python -m benchmarks.baseline --rev v1.2 --quick
+
+The revision is checked out into a temporary git worktree, this benchmarks
+package is copied into it (older trees don't have one, or have an older one)
+and the suite runs there with --save-baseline. Benchmarks the old code can't
+run (missing functions, no process pool) are recorded as skipped/error and
+left out of comparisons. Timings are machine-specific: regenerate the
+baseline on the machine you compare on.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.run import BENCH_DIR, DEFAULT_BASELINE
+
+ML_MODEL_DIR = os.path.dirname(BENCH_DIR)
+
+
+def _git(*args, cwd=ML_MODEL_DIR) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def first_commit() -> str:
+    return _git("rev-list", "--max-parents=0", "HEAD").splitlines()[-1]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Record the benchmark baseline from another revision")
+    parser.add_argument("--rev", help="revision to benchmark (default: the repo's first commit)")
+    parser.add_argument("--output", default=DEFAULT_BASELINE, help="baseline JSON to write")
+    parser.add_argument("--quick", action="store_true", help="smaller corpora and fewer repeats")
+    parser.add_argument("--model-dir", help="benchmark a real transformer checkpoint instead of the tiny BERT")
+    args = parser.parse_args(argv)
+
+    rev = args.rev or first_commit()
+    top = _git("rev-parse", "--show-toplevel")
+    subdir = os.path.relpath(ML_MODEL_DIR, top)
+    worktree = tempfile.mkdtemp(prefix="mh-baseline-")
+    _git("worktree", "add", "--detach", worktree, rev)
+    try:
+        old_ml_model = os.path.join(worktree, subdir)
+        target = os.path.join(old_ml_model, "benchmarks")
+        shutil.rmtree(target, ignore_errors=True)
+        shutil.copytree(BENCH_DIR, target, ignore=shutil.ignore_patterns("results", "baseline.json", "__pycache__"))
+
+        cmd = [sys.executable, "-m", "benchmarks.run", "--save-baseline", "--baseline", os.path.abspath(args.output),
+               "--output", os.path.join(worktree, "baseline-run.json")]
+        if args.quick:
+            cmd.append("--quick")
+        if args.model_dir:
+            cmd += ["--model-dir", os.path.abspath(args.model_dir)]
+        print(f"📌 Benchmarking {rev} in {worktree}")
+        return subprocess.run(cmd, cwd=old_ml_model).returncode
+    finally:
+        _git("worktree", "remove", "--force", worktree)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
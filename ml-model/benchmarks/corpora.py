@@ -0,0 +1,119 @@
+# benchmarks/corpora.py
+# -------------------------------------------------------------
+# 🧪 Synthetic corpora with realistic length distributions
+# -------------------------------------------------------------
+"""
+Deterministic (seeded) generators shaped like what the extraction engine
+returns for each source:
+
+  * tweets   — short, ≤ 280 chars, mentions / hashtags / links / emoji
+  * reddit   — "title body" posts, long-tailed length (a few hundred words max)
+  * spotify  — "Listened to <track> by <artist>" lines
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import List
+
+WORDS = (
+    "i me my feel feeling felt tired anxious anxiety sad happy lonely alone okay fine "
+    "today tomorrow tonight week weekend work job school class exam friends family mom dad "
+    "sleep sleeping slept awake night morning bed cant can't don't won't really very so "
+    "just still again always never sometimes everything nothing something someone nobody "
+    "think thinking thought mind head heart chest breathe breathing panic attack attacks "
+    "stress stressed overwhelmed exhausted empty numb hopeless worthless better worse good bad "
+    "great best worst love hate miss missing lost losing trying try tried help helping "
+    "therapy therapist meds medication doctor appointment talk talking told people life "
+    "day days time times year years month months going went go keep kept stop stopped "
+    "eat eating ate food hungry weight body run running walk walked gym music song songs "
+    "listen listening playlist concert movie watch watched game games phone call texted "
+    "and the a an to of in on for with at from about but or because if when while after "
+    "before since until though although that this these those it its is was were be been "
+    "have has had do does did will would could should might must up down out over under "
+    "crash cycle racing nightmares accident road avoiding flashbacks manic energy spending "
+    "motivation focus focused positive grateful proud calm peaceful excited hopeful"
+).split()
+
+EMOJI = ["😊", "😔", "😭", "🙏", "💔", "🔥", "✨", "😴", "🥲", "❤️"]
+
+TRACKS = [
+    "Someone Like You", "Blinding Lights", "Fix You", "Mr. Brightside", "Lovely", "Creep",
+    "Heat Waves", "Breathe Me", "Hurt", "Here Comes The Sun", "Liability", "Motion Sickness",
+    "Skinny Love", "Lose Yourself", "The Night We Met", "Everybody Hurts", "Runaway",
+]
+ARTISTS = [
+    "Adele", "The Weeknd", "Coldplay", "The Killers", "Billie Eilish", "Radiohead",
+    "Glass Animals", "Sia", "Johnny Cash", "The Beatles", "Lorde", "Phoebe Bridgers",
+    "Bon Iver", "Eminem", "Lord Huron", "R.E.M.", "Kanye West",
+]
+
+
+def _sentence(rng: random.Random, n_words: int) -> str:
+    words = [rng.choice(WORDS) for _ in range(max(n_words, 1))]
+    words[0] = words[0].capitalize()
+    return " ".join(words) + rng.choice([".", ".", ".", "!", "?", "..."])
+
+
+def _paragraph(rng: random.Random, n_words: int) -> str:
+    parts, left = [], n_words
+    while left > 0:
+        n = min(left, max(3, int(rng.gauss(14, 6))))
+        parts.append(_sentence(rng, n))
+        left -= n
+    return " ".join(parts)
+
+
+def tweets(n: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        # median ~18 words, long tail capped by the 280-char limit
+        text = _paragraph(rng, max(2, int(rng.lognormvariate(2.9, 0.6))))
+        if rng.random() < 0.3:
+            text = f"@{rng.choice(WORDS)}_{rng.randint(1, 999)} " + text
+        if rng.random() < 0.25:
+            text += f" #{rng.choice(WORDS)}"
+        if rng.random() < 0.15:
+            text += f" https://t.co/{rng.randint(10**9, 10**10):x}"
+        if rng.random() < 0.3:
+            text += " " + rng.choice(EMOJI)
+        out.append(text[:280])
+    return out
+
+
+def reddit_posts(n: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        title = _sentence(rng, rng.randint(4, 14))
+        # median ~90 words, occasional 500+ word posts
+        body = _paragraph(rng, min(int(rng.lognormvariate(4.5, 0.8)), 900))
+        if rng.random() < 0.1:
+            body += f" www.reddit.com/r/{rng.choice(WORDS)}"
+        out.append(f"{title} {body}")
+    return out
+
+
+def spotify_lines(n: int, seed: int = 2) -> List[str]:
+    rng = random.Random(seed)
+    return [f"Listened to {rng.choice(TRACKS)} by {rng.choice(ARTISTS)}" for _ in range(n)]
+
+
+def mixed(n: int, seed: int = 3) -> List[str]:
+    """Source mix of a typical user pull: mostly tweets + tracks, fewer long posts."""
+    rng = random.Random(seed)
+    n_reddit = n // 5
+    n_spotify = n * 2 // 5
+    texts = tweets(n - n_reddit - n_spotify, seed) + reddit_posts(n_reddit, seed + 1) + spotify_lines(n_spotify, seed + 2)
+    rng.shuffle(texts)
+    return texts
+
+
+def dated_predictions(n: int, days: int = 90, seed: int = 4):
+    """(dates, mh_preds, sent_preds) as consumed by analysis_plot."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    dates = [start + timedelta(seconds=rng.randint(0, days * 86400)) for _ in range(n)]
+    mh = [rng.choice([0, 1, 2, 3, 4, None]) for _ in range(n)]
+    sent = [rng.choice([0.0, 1.0, None]) for _ in range(n)]
+    return dates, mh, sent
@@ -0,0 +1,82 @@
+# benchmarks/fixtures.py
+# -------------------------------------------------------------
+# 🧪 Offline model fixtures for the benchmark suite
+# -------------------------------------------------------------
+"""
+Builds a MetaModelPredictor over throwaway artifacts:
+
+  * a small randomly initialized BERT classifier (same tokenizer vocab as the
+    production model, so token lengths are realistic)
+  * a TF-IDF + LogisticRegression sentiment model fitted on synthetic text
+
+Weights are random, so only speed is meaningful, not predictions.
+"""
+
+import inspect
+import os
+import pickle
+import random
+import tempfile
+
+from benchmarks import corpora
+
+ML_MODEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VOCAB_PATH = os.path.join(ML_MODEL_DIR, "models", "fine_tuned_mentalbert", "vocab.txt")
+
+TINY_BERT = dict(hidden_size=128, num_hidden_layers=2, num_attention_heads=2, intermediate_size=256)
+NUM_LABELS = 5
+
+
+def _write_tiny_bert(model_dir: str, seed: int = 0):
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    tokenizer = BertTokenizerFast(VOCAB_PATH)
+    torch.manual_seed(seed)
+    model = BertForSequenceClassification(
+        BertConfig(vocab_size=tokenizer.vocab_size, num_labels=NUM_LABELS, **TINY_BERT)
+    ).eval()
+    tokenizer.save_pretrained(model_dir)
+    model.save_pretrained(model_dir)
+
+
+def _write_sentiment(model_path: str, vec_path: str, seed: int = 0):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    texts = corpora.mixed(2000, seed=seed)
+    rng = random.Random(seed)
+    labels = [rng.choice([0, 1]) for _ in texts]
+    vec = TfidfVectorizer(max_features=20000, ngram_range=(1, 2))
+    model = LogisticRegression(max_iter=200).fit(vec.fit_transform(texts), labels)
+    with open(model_path, "wb") as f:
+        pickle.dump(model, f)
+    with open(vec_path, "wb") as f:
+        pickle.dump(vec, f)
+
+
+def build_predictor(model_dir: str = None, workdir: str = None, **overrides):
+    """
+    MetaModelPredictor with cache and scheduler off, so every call hits the
+    model. model_dir: real transformer checkpoint instead of the tiny BERT.
+    Overrides the predictor doesn't accept are ignored.
+    """
+    from components.train_test_data import MetaModelPredictor
+
+    workdir = workdir or tempfile.mkdtemp(prefix="mh-bench-")
+    if model_dir is None:
+        model_dir = os.path.join(workdir, "tiny-bert")
+        if not os.path.exists(os.path.join(model_dir, "config.json")):
+            _write_tiny_bert(model_dir)
+
+    sent_model_path = os.path.join(workdir, "sentiment.pkl")
+    sent_vec_path = os.path.join(workdir, "vectorizer.pkl")
+    if not os.path.exists(sent_model_path):
+        _write_sentiment(sent_model_path, sent_vec_path)
+
+    kwargs = dict(device="cpu", cache_size=0, cache_path=None, scheduler=False)
+    kwargs.update(overrides)
+    # older trees (benchmarks.baseline) have fewer knobs; drop the ones they lack
+    accepted = inspect.signature(MetaModelPredictor).parameters
+    kwargs = {k: v for k, v in kwargs.items() if k in accepted}
+    return MetaModelPredictor(model_dir, sent_model_path, sent_vec_path, **kwargs)
@@ -0,0 +1,128 @@
+# benchmarks/harness.py
+# -------------------------------------------------------------
+# ⏱️ Timing, memory and baseline comparison
+# -------------------------------------------------------------
+import gc
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, List, Optional
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def _max_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def measure(
+    fn: Callable,
+    items: int,
+    repeats: int = 5,
+    warmup: int = 1,
+    per_item: Optional[list] = None,
+) -> dict:
+    """
+    Time `fn()` (one op over `items` inputs) `repeats` times.
+
+    per_item: if given, `fn` is called once per element instead and latency
+    percentiles are per element; throughput still counts every element.
+    Peak memory is the tracemalloc peak (Python allocations) of one extra run,
+    plus the process max-RSS high-water mark after the benchmark.
+    """
+    def run_once() -> List[float]:
+        if per_item is None:
+            start = time.perf_counter()
+            fn()
+            return [time.perf_counter() - start]
+        lat = []
+        for x in per_item:
+            start = time.perf_counter()
+            fn(x)
+            lat.append(time.perf_counter() - start)
+        return lat
+
+    for _ in range(warmup):
+        run_once()
+
+    gc.collect()
+    op_seconds, latencies = [], []
+    for _ in range(repeats):
+        lat = run_once()
+        latencies.extend(lat)
+        op_seconds.append(sum(lat))
+
+    gc.collect()
+    tracemalloc.start()
+    run_once()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    median_op = statistics.median(op_seconds)
+    return {
+        "items": items,
+        "repeats": repeats,
+        "throughput_per_s": round(items / median_op, 3) if median_op > 0 else None,
+        "latency_unit": "item" if per_item is not None else "op",
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 0.50) * 1000, 4),
+            "p95": round(_percentile(latencies, 0.95) * 1000, 4),
+            "p99": round(_percentile(latencies, 0.99) * 1000, 4),
+            "mean": round(statistics.fmean(latencies) * 1000, 4),
+        },
+        "peak_python_mb": round(peak / (1024 * 1024), 3),
+        "max_rss_mb": round(_max_rss_mb(), 1),
+    }
+
+
+# -------------------------------------------------------------
+# Baseline comparison
+# -------------------------------------------------------------
+def compare(current: dict, baseline: dict, tolerance: float = 0.2) -> List[dict]:
+    """
+    Compare result dicts ({name: measurement}). A benchmark regresses when
+    throughput drops, p95 latency grows, or Python peak memory grows by more
+    than `tolerance` (fraction). Returns one row per benchmark present in both.
+    """
+    rows = []
+    for name, cur in current.items():
+        base = baseline.get(name)
+        if not base or "error" in cur or "error" in base or "skipped" in cur or "skipped" in base:
+            continue
+
+        flags = []
+        tp_ratio = None
+        if cur.get("throughput_per_s") and base.get("throughput_per_s"):
+            tp_ratio = cur["throughput_per_s"] / base["throughput_per_s"]
+            if tp_ratio < 1 - tolerance:
+                flags.append("throughput")
+
+        p95_ratio = None
+        if base["latency_ms"]["p95"] > 0:
+            p95_ratio = cur["latency_ms"]["p95"] / base["latency_ms"]["p95"]
+            if p95_ratio > 1 + tolerance:
+                flags.append("p95")
+
+        # small absolute slack so noise on tiny allocations isn't flagged
+        if cur["peak_python_mb"] > base["peak_python_mb"] * (1 + tolerance) + 1.0:
+            flags.append("memory")
+
+        rows.append({
+            "name": name,
+            "throughput_ratio": round(tp_ratio, 3) if tp_ratio is not None else None,
+            "p95_ratio": round(p95_ratio, 3) if p95_ratio is not None else None,
+            "peak_python_mb": (base["peak_python_mb"], cur["peak_python_mb"]),
+            "regressions": flags,
+        })
+    return rows
@@ -0,0 +1,260 @@
+# benchmarks/run.py
+# -------------------------------------------------------------
+# 🏁 Benchmark runner: python -m benchmarks.run [--quick] [--only PREFIX]
+# -------------------------------------------------------------
+import argparse
+import inspect
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from benchmarks import corpora, fixtures
+from benchmarks.harness import compare, measure
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+class Skip(Exception):
+    """Benchmark can't run in this environment (e.g. NLTK corpora missing)."""
+
+
+class Context:
+    def __init__(self, quick: bool, model_dir: str = None):
+        self.quick = quick
+        self.model_dir = model_dir
+        self.n_items = 120 if quick else 500
+        self.n_batch = 500 if quick else 2000
+        self.n_model = 128 if quick else 512
+        self.repeats = 3 if quick else 5
+        self._predictor = None
+        self._nltk = None
+
+    @property
+    def predictor(self):
+        if self._predictor is None:
+            self._predictor = fixtures.build_predictor(model_dir=self.model_dir)
+        return self._predictor
+
+    def require_nltk(self):
+        if self._nltk is None:
+            from components.pipeline import data_preprocessing
+            try:
+                if hasattr(data_preprocessing, "ensure_nltk_resources"):
+                    data_preprocessing.ensure_nltk_resources()
+                else:
+                    # older trees (benchmarks.baseline) load the corpora on first use
+                    data_preprocessing.advanced_clean("warm up the tagger")
+                self._nltk = True
+            except LookupError as e:
+                self._nltk = str(e)
+        if self._nltk is not True:
+            raise Skip(self._nltk)
+
+
+# -------------------------------------------------------------
+# Benchmarks — each returns measure() kwargs
+# -------------------------------------------------------------
+CORPORA = {
+    "tweets": corpora.tweets,
+    "reddit": corpora.reddit_posts,
+    "spotify": corpora.spotify_lines,
+}
+
+
+def bench_advanced_clean(source):
+    def build(ctx):
+        ctx.require_nltk()
+        from components.pipeline.data_preprocessing import advanced_clean
+        texts = CORPORA[source](ctx.n_items)
+        return dict(fn=advanced_clean, items=len(texts), per_item=texts)
+    return build
+
+
+def bench_clean_batch_v2(workers):
+    def build(ctx):
+        ctx.require_nltk()
+        from components.pipeline import config
+        from components.pipeline.data_preprocessing import clean_text_batch_v2
+        texts = corpora.mixed(ctx.n_batch)
+        if "workers" not in inspect.signature(clean_text_batch_v2).parameters:
+            # tree without the process pool (benchmarks.baseline): serial only
+            if workers != 1:
+                raise Skip("clean_text_batch_v2 has no process pool in this tree")
+            return dict(fn=lambda: clean_text_batch_v2(texts), items=len(texts))
+        n = workers if workers is not None else max(config.PREPROCESS_WORKERS, 2)
+        # warm-up run also spawns the pool, so its start-up cost is excluded
+        return dict(fn=lambda: clean_text_batch_v2(texts, workers=n), items=len(texts))
+    return build
+
+
+def bench_tokenize(ctx):
+    p = ctx.predictor
+    texts = corpora.mixed(ctx.n_batch)
+    max_length = getattr(p, "max_length", 256)
+    return dict(fn=lambda: p.tokenizer(texts, truncation=True, max_length=max_length), items=len(texts))
+
+
+def bench_mental_health(source):
+    def build(ctx):
+        p = ctx.predictor
+        texts = corpora.mixed(ctx.n_model) if source == "mixed" else CORPORA[source](ctx.n_model)
+        return dict(fn=lambda: p._predict_mental_health(texts), items=len(texts))
+    return build
+
+
+def bench_sentiment(ctx):
+    p = ctx.predictor
+    texts = corpora.mixed(ctx.n_batch)
+    return dict(fn=lambda: p._predict_sentiment(texts), items=len(texts))
+
+
+def bench_date_grouped(ctx):
+    from components.analysis_plot import prepare_date_grouped_analysis
+    n = 5000 if ctx.quick else 20000
+    dates, mh, sent = corpora.dated_predictions(n)
+    return dict(fn=lambda: prepare_date_grouped_analysis(dates, mh, sent), items=n)
+
+
+def bench_most_probable(ctx):
+    from components.analysis_plot import calculate_most_probable_illness
+    n = 5000 if ctx.quick else 20000
+    _, mh, _ = corpora.dated_predictions(n)
+    return dict(fn=lambda: calculate_most_probable_illness(mh, normal_label=3, threshold=0.4), items=n)
+
+
+def bench_daily_aggregator(ctx):
+    """Merge one run's worth of new items into stored per-day aggregates."""
+    try:
+        from components.analysis_plot import DailyAggregator
+    except ImportError:
+        raise Skip("no DailyAggregator in this tree")
+    history = DailyAggregator().add(*corpora.dated_predictions(5000 if ctx.quick else 20000)).to_dict()
+    dates, mh, sent = corpora.dated_predictions(200, seed=5)
+    return dict(fn=lambda: DailyAggregator(history).add(dates, mh, sent).date_grouped(), items=len(dates))
+
+
+BENCHMARKS = {
+    "clean.advanced_clean.tweets": bench_advanced_clean("tweets"),
+    "clean.advanced_clean.reddit": bench_advanced_clean("reddit"),
+    "clean.advanced_clean.spotify": bench_advanced_clean("spotify"),
+    "clean.clean_text_batch_v2.serial": bench_clean_batch_v2(1),
+    "clean.clean_text_batch_v2.pool": bench_clean_batch_v2(None),
+    "tokenize.mixed": bench_tokenize,
+    "mh.predict_mental_health.tweets": bench_mental_health("tweets"),
+    "mh.predict_mental_health.reddit": bench_mental_health("reddit"),
+    "mh.predict_mental_health.spotify": bench_mental_health("spotify"),
+    "mh.predict_mental_health.mixed": bench_mental_health("mixed"),
+    "sentiment.predict_sentiment.mixed": bench_sentiment,
+    "plot.prepare_date_grouped_analysis": bench_date_grouped,
+    "plot.calculate_most_probable_illness": bench_most_probable,
+    "plot.daily_aggregator_merge": bench_daily_aggregator,
+}
+
+
+# -------------------------------------------------------------
+# Runner
+# -------------------------------------------------------------
+def _git_rev() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _meta(ctx: Context) -> dict:
+    import torch
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_rev": _git_rev(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+        "quick": ctx.quick,
+        "model": ctx.model_dir or f"tiny-bert {fixtures.TINY_BERT}",
+    }
+
+
+def run(names, ctx: Context) -> dict:
+    results = {}
+    for name in names:
+        print(f"▶ {name} ...", end=" ", flush=True)
+        try:
+            spec = BENCHMARKS[name](ctx)
+            results[name] = measure(repeats=ctx.repeats, **spec)
+            r = results[name]
+            print(f"{r['throughput_per_s']}/s  p50 {r['latency_ms']['p50']}ms  p95 {r['latency_ms']['p95']}ms "
+                  f"({r['latency_unit']})  peak {r['peak_python_mb']}MB")
+        except Skip as e:
+            results[name] = {"skipped": str(e)}
+            print(f"skipped ({e})")
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+            print(f"error ({type(e).__name__}: {e})")
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Hot-path micro-benchmarks")
+    parser.add_argument("--quick", action="store_true", help="smaller corpora and fewer repeats")
+    parser.add_argument("--only", action="append", default=[], help="run benchmarks whose name starts with this")
+    parser.add_argument("--model-dir", help="benchmark a real transformer checkpoint instead of the tiny BERT")
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run to --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown before flagging")
+    parser.add_argument("--list", action="store_true", help="list benchmark names and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    names = [n for n in BENCHMARKS if not args.only or any(n.startswith(p) for p in args.only)]
+    ctx = Context(args.quick, args.model_dir)
+    report = {"meta": _meta(ctx), "results": run(names, ctx)}
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Results saved to {output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("ℹ️ No baseline found; run with --save-baseline to create one.")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("meta", {}).get("quick") != ctx.quick:
+        print("⚠ Baseline was recorded with a different --quick setting; ratios are not comparable.")
+
+    rows = compare(report["results"], baseline.get("results", {}), args.tolerance)
+    regressed = [r for r in rows if r["regressions"]]
+    print(f"\n📊 vs baseline {baseline.get('meta', {}).get('git_rev')} (tolerance {args.tolerance:.0%})")
+    for r in rows:
+        mark = "❌" if r["regressions"] else "✅"
+        print(f"{mark} {r['name']:<40} throughput x{r['throughput_ratio']}  p95 x{r['p95_ratio']}  "
+              f"peak {r['peak_python_mb'][0]}→{r['peak_python_mb'][1]}MB  {', '.join(r['regressions'])}")
+    if regressed:
+        print(f"\n❌ {len(regressed)} benchmark(s) regressed.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,41 +16,83 @@ def prepare_text_level_analysis(texts: List[str], mh_preds: List[Optional[int]],
         for text, mh, sent in zip(texts, mh_preds, sent_preds)
     ]
 
+def _int_array(values) -> np.ndarray:
+    try:
+        return np.array(values, dtype=np.int64)
+    except TypeError:
+        # contains None
+        return np.fromiter((-1 if v is None else v for v in values), dtype=np.int64, count=len(values))
+
+
+def _float_array(values) -> np.ndarray:
+    # None → NaN with dtype=float64
+    return np.array(values, dtype=np.float64)
+
+
+def _as_arrays(dates: List[datetime], mh_preds: List[Optional[int]], sent_preds: List[Optional[float]]):
+    """
+    Integer day buckets + label/sentiment arrays (None → -1 / NaN). Like the
+    zip() it replaces, labels and sentiments only cover the shortest input;
+    every date still gets a bucket.
+    """
+    days = np.array(dates, dtype='datetime64[D]').astype(np.int64) if len(dates) else np.zeros(0, dtype=np.int64)
+    m = min(len(dates), len(mh_preds), len(sent_preds))
+    mh = _int_array(mh_preds[:m])
+    sent = _float_array(sent_preds[:m])
+    return days, mh, sent
+
+
+def _day_label(day: int) -> str:
+    return str(np.datetime64(int(day), 'D'))
+
+
+def _mode_per_key(keys: np.ndarray, labels: np.ndarray):
+    """
+    Per key: the most frequent label, ties going to the smallest label id
+    (the rule DailyAggregator uses too). Returns {key: (label, count)}.
+    """
+    if not len(keys):
+        return {}
+    width = int(labels.max()) + 1
+    combined, counts = np.unique(keys * width + labels, return_counts=True)
+    pair_keys, pair_labels = combined // width, combined % width
+    # per key: highest count first, then smallest label
+    order = np.lexsort((pair_labels, -counts, pair_keys))
+    pair_keys, pair_labels, counts = pair_keys[order], pair_labels[order], counts[order]
+    head = np.ones(len(order), dtype=bool)
+    head[1:] = pair_keys[1:] != pair_keys[:-1]
+    return {int(k): (int(l), int(c)) for k, l, c in zip(pair_keys[head], pair_labels[head], counts[head])}
+
+
 def prepare_date_grouped_analysis(dates: List[datetime], mh_preds: List[Optional[int]], sent_preds: List[Optional[float]]):
     """
     Group predictions by date and return aggregates suitable for plotting time series:
-    - Most common mental health label per date
+    - Most common mental health label per date (ties → smallest label id)
     - Average sentiment score per date
+    Vectorized over integer day buckets.
     """
-    from collections import defaultdict
+    days, mh, sent = _as_arrays(dates, mh_preds, sent_preds)
+    if not len(days):
+        return []
 
-    mh_by_date = defaultdict(list)
-    sent_by_date = defaultdict(list)
+    unique_days, inverse = np.unique(days, return_inverse=True)
 
-    for d, mh, sent in zip(dates, mh_preds, sent_preds):
-        date_str = d.strftime("%Y-%m-%d")
-        if mh is not None:
-            mh_by_date[date_str].append(mh)
-        if sent is not None:
-            sent_by_date[date_str].append(sent)
+    mh_idx = inverse[: len(mh)][mh >= 0]
+    modes = _mode_per_key(mh_idx, mh[mh >= 0])
 
-    date_analysis = []
-    all_dates = sorted(set(d.strftime("%Y-%m-%d") for d in dates))
-    for date_str in all_dates:
-        mh_list = mh_by_date.get(date_str, [])
-        sent_list = sent_by_date.get(date_str, [])
-        if mh_list:
-            # mode mental health label
-            mh_mode, mh_count = Counter(mh_list).most_common(1)[0]
-        else:
-            mh_mode, mh_count = None, 0
-        sent_avg = np.mean(sent_list) if sent_list else None
+    has_sent = ~np.isnan(sent)
+    sent_idx = inverse[: len(sent)][has_sent]
+    sent_sum = np.bincount(sent_idx, weights=sent[has_sent], minlength=len(unique_days))
+    sent_n = np.bincount(sent_idx, minlength=len(unique_days))
 
+    date_analysis = []
+    for i, day in enumerate(unique_days):
+        mh_mode, mh_count = modes.get(i, (None, 0))
         date_analysis.append({
-            'date': date_str,
+            'date': _day_label(day),
             'mental_health_mode': mh_mode,
             'mental_health_count': mh_count,
-            'sentiment_avg': sent_avg
+            'sentiment_avg': float(sent_sum[i] / sent_n[i]) if sent_n[i] else None
         })
 
     return date_analysis
@@ -59,16 +101,169 @@ def calculate_most_probable_illness(mh_preds: List[Optional[int]], normal_label=
     """
     Calculate the most probable mental illness class and its probability.
     If below threshold (e.g. 0.3), return 'Normal' as most probable.
+    Ties go to the smallest label id.
     """
-    filtered_preds = [p for p in mh_preds if p is not None and p != normal_label]
-    if not filtered_preds:
+    counts = Counter(mh_preds)
+    for label in [l for l in counts if l is None or l < 0 or l == normal_label]:
+        del counts[label]
+    if not counts:
         return 'Normal', 1.0
 
-    count = Counter(filtered_preds)
-    mode_class, count_mode = count.most_common(1)[0]
-    prob = count_mode / len(mh_preds)
+    # tie → smallest label id
+    mode_class = min(counts, key=lambda l: (-counts[l], l))
+    return _threshold(int(mode_class), counts[mode_class] / len(mh_preds), threshold)
 
+def _threshold(mode_class, prob, threshold):
     if prob < threshold:
         return 'Normal', prob
     else:
         return mode_class, prob
+
+
+# -------------------------------------------------------------
+# Incremental per-day aggregation
+# -------------------------------------------------------------
+class DailyAggregator:
+    """
+    Running per-day label counts + sentiment sums, so new scored items can be
+    merged into stored aggregates (and pruned ones subtracted) without
+    rescanning history. Float sums of the days an update touched are
+    recomputed with `resum`, so they don't drift over many updates. `to_dict()` is JSON/Firestore friendly (string keys).
+
+    Ties for the most common label go to the smallest label id, as in
+    prepare_date_grouped_analysis / calculate_most_probable_illness
+    (insertion order does not survive a round trip through storage).
+    """
+
+    def __init__(self, state: dict = None):
+        state = state or {}
+        self.days = {
+            day: {
+                'labels': {int(k): int(v) for k, v in d.get('labels', {}).items()},
+                'sent_sum': float(d.get('sent_sum', 0.0)),
+                'sent_n': int(d.get('sent_n', 0)),
+                'n': int(d.get('n', 0)),
+            }
+            for day, d in state.get('days', {}).items()
+        }
+        self.labels = {int(k): int(v) for k, v in state.get('labels', {}).items()}
+        self.total = int(state.get('total', 0))
+
+    def add(self, dates: List[datetime], mh_preds: List[Optional[int]], sent_preds: List[Optional[float]], sign: int = 1):
+        days, mh, sent = _as_arrays(dates, mh_preds, sent_preds)
+        if not len(days):
+            return self
+        unique_days, inverse = np.unique(days, return_inverse=True)
+        n = np.bincount(inverse, minlength=len(unique_days))
+
+        has_sent = ~np.isnan(sent)
+        sent_idx = inverse[: len(sent)][has_sent]
+        sent_sum = np.bincount(sent_idx, weights=sent[has_sent], minlength=len(unique_days))
+        sent_n = np.bincount(sent_idx, minlength=len(unique_days))
+
+        valid = mh >= 0
+        pairs, pair_counts = [], []
+        if valid.any():
+            width = int(mh[valid].max()) + 1
+            combined, pair_counts = np.unique(inverse[: len(mh)][valid] * width + mh[valid], return_counts=True)
+            pairs = zip(combined // width, combined % width)
+
+        for i, day in enumerate(unique_days):
+            key = _day_label(day)
+            d = self.days.setdefault(key, {'labels': {}, 'sent_sum': 0.0, 'sent_n': 0, 'n': 0})
+            d['n'] += sign * int(n[i])
+            d['sent_sum'] += sign * float(sent_sum[i])
+            d['sent_n'] += sign * int(sent_n[i])
+        for (i, label), c in zip(pairs, pair_counts):
+            labels = self.days[_day_label(unique_days[i])]['labels']
+            labels[int(label)] = labels.get(int(label), 0) + sign * int(c)
+            self.labels[int(label)] = self.labels.get(int(label), 0) + sign * int(c)
+        self.total += sign * len(mh)
+
+        if sign < 0:
+            self._prune()
+        return self
+
+    def remove(self, dates: List[datetime], mh_preds: List[Optional[int]], sent_preds: List[Optional[float]]):
+        """Subtract items previously added (e.g. dropped by the history cap)."""
+        return self.add(dates, mh_preds, sent_preds, sign=-1)
+
+    def resum(self, dates: List[datetime], sent_preds: List[Optional[float]], touched: List[datetime]):
+        """
+        Recompute the sentiment sums of the days in `touched` from every item
+        they now hold (`dates`/`sent_preds` cover all kept items), so rounding
+        from repeated add/remove never accumulates. Sums run in item order,
+        like prepare_date_grouped_analysis over the same items.
+        """
+        days, _, sent = _as_arrays(dates, [0] * len(sent_preds), sent_preds)
+        wanted = np.unique(np.array(touched, dtype='datetime64[D]').astype(np.int64))
+        keep = np.isin(days[: len(sent)], wanted) & ~np.isnan(sent)
+        sums = dict.fromkeys(wanted.tolist(), (0.0, 0))
+        if keep.any():
+            unique_days, inverse = np.unique(days[: len(sent)][keep], return_inverse=True)
+            sent_sum = np.bincount(inverse, weights=sent[keep], minlength=len(unique_days))
+            sent_n = np.bincount(inverse, minlength=len(unique_days))
+            sums.update((int(day), (float(sent_sum[i]), int(sent_n[i]))) for i, day in enumerate(unique_days))
+        for day, (total, n) in sums.items():
+            d = self.days.get(_day_label(day))
+            if d is not None:
+                d['sent_sum'], d['sent_n'] = total, n
+        return self
+
+    def _prune(self):
+        for key in [k for k, d in self.days.items() if d['n'] <= 0]:
+            del self.days[key]
+        for d in self.days.values():
+            d['labels'] = {k: v for k, v in d['labels'].items() if v > 0}
+            if d['sent_n'] <= 0:
+                d['sent_sum'], d['sent_n'] = 0.0, 0
+        self.labels = {k: v for k, v in self.labels.items() if v > 0}
+
+    @staticmethod
+    def _mode(counts: dict):
+        if not counts:
+            return None, 0
+        label = min(counts, key=lambda k: (-counts[k], k))
+        return label, counts[label]
+
+    def sentiment_avg(self):
+        """Mean sentiment over every added item (None when there is none)."""
+        n = sum(d['sent_n'] for d in self.days.values())
+        return sum(d['sent_sum'] for d in self.days.values()) / n if n else None
+
+    def date_grouped(self):
+        """Same structure as prepare_date_grouped_analysis."""
+        out = []
+        for key in sorted(self.days):
+            d = self.days[key]
+            mh_mode, mh_count = self._mode(d['labels'])
+            out.append({
+                'date': key,
+                'mental_health_mode': mh_mode,
+                'mental_health_count': mh_count,
+                'sentiment_avg': d['sent_sum'] / d['sent_n'] if d['sent_n'] else None
+            })
+        return out
+
+    def most_probable_illness(self, normal_label=5, threshold=0.3):
+        """Same result as calculate_most_probable_illness over every added item."""
+        counts = {k: v for k, v in self.labels.items() if k != normal_label}
+        if not counts:
+            return 'Normal', 1.0
+        mode_class, count_mode = self._mode(counts)
+        return _threshold(mode_class, count_mode / self.total, threshold)
+
+    def to_dict(self) -> dict:
+        return {
+            'days': {
+                key: {
+                    'labels': {str(k): v for k, v in d['labels'].items()},
+                    'sent_sum': d['sent_sum'],
+                    'sent_n': d['sent_n'],
+                    'n': d['n'],
+                }
+                for key, d in self.days.items()
+            },
+            'labels': {str(k): v for k, v in self.labels.items()},
+            'total': self.total,
+        }
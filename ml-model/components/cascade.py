@@ -0,0 +1,199 @@
+# components/cascade.py
+# -------------------------------------------------------------
+# 🪜 Cascade inference: linear first stage, transformer on demand
+# -------------------------------------------------------------
+"""
+Stage 1 is a linear classifier over the sentiment vectorizer's features
+(already computed for the sentiment model, so it costs one sparse dot
+product). Its prediction is kept when:
+
+  * the text is trivial (Spotify "Listened to X by Y" lines), or
+  * its top class probability ≥ threshold (short texts included: a few
+    words such as "I'm so depressed" can carry a lot),
+
+unless the text matches the escalation pattern (risk cues always get the
+transformer). Everything else goes to MentalBERT.
+
+The stage-1 model is distilled from the transformer's own predictions:
+
+    python -m components.cascade --texts corpus.txt          # one text per line
+    python -m components.cascade --from-firestore 5000       # stored insights
+"""
+
+import argparse
+import logging
+import os
+import pickle
+import re
+import sys
+import threading
+from typing import List
+
+import numpy as np
+
+from components import metrics
+
+logger = logging.getLogger("train_test")
+
+TRIVIAL_PATTERN = r"^Listened to .+ by .+$"
+ESCALATE_PATTERN = (
+    r"\b(suicid\w*|kill(ing)? (my)?self|self[- ]?harm\w*|cutting|overdos\w*|want(ed)? to die|"
+    r"end it all|hopeless|worthless|panic attacks?|flashbacks?|nightmares?|manic|"
+    r"can'?t (sleep|breathe|go on))\b"
+)
+
+CASCADE_TEXTS = metrics.Counter(
+    "mh_cascade_texts_total", "Texts resolved per cascade stage and reason.", ("stage", "reason")
+)
+
+
+class CascadeRouter:
+    def __init__(
+        self,
+        model,
+        num_labels: int,
+        threshold: float = 0.9,
+        escalate_pattern: str = ESCALATE_PATTERN,
+        trivial_pattern: str = TRIVIAL_PATTERN,
+    ):
+        self.model = model
+        self.num_labels = num_labels
+        self.threshold = threshold
+        self.escalate_re = re.compile(escalate_pattern, re.IGNORECASE) if escalate_pattern else None
+        self.trivial_re = re.compile(trivial_pattern) if trivial_pattern else None
+        self._lock = threading.Lock()
+        self.counts = {"trivial": 0, "confident": 0, "low_confidence": 0, "flagged": 0}
+
+    @classmethod
+    def load(cls, path: str, num_labels: int, **kwargs) -> "CascadeRouter":
+        with open(path, "rb") as f:
+            return cls(pickle.load(f), num_labels, **kwargs)
+
+    def route(self, raw_texts: List[str], feats):
+        """
+        Returns (logits, escalate): stage-1 log-probabilities for every text
+        (num_labels columns) and a boolean mask of texts the transformer must score.
+        """
+        proba = self.model.predict_proba(feats)
+        full = np.zeros((len(raw_texts), self.num_labels), dtype=np.float32)
+        full[:, self.model.classes_.astype(int)] = proba
+        logits = np.log(full + 1e-9)
+
+        confident = full.max(axis=1) >= self.threshold
+        escalate = np.zeros(len(raw_texts), dtype=bool)
+        counts = dict.fromkeys(self.counts, 0)
+        for i, text in enumerate(raw_texts):
+            if self.escalate_re is not None and self.escalate_re.search(text):
+                reason = "flagged"
+            elif self.trivial_re is not None and self.trivial_re.match(text):
+                reason = "trivial"
+            elif confident[i]:
+                reason = "confident"
+            else:
+                reason = "low_confidence"
+            escalate[i] = reason in ("flagged", "low_confidence")
+            counts[reason] += 1
+
+        with self._lock:
+            for reason, n in counts.items():
+                self.counts[reason] += n
+        for reason, n in counts.items():
+            if n:
+                stage = "transformer" if reason in ("flagged", "low_confidence") else "linear"
+                CASCADE_TEXTS.inc(n, stage=stage, reason=reason)
+        return logits, escalate
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        escalated = counts["flagged"] + counts["low_confidence"]
+        return {
+            **counts,
+            "total": total,
+            "transformer_share": (escalated / total) if total else 0.0,
+            "threshold": self.threshold,
+        }
+
+
+# -------------------------------------------------------------
+# Distillation (fit stage 1 on transformer labels)
+# -------------------------------------------------------------
+def fit(predictor, raw_texts: List[str], clean_texts: List[str], holdout: float = 0.2, seed: int = 0):
+    """
+    Label `raw_texts` with the transformer, fit a LogisticRegression over the
+    sentiment vectorizer features of `clean_texts`, and report held-out
+    agreement / transformer share at a few thresholds.
+    """
+    from sklearn.linear_model import LogisticRegression
+
+    labels = np.argmax(predictor._forward_logits(list(raw_texts)), axis=1)
+    if len(np.unique(labels)) < 2:
+        raise ValueError("transformer assigned a single label to every text; need a more varied corpus")
+    feats = predictor.sent_vec.transform(clean_texts)
+
+    order = np.random.default_rng(seed).permutation(len(raw_texts))
+    n_test = int(len(order) * holdout)
+    test, train = order[:n_test], order[n_test:]
+
+    model = LogisticRegression(max_iter=1000, class_weight="balanced")
+    model.fit(feats[train], labels[train])
+
+    report = {"train": int(len(train)), "test": int(len(test)), "thresholds": {}}
+    if n_test:
+        proba = model.predict_proba(feats[test])
+        pred = model.classes_[proba.argmax(axis=1)]
+        conf = proba.max(axis=1)
+        for t in (0.7, 0.8, 0.9, 0.95):
+            kept = conf >= t
+            report["thresholds"][t] = {
+                "linear_share": float(kept.mean()),
+                "agreement_when_kept": float((pred[kept] == labels[test][kept]).mean()) if kept.any() else None,
+            }
+    # refit on everything for the shipped model
+    model.fit(feats, labels)
+    return model, report
+
+
+def main(argv=None) -> int:
+    from components.pipeline import config
+
+    parser = argparse.ArgumentParser(description="Distill the cascade's linear first stage")
+    parser.add_argument("--texts", help="file with one text per line")
+    parser.add_argument("--from-firestore", type=int, metavar="N", help="use up to N stored insight texts")
+    parser.add_argument("--output", default=config.CASCADE_MODEL_PATH)
+    args = parser.parse_args(argv)
+
+    texts = []
+    if args.texts:
+        with open(args.texts) as f:
+            texts.extend(line.strip() for line in f if line.strip())
+    if args.from_firestore:
+        from components.firebase_client import db
+        query = db.collection_group(config.INSIGHTS_SUBCOLLECTION).select(["raw_text"]).limit(args.from_firestore)
+        texts.extend(t for t in ((s.to_dict() or {}).get("raw_text") for s in query.stream()) if t)
+    texts = list(dict.fromkeys(texts))
+    if len(texts) < 50:
+        parser.error(f"need at least 50 distinct texts, got {len(texts)}")
+
+    from components import train_test_data
+    from components.pipeline import data_preprocessing
+
+    data_preprocessing.ensure_nltk_resources()
+    predictor = train_test_data.build_predictor(cache_size=0, cache_path=None, scheduler=False, cascade=False)
+    try:
+        clean = data_preprocessing.clean_text_batch_v2(texts)
+    finally:
+        data_preprocessing.shutdown_pool()
+
+    model, report = fit(predictor, texts, clean)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "wb") as f:
+        pickle.dump(model, f)
+    print(f"Saved cascade model to {args.output}")
+    print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
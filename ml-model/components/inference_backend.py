@@ -0,0 +1,221 @@
+# components/inference_backend.py
+# -------------------------------------------------------------
+# ⚙️ Selectable CPU inference backends for the MH transformer
+# -------------------------------------------------------------
+"""
+Backends (INFERENCE_BACKEND):
+  * eager       — plain PyTorch (default)
+  * eager-int8  — torch dynamic int8 quantization of every nn.Linear
+  * onnx        — ONNX Runtime over an exported copy of the classifier
+  * onnx-int8   — ONNX Runtime over a dynamically int8-quantized export
+
+Every backend takes the padded batch dict built by MetaModelPredictor and
+returns float32 logits as a NumPy array. Exports are cached on disk under the
+model version, so only the first start after a model change pays for them.
+`onnxruntime` is optional and only imported when an ONNX backend is selected.
+"""
+
+import inspect
+import logging
+import os
+import random
+from typing import Callable, Dict, List
+
+import numpy as np
+import torch
+
+logger = logging.getLogger("train_test")
+
+BACKENDS = ("eager", "eager-int8", "onnx", "onnx-int8")
+
+PARITY_PROBES = [
+    "Feeling overwhelmed recently...",
+    "Trying to stay positive and focused.",
+    "Listened to Someone Like You by Adele",
+    "I can't sleep again, my mind keeps racing about everything that could go wrong tomorrow at work.",
+    "had a great day with friends, honestly the best week in a long time",
+    "Some days I feel on top of the world and then I crash for weeks and can't get out of bed. "
+    "Nobody around me understands how exhausting it is to cycle like that over and over.",
+    "the nightmares about the accident are back and I keep avoiding the road where it happened",
+    "ok",
+]
+
+# Vocabulary for the seeded synthetic parity probes (see parity_probes)
+_PROBE_WORDS = (
+    "i me my feel feeling tired anxious sad happy lonely okay today tonight week work school "
+    "exam friends family sleep awake night morning cant don't really so just still again "
+    "always never everything nothing mind heart chest panic attack stress overwhelmed "
+    "exhausted empty numb hopeless better worse good bad love hate miss trying help therapy "
+    "meds doctor people life day time year going keep stop eat music song listened crash "
+    "manic energy nightmares accident flashbacks avoiding calm excited grateful proud and "
+    "the a to of in for with but because when after that it is was have had will would"
+).split()
+
+
+# -------------------------------------------------------------
+# Threading
+# -------------------------------------------------------------
+def configure_torch_threads(intra_op: int = 0, inter_op: int = 0):
+    """0 keeps the library default."""
+    if intra_op > 0:
+        torch.set_num_threads(intra_op)
+    if inter_op > 0:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError:
+            # Can only be set once, before any inter-op parallel work has started
+            logger.warning("⚠ torch inter-op threads already initialized; keeping current value.")
+
+
+# -------------------------------------------------------------
+# Backends
+# -------------------------------------------------------------
+class EagerBackend:
+    name = "eager"
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, batch: Dict[str, torch.Tensor]) -> np.ndarray:
+        with torch.no_grad():
+            return self.model(**batch).logits.float().cpu().numpy()
+
+
+class _LogitsOnly(torch.nn.Module):
+    """Positional-args wrapper so torch.onnx.export sees a plain tensor → tensor graph."""
+
+    def __init__(self, model, input_names: List[str]):
+        super().__init__()
+        self.model = model
+        self.input_names = input_names
+
+    def forward(self, *args):
+        return self.model(**dict(zip(self.input_names, args))).logits
+
+
+class OnnxBackend:
+    def __init__(self, path: str, intra_op: int = 0, inter_op: int = 0, name: str = "onnx"):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op > 0:
+            opts.intra_op_num_threads = intra_op
+        if inter_op > 0:
+            opts.inter_op_num_threads = inter_op
+            opts.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        self.session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.name = name
+
+    def __call__(self, batch: Dict[str, torch.Tensor]) -> np.ndarray:
+        feeds = {k: batch[k].cpu().numpy() for k in self.input_names}
+        return self.session.run(["logits"], feeds)[0].astype(np.float32, copy=False)
+
+
+def export_onnx(model, tokenizer, path: str) -> List[str]:
+    sample = tokenizer(["export sample", "a second, somewhat longer export sample"],
+                       padding=True, return_tensors="pt")
+    input_names = list(sample.keys())
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    dynamic = {k: {0: "batch", 1: "sequence"} for k in input_names}
+    dynamic["logits"] = {0: "batch"}
+    extra = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # newer torch defaults to the dynamo exporter, which ignores dynamic_axes
+        extra["dynamo"] = False
+    torch.onnx.export(
+        _LogitsOnly(model, input_names).eval(),
+        tuple(sample[k] for k in input_names),
+        path,
+        input_names=input_names,
+        output_names=["logits"],
+        dynamic_axes=dynamic,
+        opset_version=14,
+        do_constant_folding=True,
+        **extra,
+    )
+    return input_names
+
+
+def build_backend(
+    name: str,
+    model,
+    tokenizer,
+    cache_dir: str,
+    version: str,
+    intra_op: int = 0,
+    inter_op: int = 0,
+) -> Callable:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}' (choose from {', '.join(BACKENDS)})")
+
+    configure_torch_threads(intra_op, inter_op)
+
+    if name == "eager":
+        return EagerBackend(model)
+
+    if name == "eager-int8":
+        import copy
+        qmodel = torch.quantization.quantize_dynamic(
+            copy.deepcopy(model).cpu(), {torch.nn.Linear}, dtype=torch.qint8
+        ).eval()
+        backend = EagerBackend(qmodel)
+        backend.name = name
+        return backend
+
+    # ---- ONNX Runtime ----
+    base_dir = os.path.join(cache_dir, version)
+    fp32_path = os.path.join(base_dir, "model.onnx")
+    if not os.path.exists(fp32_path):
+        logger.info(f"🔹 Exporting transformer to ONNX: {fp32_path}")
+        export_onnx(model.cpu(), tokenizer, fp32_path)
+
+    path = fp32_path
+    if name == "onnx-int8":
+        path = os.path.join(base_dir, "model.int8.onnx")
+        if not os.path.exists(path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            logger.info(f"🔹 Quantizing ONNX export to int8: {path}")
+            quantize_dynamic(fp32_path, path, weight_type=QuantType.QInt8)
+
+    return OnnxBackend(path, intra_op=intra_op, inter_op=inter_op, name=name)
+
+
+# -------------------------------------------------------------
+# Parity check
+# -------------------------------------------------------------
+def parity_probes(n: int = 256, seed: int = 0) -> List[str]:
+    """
+    PARITY_PROBES plus seeded synthetic texts up to `n`: a few words to a
+    couple hundred, like tweets, Spotify lines and long Reddit posts.
+    """
+    rng = random.Random(seed)
+    probes = list(PARITY_PROBES)
+    while len(probes) < n:
+        n_words = max(1, int(rng.lognormvariate(2.8, 0.9)))
+        probes.append(" ".join(rng.choice(_PROBE_WORDS) for _ in range(min(n_words, 200))))
+    return probes[:max(n, 1)]
+
+
+def parity_check(reference: Callable, candidate: Callable, batches: List[Dict[str, torch.Tensor]]) -> dict:
+    """Compare argmax agreement + |Δlogit| of `candidate` against `reference`."""
+    ref = np.concatenate([reference(b) for b in batches], axis=0)
+    cand = np.concatenate([candidate(b) for b in batches], axis=0)
+    diff = np.abs(ref - cand).max(axis=1)
+    return {
+        "agreement": float((ref.argmax(axis=1) == cand.argmax(axis=1)).mean()),
+        "max_abs_diff": float(diff.max()),
+        "p99_abs_diff": float(np.quantile(diff, 0.99)),
+        "samples": int(ref.shape[0]),
+    }
+
+
+def parity_ok(parity: dict, min_agreement: float, max_logit_diff: float) -> bool:
+    """
+    Accept a backend when its labels agree often enough and its logits stay
+    within `max_logit_diff` of the reference for 99% of the probes (the 1%
+    allows for a rare outlier from quantization, not a broken export).
+    """
+    return parity["agreement"] >= min_agreement and parity["p99_abs_diff"] <= max_logit_diff
@@ -0,0 +1,149 @@
+# components/inference_scheduler.py
+# -------------------------------------------------------------
+# ⏱️ Cross-request dynamic micro-batching
+# -------------------------------------------------------------
+"""
+One background thread owns the transformer forward pass. Callers from any
+thread submit their texts and get a Future back; the worker coalesces every
+request waiting in the queue into shared batches, bounded by
+``max_batch_size`` texts and ``max_wait_ms`` of extra latency for the first
+request in the batch. Results are split back per caller in submission order.
+
+Stages timed inside a batch (tokenize, forward) are added to the request
+trace of every caller in it, so they show up in each request's
+Server-Timing: every caller waited for the whole shared batch.
+"""
+
+import contextvars
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List
+
+import numpy as np
+
+from components import metrics
+
+logger = logging.getLogger("train_test")
+
+_STOP = object()
+
+
+class _Request:
+    __slots__ = ("texts", "future", "trace")
+
+    def __init__(self, texts: List[str], future: Future, trace=None):
+        self.texts = texts
+        self.future = future
+        self.trace = trace
+
+
+class InferenceScheduler:
+    def __init__(
+        self,
+        infer_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 10.0,
+        name: str = "mh-inference",
+    ):
+        """
+        infer_fn: runs the model over a list of texts and returns one row per text.
+        """
+        self.infer_fn = infer_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._batches = 0
+        self._texts = 0
+        self._requests = 0
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    # --------------------------
+    # Public API
+    # --------------------------
+    def submit(self, texts: List[str]) -> Future:
+        future: Future = Future()
+        self._queue.put(_Request(list(texts), future, metrics.current_trace()))
+        return future
+
+    def infer(self, texts: List[str]) -> np.ndarray:
+        """Blocking helper: submit and wait."""
+        return self.submit(texts).result()
+
+    def in_worker(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join(timeout=5)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self._batches,
+            "requests": self._requests,
+            "texts": self._texts,
+            "avg_batch_size": (self._texts / self._batches) if self._batches else 0.0,
+            "queue_depth": self._queue.qsize(),
+        }
+
+    # --------------------------
+    # Worker
+    # --------------------------
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+
+            pending = [first]
+            n_texts = len(first.texts)
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+
+            while n_texts < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    req = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if req is _STOP:
+                    stop = True
+                    break
+                pending.append(req)
+                n_texts += len(req.texts)
+
+            self._run(pending)
+            if stop:
+                return
+
+    def _infer_traced(self, texts: List[str]):
+        trace = metrics.start_trace()
+        return self.infer_fn(texts), trace
+
+    def _run(self, pending: List[_Request]):
+        texts = [t for req in pending for t in req.texts]
+        try:
+            # fresh context: the batch trace must not leak into the next batch
+            out, batch_trace = contextvars.Context().run(self._infer_traced, texts)
+        except Exception as e:
+            logger.error(f"❌ Scheduled inference failed for {len(texts)} texts: {e}")
+            for req in pending:
+                req.future.set_exception(e)
+            return
+
+        self._batches += 1
+        self._requests += len(pending)
+        self._texts += len(texts)
+
+        offset = 0
+        for req in pending:
+            if req.trace is not None:
+                for name, seconds in batch_trace.items():
+                    req.trace[name] = req.trace.get(name, 0.0) + seconds
+            req.future.set_result(out[offset : offset + len(req.texts)])
+            offset += len(req.texts)
@@ -0,0 +1,12 @@
+# components/labels.py
+# -------------------------------------------------------------
+# 🏷️ Output classes of the mental-health transformer
+# -------------------------------------------------------------
+# Kept free of Firestore/torch imports so offline tools can use it.
+ILLNESS_MAP = {
+    0: "Anxiety",
+    1: "Bipolar",
+    2: "Depression",
+    3: "Normal",
+    4: "PTSD",
+}
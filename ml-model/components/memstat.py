@@ -0,0 +1,92 @@
+# components/memstat.py
+# -------------------------------------------------------------
+# 🧮 Per-process memory: RSS vs shared vs private (Linux)
+# -------------------------------------------------------------
+"""
+Reads /proc/<pid>/smaps_rollup. RSS counts every resident page, including
+pages shared with other processes, so summing RSS over gunicorn workers
+overstates usage. PSS splits each shared page evenly between the processes
+that map it, so the PSS total is the real footprint.
+
+Check that preloaded workers share the model weights:
+
+    python -m components.memstat <gunicorn master pid>
+
+Each worker's ``shared`` column should be roughly the model size and its
+``private`` column small. Without --preload, ``private`` holds a full model
+copy per worker and total PSS grows with every worker.
+"""
+
+import argparse
+import os
+import sys
+
+# smaps_rollup fields (kB)
+_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared",
+    "Shared_Dirty": "shared",
+    "Private_Clean": "private",
+    "Private_Dirty": "private",
+}
+
+
+def read(pid: int = None) -> dict:
+    """{rss, pss, shared, private} in bytes for one process (self by default)."""
+    usage = dict.fromkeys(("rss", "pss", "shared", "private"), 0)
+    with open(f"/proc/{pid or 'self'}/smaps_rollup") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            kind = _FIELDS.get(name)
+            if kind is not None:
+                usage[kind] += int(rest.split()[0]) * 1024
+    return usage
+
+
+def children(pid: int) -> list:
+    """Direct child pids, from /proc/<pid>/stat (field 4 is the parent pid)."""
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # comm (field 2) may contain spaces; fields after it are space separated
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+            found.append(int(entry))
+    return sorted(found)
+
+
+def _mb(n: int) -> str:
+    return f"{n / 2**20:9.1f}"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="RSS / PSS / shared / private memory of a process tree")
+    parser.add_argument("pid", type=int, help="gunicorn master pid")
+    args = parser.parse_args(argv)
+
+    pids = [args.pid] + children(args.pid)
+    print(f"{'pid':>8} {'role':<7} {'rss MB':>9} {'pss MB':>9} {'shared MB':>9} {'private MB':>10}")
+    totals = dict.fromkeys(("rss", "pss"), 0)
+    for pid in pids:
+        try:
+            usage = read(pid)
+        except OSError as e:
+            print(f"{pid:>8} unreadable ({e})")
+            continue
+        role = "master" if pid == args.pid else "worker"
+        print(f"{pid:>8} {role:<7} {_mb(usage['rss'])} {_mb(usage['pss'])} {_mb(usage['shared'])} {_mb(usage['private']):>10}")
+        totals["rss"] += usage["rss"]
+        totals["pss"] += usage["pss"]
+    print(f"\nsum of RSS {_mb(totals['rss']).strip()} MB (double-counts shared pages)")
+    print(f"sum of PSS {_mb(totals['pss']).strip()} MB (actual footprint)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
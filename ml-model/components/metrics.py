@@ -0,0 +1,226 @@
+# components/metrics.py
+# -------------------------------------------------------------
+# 📈 In-process metrics + per-request stage timing
+# -------------------------------------------------------------
+"""
+Minimal Prometheus-compatible metrics (counters, gauges, histograms with
+labels) rendered by `render()` in the text exposition format for /metrics.
+
+`stage(name)` times a block into the `mh_stage_seconds` histogram and, when
+a request trace is active (`start_trace()`, propagated through contextvars
+into pipeline threads), into that request's breakdown so it can be returned
+as a `Server-Timing` header.
+
+The registry is per process: with several gunicorn workers every worker
+counts only its own requests and /metrics answers for one of them.
+"""
+
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+_REGISTRY: List["_Metric"] = []
+_COLLECTORS: List[Callable[[], None]] = []
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        with _REGISTRY_LOCK:
+            _REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _labels(self, key: tuple, extra: dict = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self):
+        return [f"{self.name}{self._labels(k)} {_fmt(v)}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def _samples(self):
+        return [f"{self.name}{self._labels(k)} {_fmt(v)}" for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=None):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total, n) in self._values.items():
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                lines.append(f"{self.name}_bucket{self._labels(key, {'le': _fmt(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {n}")
+        return lines
+
+
+def on_collect(fn: Callable[[], None]):
+    """Register a callback run before every render (e.g. copy cache stats into gauges)."""
+    _COLLECTORS.append(fn)
+    return fn
+
+
+def render() -> str:
+    for fn in list(_COLLECTORS):
+        try:
+            fn()
+        except Exception:
+            pass
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY)
+    lines = []
+    for m in metrics:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+# Starlette appends "; charset=utf-8" to text/* responses
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+# -------------------------------------------------------------
+# Metrics used across the service
+# -------------------------------------------------------------
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUEST_SECONDS = Histogram(
+    "mh_http_request_seconds", "HTTP request latency.", ("method", "route", "status"), LATENCY_BUCKETS
+)
+STAGE_SECONDS = Histogram(
+    "mh_stage_seconds", "Time spent per pipeline stage.", ("stage",), LATENCY_BUCKETS
+)
+UPSTREAM_RESPONSES = Counter(
+    "mh_upstream_responses_total", "Upstream API responses by status code.", ("source", "status")
+)
+UPSTREAM_ERRORS = Counter(
+    "mh_upstream_errors_total", "Upstream failures (timeout, rate_limited, error).", ("source", "kind")
+)
+UPSTREAM_RETRIES = Counter(
+    "mh_upstream_retries_total", "Upstream requests retried, by the status that triggered it.", ("source", "status")
+)
+INFERENCE_BATCH_SIZE = Histogram(
+    "mh_inference_batch_size", "Rows per transformer forward pass.", (), (1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+INFERENCE_LAST_BATCH_SIZE = Gauge("mh_inference_last_batch_size", "Rows in the most recent forward pass.")
+INFERENCE_PADDING_RATIO = Gauge(
+    "mh_inference_padding_ratio", "Padding share of the most recent forward pass (0 = no padding)."
+)
+INFERENCE_TOKENS = Counter(
+    "mh_inference_tokens_total", "Tokens fed to the transformer, real vs padding.", ("kind",)
+)
+CACHE_EVENTS = Counter("mh_cache_events_total", "Cache lookups by cache and result.", ("cache", "result"))
+CACHE_HIT_RATIO = Gauge("mh_cache_hit_ratio", "Lifetime hit ratio per cache.", ("cache",))
+PROCESS_MEMORY = Gauge(
+    "mh_process_memory_bytes", "This worker's memory: rss, pss, shared, private.", ("kind",)
+)
+PIPELINE_SLOTS = Gauge("mh_pipeline_slots", "Analyses running / waiting for an admission slot.", ("state",))
+
+
+# -------------------------------------------------------------
+# Per-request traces + stage timer
+# -------------------------------------------------------------
+_TRACE: contextvars.ContextVar = contextvars.ContextVar("mh_trace", default=None)
+
+
+def start_trace() -> Dict[str, float]:
+    """Begin collecting stage durations for the current request/task."""
+    trace: Dict[str, float] = {}
+    _TRACE.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Dict[str, float]]:
+    return _TRACE.get()
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        trace = _TRACE.get()
+        if trace is not None:
+            # repeated stages (per chunk / per batch) accumulate
+            trace[name] = trace.get(name, 0.0) + elapsed
+
+
+def server_timing(trace: Dict[str, float], total: float = None) -> str:
+    """Format a trace as a Server-Timing header value (durations in ms)."""
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in trace.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
@@ -0,0 +1,603 @@
+# components/pipeline/analysis.py
+"""
+Per-user analysis pipeline: extraction → cleaning → inference → aggregation → save.
+The /predict endpoint is a thin wrapper around `run_analysis`.
+"""
+
+import asyncio
+from collections import Counter
+from datetime import datetime
+import numpy as np
+from firebase_admin import firestore
+
+from components.pipeline import config
+from components.pipeline import data_extraction
+from components.pipeline import data_preprocessing
+from components.pipeline import incremental
+from components.pipeline import insight_store
+from components.pipeline.executor import run_blocking
+import components.pipeline.async_extraction as async_extraction
+import components.analysis_plot as analysis_plot
+from components import metrics
+from components.labels import ILLNESS_MAP
+from components.logger import logger
+
+
+class NoDataError(Exception):
+    """Raised when a user has neither new nor stored items to analyse."""
+    status_code = 404
+    detail = "No social media data found."
+
+
+def to_native(obj):
+    if isinstance(obj, dict):
+        return {k: to_native(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [to_native(v) for v in obj]
+    elif isinstance(obj, np.generic):
+        return obj.item()
+    return obj
+
+
+# =========================================================
+# 🧠 Scoring + aggregation
+# =========================================================
+def _emit(progress, stage: str, **data):
+    if progress is not None:
+        progress(stage, data)
+
+
+def score_items(predictor, items: list, progress=None) -> list:
+    """
+    Clean + run both models over extracted items → text-level insight dicts.
+    `progress(stage, data)` (optional) receives "cleaned" and "scored" N/M updates.
+    """
+    if not items:
+        return []
+    raw_texts = [item["text"] for item in items]
+    clean_texts = clean_texts_of(items)
+    _emit(progress, "cleaned", count=len(clean_texts))
+
+    if progress is None:
+        with metrics.stage("predict"):
+            mh_preds, sent_preds = predictor.predict_dual(raw_texts, clean_texts)
+    else:
+        # score in chunks so callers can report N/M
+        mh_preds, sent_preds = [], []
+        step = config.SCORING_CHUNK_SIZE
+        for i in range(0, len(raw_texts), step):
+            with metrics.stage("predict"):
+                mh, sent = predictor.predict_dual(raw_texts[i : i + step], clean_texts[i : i + step])
+            mh_preds.extend(mh)
+            sent_preds.extend(sent)
+            _emit(progress, "scored", done=len(mh_preds), total=len(raw_texts))
+
+    return to_entries(items, clean_texts, mh_preds, sent_preds)
+
+
+def clean_texts_of(items: list) -> list:
+    with metrics.stage("clean"):
+        return data_preprocessing.clean_text_batch_v2([item["text"] for item in items])
+
+
+def predict_entries(predictor, items: list, clean_texts: list) -> list:
+    """Both models over already-cleaned items → text-level insight dicts."""
+    with metrics.stage("predict"):
+        mh_preds, sent_preds = predictor.predict_dual([item["text"] for item in items], clean_texts)
+    return to_entries(items, clean_texts, mh_preds, sent_preds)
+
+
+def to_entries(items: list, clean_texts: list, mh_preds, sent_preds) -> list:
+    text_level_analysis = []
+    for item, clean, mh, sent in zip(items, clean_texts, mh_preds, sent_preds):
+        text_level_analysis.append({
+            "raw_text": item["text"],
+            "cleaned_text": clean,
+            "prediction_value": int(mh),
+            "prediction_label": ILLNESS_MAP.get(int(mh), "Unknown"),
+            "sentiment": float(sent),
+            "timestamp": item["timestamp"],
+            "source": item.get("source"),
+        })
+    return text_level_analysis
+
+
+def _columns(entries: list):
+    """(dates, labels, sentiments) of scored entries, as the aggregators take them."""
+    return (
+        [datetime.fromtimestamp(e["timestamp"] / 1000) for e in entries],
+        [int(e["prediction_value"]) for e in entries],
+        [float(e["sentiment"]) for e in entries],
+    )
+
+
+def aggregate(entries: list) -> analysis_plot.DailyAggregator:
+    return analysis_plot.DailyAggregator().add(*_columns(entries))
+
+
+def advance_aggregates(state: dict, entries: list) -> analysis_plot.DailyAggregator:
+    """
+    The stored per-day aggregates moved from state["items"] to `entries`
+    (their merge with newly scored items): only entries that came in or fell
+    out of the kept window are touched (plus a resum of the touched days'
+    sentiment over `entries`). Rebuilt from `entries` when nothing is stored
+    yet or the stored totals don't match the stored items.
+    """
+    stored = state["items"]
+    agg = analysis_plot.DailyAggregator(state.get("aggregates"))
+    if not state.get("aggregates") or agg.total != len(stored):
+        return aggregate(entries)
+    before, after = {id(e) for e in stored}, {id(e) for e in entries}
+    added = [e for e in entries if id(e) not in before]
+    dropped = [e for e in stored if id(e) not in after]
+    if not added and not dropped:
+        return agg
+    added, dropped = _columns(added), _columns(dropped)
+    agg.add(*added)
+    agg.remove(*dropped)
+    # counts are exact; only the touched days' float sums are recomputed
+    dates, _, sentiments = _columns(entries)
+    return agg.resum(dates, sentiments, added[0] + dropped[0])
+
+
+def _illness_name(mode_label) -> str:
+    return (
+        ILLNESS_MAP.get(int(mode_label), "Normal")
+        if isinstance(mode_label, (int, np.integer))
+        else str(mode_label)
+    )
+
+
+def aggregate_summary(aggregates: analysis_plot.DailyAggregator) -> dict:
+    """The summary fields a DailyAggregator provides on its own (no per-text lists)."""
+    mode_label, mode_prob = aggregates.most_probable_illness(normal_label=3, threshold=0.4)
+    return {
+        "date_grouped_analysis": aggregates.date_grouped(),
+        "most_probable_illness": _illness_name(mode_label),
+        "mode_probability": float(mode_prob) if mode_prob else None,
+    }
+
+
+def summarize(text_level_analysis: list, aggregates: analysis_plot.DailyAggregator = None) -> dict:
+    """
+    Date-grouped + overall aggregates over scored entries. With `aggregates`
+    (a DailyAggregator over the same entries) the per-day groups and the most
+    probable illness come from it instead of a rescan of every entry (same
+    result, ties go to the smallest label id either way).
+    """
+    mh_preds = [int(e["prediction_value"]) for e in text_level_analysis]
+    sent_preds = [float(e["sentiment"]) for e in text_level_analysis]
+
+    if aggregates is not None:
+        head = aggregate_summary(aggregates)
+    else:
+        python_dates = [datetime.fromtimestamp(e["timestamp"] / 1000) for e in text_level_analysis]
+        mode_label, mode_prob = analysis_plot.calculate_most_probable_illness(
+            mh_preds, normal_label=3, threshold=0.4
+        )
+        head = {
+            "date_grouped_analysis": analysis_plot.prepare_date_grouped_analysis(
+                python_dates, mh_preds, sent_preds
+            ),
+            "most_probable_illness": _illness_name(mode_label),
+            "mode_probability": float(mode_prob) if mode_prob else None,
+        }
+
+    summary = {
+        "text_level_analysis": text_level_analysis,
+        **head,
+        "mental_health_preds": mh_preds,
+        "sentiment_preds": sent_preds,
+    }
+    if aggregates is not None:
+        # saved on the user document by user_update; finish_analysis drops it from the response
+        summary["daily_aggregates"] = aggregates.to_dict()
+    return summary
+
+
+def user_update(summary: dict, watermarks: dict = None, aggregates: analysis_plot.DailyAggregator = None) -> dict:
+    """
+    Compact aggregates kept on the user document. With `aggregates` (over every
+    entry) the counts come from it, for streamed runs whose summary carries no
+    per-text lists.
+    """
+    if aggregates is None:
+        entries = summary["text_level_analysis"]
+        sentiments = summary["sentiment_preds"]
+        condition_counts = dict(Counter(e["prediction_label"] for e in entries))
+        sentiment_avg = float(np.mean(sentiments)) if sentiments else None
+        insight_count = len(entries)
+    else:
+        condition_counts = {ILLNESS_MAP.get(k, "Unknown"): v for k, v in aggregates.labels.items()}
+        sentiment_avg = aggregates.sentiment_avg()
+        insight_count = aggregates.total
+    update = {
+        "most_probable_condition": summary["most_probable_illness"],
+        "mode_probability": summary["mode_probability"],
+        "condition_counts": condition_counts,
+        "sentiment_avg": sentiment_avg,
+        "insight_count": insight_count,
+        "date_grouped_analysis": to_native(summary["date_grouped_analysis"]),
+        "last_analysis_run": datetime.now().isoformat(),
+    }
+    # full (non-incremental) runs clear them; the next incremental run rebuilds
+    update["daily_aggregates"] = summary.get("daily_aggregates", firestore.DELETE_FIELD)
+    for field in insight_store.LEGACY_FIELDS:
+        update[field] = firestore.DELETE_FIELD
+    if watermarks is not None:
+        update["fetch_watermarks"] = watermarks
+    return update
+
+
+def save_analysis(user_id: str, summary: dict, watermarks: dict = None, stored: dict = None) -> dict:
+    """
+    Per-text entries go to the insights subcollection (only new/changed docs
+    are written); the user document keeps compact aggregates.
+    """
+    result = insight_store.sync(
+        user_id,
+        to_native(summary["text_level_analysis"]),
+        stored,
+        user_update=user_update(summary, watermarks),
+    )
+    logger.info(f"🗂️ Insights for {user_id}: {result}")
+    return result
+
+
+# =========================================================
+# 🚀 Full run
+# =========================================================
+async def _load_state(user_id: str, incremental_mode: bool = None):
+    if incremental_mode is None:
+        incremental_mode = config.INCREMENTAL_ANALYSIS
+    if not incremental_mode:
+        return None
+    with metrics.stage("firestore.state"):
+        return await run_blocking(incremental.load_state, user_id)
+
+
+def _extraction_logs(extraction: dict) -> dict:
+    logger.info(f"🟠 Reddit extracted: {extraction['reddit']}")
+    logger.info(f"🔵 Twitter extracted: {extraction['twitter']}")
+    logger.info(f"🟢 Spotify extracted: {extraction['spotify']}")
+    if extraction["timed_out"]:
+        logger.warning(f"⏱ Partial extraction, timed out: {extraction['timed_out']}")
+    if extraction["rate_limited"]:
+        logger.warning(f"🚦 Rate limited (cached data used where available): {extraction['rate_limited']}")
+
+    return {
+        "reddit": extraction["reddit"],
+        "twitter": extraction["twitter"],
+        "spotify": extraction["spotify"],
+        "timed_out": extraction["timed_out"],
+        "rate_limited": extraction["rate_limited"],
+    }
+
+
+async def begin_analysis(user_id: str, incremental_mode: bool = None, progress=None) -> dict:
+    """
+    Load incremental state + extract. Returns a run context consumed by
+    run_analysis; raises NoDataError before any scoring.
+    """
+    state = await _load_state(user_id, incremental_mode)
+    since = state["watermarks"] if state else None
+
+    # 🔥 extract with counts (all sources concurrently)
+    with metrics.stage("extract"):
+        extraction = await async_extraction.extract_all_sources_async(user_id, since=since)
+
+    extraction_logs = _extraction_logs(extraction)
+    _emit(progress, "fetched", items=len(extraction["items"]), **extraction_logs)
+
+    raw_items = extraction["items"]
+    if state is not None:
+        raw_items = incremental.select_new(raw_items, state["watermarks"])
+        if not raw_items and not state["items"]:
+            raw_items = data_extraction.fallback_data()
+
+    if not raw_items and state is None:
+        raise NoDataError(user_id)
+
+    return {
+        "user_id": user_id,
+        "state": state,
+        "raw_items": raw_items,
+        # endpoints whose results may be incomplete; their watermark must not move
+        "timed_out": extraction["timed_out"] + extraction["rate_limited"],
+        "extraction_logs": extraction_logs,
+        # ♻️ nothing new since the watermark — the stored analysis is reused
+        "cached": state is not None and not raw_items,
+    }
+
+
+def finish_analysis(ctx: dict, scored: list, save=None) -> dict:
+    """
+    Merge with stored items, aggregate and save (blocking). Returns the summary.
+    save: replaces save_analysis (same signature), e.g. to batch bulk writes.
+    """
+    save = save or save_analysis
+    state = ctx["state"]
+    if ctx["cached"]:
+        logger.info(f"♻️ No new items for {ctx['user_id']}; returning cached analysis")
+        with metrics.stage("aggregate"):
+            summary = summarize(state["items"], advance_aggregates(state, state["items"]))
+    else:
+        if state is not None:
+            entries = incremental.merge_items(state["items"], scored, config.INCREMENTAL_MAX_ITEMS)
+            watermarks = incremental.advance_watermarks(state["watermarks"], ctx["raw_items"], ctx["timed_out"])
+            with metrics.stage("aggregate"):
+                summary = summarize(entries, advance_aggregates(state, entries))
+        else:
+            entries, watermarks = incremental.without_fallback(scored), None
+            with metrics.stage("aggregate"):
+                summary = summarize(entries)
+        save(ctx["user_id"], summary, watermarks, state["stored"] if state else None)
+        logger.info(f"✅ Analysis completed & saved for {ctx['user_id']}")
+        if not entries and scored:
+            # only fallback placeholders: they make up the response but aren't stored
+            summary = summarize(scored)
+
+    summary.pop("daily_aggregates", None)
+    summary["extraction_logs"] = ctx["extraction_logs"]
+    if state is not None:
+        summary["incremental"] = {"new_items": len(scored), "cached": ctx["cached"]}
+    return summary
+
+
+async def run_analysis(predictor, user_id: str, incremental_mode: bool = None, progress=None, native: bool = True) -> dict:
+    """
+    progress: optional callable(stage, data) — stages: fetched, cleaned,
+    scored (done/total), saved. May be called from a worker thread.
+    native=False skips the to_native pass (for response_format.compact,
+    which casts column by column).
+    config.ANALYSIS_PIPELINE="overlapped" runs run_analysis_overlapped instead.
+    """
+    if config.ANALYSIS_PIPELINE == "overlapped":
+        return await run_analysis_overlapped(predictor, user_id, incremental_mode, progress, native)
+
+    ctx = await begin_analysis(user_id, incremental_mode, progress)
+
+    scored = []
+    if not ctx["cached"]:
+        # Off the event loop so concurrent requests meet in the inference scheduler
+        scored = await run_blocking(score_items, predictor, ctx["raw_items"], progress)
+
+    summary = await run_blocking(finish_analysis, ctx, scored)
+    _emit(progress, "saved", cached=ctx["cached"])
+    return to_native(summary) if native else summary
+
+
+# =========================================================
+# ⚡ Overlapped run (fetch → clean → infer as items arrive)
+# =========================================================
+_END = object()
+
+
+async def _take(queue: asyncio.Queue, max_items: int):
+    """
+    Wait for one batch, then merge whatever else is already queued (up to
+    max_items). Returns (items, extras, finished); extras are the batches'
+    companion lists (cleaned texts) concatenated the same way.
+    """
+    items, extras, finished = [], [], False
+    batch = await queue.get()
+    while True:
+        if batch is _END:
+            finished = True
+            break
+        items.extend(batch[0])
+        extras.extend(batch[1])
+        if len(items) >= max_items or queue.empty():
+            break
+        batch = queue.get_nowait()
+    return items, extras, finished
+
+
+async def run_analysis_overlapped(predictor, user_id: str, incremental_mode: bool = None, progress=None, native: bool = True) -> dict:
+    """
+    Same result as the phased run_analysis, but extraction, cleaning and
+    inference overlap: pages from whichever source answers first are cleaned
+    while other sources are still fetching, and cleaned texts are scored while
+    more are being cleaned. A bounded queue between cleaning and inference
+    applies backpressure (a slow model stalls cleaning). Fetched pages are
+    buffered without a bound — extraction is already capped by the HISTORY_*
+    limits — so a slow consumer never eats into the upstream deadline.
+
+    Progress keeps the phased order: "cleaned" / "scored" updates made while
+    extraction is still running are held back and sent after "fetched".
+    """
+    state = await _load_state(user_id, incremental_mode)
+    watermarks = state["watermarks"] if state else None
+    fetched: asyncio.Queue = asyncio.Queue()
+    cleaned: asyncio.Queue = asyncio.Queue(maxsize=config.OVERLAP_QUEUE_SIZE)
+    raw_items, scored = [], []
+    held = {}  # stage → latest data, until "fetched" has been sent
+
+    def stage_progress(stage: str, **data):
+        if held is None:
+            _emit(progress, stage, **data)
+        else:
+            held[stage] = data
+
+    async def on_items(items):
+        if state is not None:
+            items = incremental.select_new(items, watermarks)
+        if items:
+            raw_items.extend(items)
+            fetched.put_nowait((items, []))
+
+    async def extract():
+        nonlocal held
+        with metrics.stage("extract"):
+            extraction = await async_extraction.extract_all_sources_async(user_id, since=watermarks, on_items=on_items)
+        logs = _extraction_logs(extraction)
+        _emit(progress, "fetched", items=len(raw_items), **logs)
+        for stage, data in held.items():
+            _emit(progress, stage, **data)
+        held = None
+        fetched.put_nowait(_END)
+        return extraction, logs
+
+    # No _END on failure/cancellation: gather() fails and the other stages are cancelled
+    async def clean():
+        done = 0
+        finished = False
+        while not finished:
+            items, _, finished = await _take(fetched, config.SCORING_CHUNK_SIZE)
+            if items:
+                await cleaned.put((items, await run_blocking(clean_texts_of, items)))
+                done += len(items)
+                stage_progress("cleaned", count=done)
+        await cleaned.put(_END)
+
+    async def infer():
+        finished = False
+        while not finished:
+            items, clean_texts, finished = await _take(cleaned, config.INFERENCE_BATCH_SIZE)
+            if items:
+                scored.extend(await run_blocking(predict_entries, predictor, items, clean_texts))
+                stage_progress("scored", done=len(scored), total=None)
+
+    tasks = [asyncio.ensure_future(c) for c in (extract(), clean(), infer())]
+    try:
+        extraction, extraction_logs = (await asyncio.gather(*tasks))[0]
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    if not raw_items and (state is None or not state["items"]):
+        raw_items = data_extraction.fallback_data()
+        scored = await run_blocking(score_items, predictor, raw_items)
+    # same order as the phased run (newest first)
+    scored.sort(key=lambda e: e["timestamp"], reverse=True)
+
+    ctx = {
+        "user_id": user_id,
+        "state": state,
+        "raw_items": raw_items,
+        "timed_out": extraction["timed_out"] + extraction["rate_limited"],
+        "extraction_logs": extraction_logs,
+        "cached": state is not None and not raw_items,
+    }
+    summary = await run_blocking(finish_analysis, ctx, scored)
+    _emit(progress, "saved", cached=ctx["cached"])
+    return to_native(summary) if native else summary
+
+
+# =========================================================
+# 📡 Streaming run (NDJSON records)
+# =========================================================
+async def stream_analysis(predictor, user_id: str, incremental_mode: bool = None, chunk_size: int = None):
+    """
+    Yields JSON-ready records while the run is in progress:
+      {"type": "text", ...}                   per new text, as each inference chunk finishes
+      {"type": "extraction", ...}             once every source has answered
+      {"type": "text", "stored": True, ...}   incremental runs: the stored texts kept with them
+      {"type": "summary", ...}                last — date-grouped + most probable illness
+
+    Pages are scored as they arrive from whichever source answers first, so
+    the first text doesn't wait for the whole history to be fetched. Scored
+    chunks are not collected: full runs fold them into a DailyAggregator and
+    write them out through insight_store.ChunkedSync as they go; incremental
+    runs merge them into the kept window (at most INCREMENTAL_MAX_ITEMS).
+    """
+    step = chunk_size or config.SCORING_CHUNK_SIZE
+    state = await _load_state(user_id, incremental_mode)
+    watermarks = state["watermarks"] if state else None
+    fetched: asyncio.Queue = asyncio.Queue()
+    raw_items = []
+
+    async def on_items(items):
+        if state is not None:
+            items = incremental.select_new(items, watermarks)
+        if items:
+            raw_items.extend(items)
+            fetched.put_nowait((items, []))
+
+    async def extract():
+        try:
+            with metrics.stage("extract"):
+                return await async_extraction.extract_all_sources_async(user_id, since=watermarks, on_items=on_items)
+        finally:
+            fetched.put_nowait(_END)
+
+    # full runs: running aggregates + insight writes; incremental runs: the merged window
+    agg = analysis_plot.DailyAggregator()
+    window = state["items"] if state is not None else None
+    fallback = []  # placeholder entries: shown, never stored
+    scored = 0
+
+    async def absorb(entries):
+        nonlocal window
+        fallback.extend(e for e in entries if e.get("source") == incremental.FALLBACK_SOURCE)
+        entries = incremental.without_fallback(entries)
+        if state is not None:
+            window = incremental.merge_items(window, entries, config.INCREMENTAL_MAX_ITEMS)
+        elif entries:
+            with metrics.stage("aggregate"):
+                agg.add(*_columns(entries))
+            await run_blocking((await sync_task).add, entries)
+
+    extraction_task = asyncio.ensure_future(extract())
+    sync_task = None if state is not None else asyncio.ensure_future(run_blocking(insight_store.ChunkedSync, user_id))
+    try:
+        finished = False
+        while not finished:
+            items, _, finished = await _take(fetched, step)
+            for i in range(0, len(items), step):
+                entries = await run_blocking(score_items, predictor, items[i : i + step])
+                scored += len(entries)
+                for entry in entries:
+                    yield {"type": "text", **entry}
+                await absorb(entries)
+
+        extraction = await extraction_task
+        extraction_logs = _extraction_logs(extraction)
+        if not raw_items and (state is None or not state["items"]):
+            entries = await run_blocking(score_items, predictor, data_extraction.fallback_data())
+            scored += len(entries)
+            for entry in entries:
+                yield {"type": "text", **entry}
+            await absorb(entries)
+        yield {"type": "extraction", **extraction_logs}
+
+        if state is not None:
+            stored = {id(e) for e in state["items"]}
+            fresh = [e for e in window if id(e) not in stored]
+            ctx = {
+                "user_id": user_id,
+                "state": state,
+                "raw_items": raw_items,
+                "timed_out": extraction["timed_out"] + extraction["rate_limited"],
+                "extraction_logs": extraction_logs,
+                "cached": not raw_items and not fallback,
+            }
+            summary = await run_blocking(finish_analysis, ctx, fresh or fallback)
+            summary["incremental"]["new_items"] = scored
+            streamed = {id(e) for e in fresh + fallback}
+            for entry in summary["text_level_analysis"]:
+                if id(entry) not in streamed:
+                    yield {"type": "text", "stored": True, **entry}
+            head, count = summary, len(summary["text_level_analysis"])
+        else:
+            head = aggregate_summary(agg)
+            result = await run_blocking((await sync_task).finish, user_update(head, aggregates=agg))
+            logger.info(f"🗂️ Insights for {user_id}: {result}")
+            logger.info(f"✅ Analysis completed & saved for {user_id}")
+            count = agg.total
+            if not count and fallback:
+                head, count = aggregate_summary(aggregate(fallback)), len(fallback)
+    finally:
+        for task in (extraction_task, sync_task):
+            if task is not None and not task.done():
+                task.cancel()
+
+    yield to_native({
+        "type": "summary",
+        "date_grouped_analysis": head["date_grouped_analysis"],
+        "most_probable_illness": head["most_probable_illness"],
+        "mode_probability": head["mode_probability"],
+        "incremental": head.get("incremental"),
+        "count": count,
+    })
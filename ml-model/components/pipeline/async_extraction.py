@@ -0,0 +1,329 @@
+# components/pipeline/async_extraction.py
+"""
+Concurrent extraction engine.
+
+Runs Reddit (posts + comments), Twitter and Spotify at the same time so the
+extraction latency of a request is bounded by the slowest upstream instead of
+the sum of all of them. Every source gets a wall-clock deadline; a source that
+misses it contributes whatever it already fetched and is reported in
+``timed_out``. Output has the same shape as
+``data_extraction.extract_all_sources``.
+
+With ``since`` (per-source watermark in epoch ms) only items newer than the
+watermark are returned; Twitter and Spotify filter server-side, Reddit
+listings are filtered after parsing.
+
+Reddit listings and the Twitter timeline are followed page by page (cursor
+pagination, capped by HISTORY_MAX_ITEMS / HISTORY_MAX_PAGES /
+HISTORY_WINDOW_DAYS). The request for the next page goes out as soon as the
+current one arrives, while its items are handed on; `iter_reddit_items` and
+`iter_tweets` expose that as async generators. A source that misses the
+deadline keeps the pages it already has.
+
+Requests go through ``upstream`` (per-source rate limiting, retries, response
+cache). An endpoint that stays rate limited contributes its last cached
+response, if any, and is reported in ``rate_limited``.
+"""
+
+import asyncio
+import aiohttp
+from components.logger import logger
+from components import metrics
+from components.pipeline import config
+from components.pipeline import data_extraction
+from components.pipeline import upstream
+from components.pipeline.http_client import get_async_session
+from components.pipeline.executor import run_blocking
+
+
+# -------------------------------------------------------------
+# 🔹 HELPERS
+# -------------------------------------------------------------
+def _remaining(deadline: float) -> float:
+    return max(deadline - asyncio.get_running_loop().time(), 0.0)
+
+
+async def _get_json(session: aiohttp.ClientSession, url: str, headers: dict, source: str,
+                    label: str, rate_limited: list, deadline: float = None):
+    """Rate-limited endpoints fall back to their last cached body ({} without one)."""
+    try:
+        return await upstream.fetch_json(session, url, headers, source, deadline)
+    except upstream.RateLimited as e:
+        metrics.UPSTREAM_ERRORS.inc(source=label, kind="rate_limited")
+        rate_limited.append(label)
+        if e.cached is not None:
+            logger.info(f"♻️ {label} rate limited; using the cached response")
+            return e.cached
+        return {}
+
+
+async def _load_tokens(tokens_task: asyncio.Future, provider: str, deadline: float):
+    # All sources share one batched (blocking) Firestore read running in a thread.
+    tokens = await asyncio.wait_for(asyncio.shield(tokens_task), _remaining(deadline))
+    return tokens.get(provider)
+
+
+def _newer_than(items: list, since_ms):
+    if not since_ms:
+        return items
+    return [i for i in items if i["timestamp"] > since_ms]
+
+
+async def _endpoint(label: str, coro, deadline: float, timed_out: list, on_items=None):
+    """Await one upstream call; a miss or failure yields [] instead of failing the source."""
+    try:
+        with metrics.stage(f"extract.{label}"):
+            items = await asyncio.wait_for(coro, _remaining(deadline))
+        if on_items is not None and items:
+            await on_items(items)
+        return items
+    except asyncio.TimeoutError:
+        logger.warning(f"⏱ {label} missed the extraction deadline")
+        metrics.UPSTREAM_ERRORS.inc(source=label, kind="timeout")
+        timed_out.append(label)
+    except Exception as e:
+        logger.error(f"❌ {label} extraction error: {e}")
+        metrics.UPSTREAM_ERRORS.inc(source=label, kind="error")
+    return []
+
+
+# -------------------------------------------------------------
+# 🔹 PAGINATION (cursor-following, next page prefetched)
+# -------------------------------------------------------------
+async def _paginate(fetch_page, parse, next_cursor, floor_ms: int):
+    """
+    Async generator of item pages from a newest-first, cursor-paginated
+    listing. fetch_page(cursor) returns a JSON body (cursor None = first page).
+    """
+    budget = config.HISTORY_MAX_ITEMS
+    pages = 1
+    pending = asyncio.ensure_future(fetch_page(None))
+    try:
+        while pending is not None:
+            data = await pending
+            pending = None
+            items, exhausted = data_extraction.page_limits(parse(data), floor_ms, budget)
+            cursor = next_cursor(data)
+            if cursor and not exhausted and pages < config.HISTORY_MAX_PAGES:
+                # in flight while the consumer handles this page
+                pending = asyncio.ensure_future(fetch_page(cursor))
+                pages += 1
+            budget -= len(items)
+            if items:
+                yield items
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+async def _collect(label: str, pages, deadline: float, timed_out: list, on_items=None) -> list:
+    """
+    Drain a page generator until the deadline; a miss keeps the pages already fetched.
+    on_items: optional coroutine function handed every page as it arrives.
+    """
+    items = []
+    try:
+        with metrics.stage(f"extract.{label}"):
+            while True:
+                try:
+                    page = await asyncio.wait_for(pages.__anext__(), _remaining(deadline))
+                except StopAsyncIteration:
+                    break
+                items.extend(page)
+                if on_items is not None:
+                    await on_items(page)
+    except asyncio.TimeoutError:
+        logger.warning(f"⏱ {label} missed the extraction deadline ({len(items)} items kept)")
+        metrics.UPSTREAM_ERRORS.inc(source=label, kind="timeout")
+        timed_out.append(label)
+    except Exception as e:
+        logger.error(f"❌ {label} extraction error: {e}")
+        metrics.UPSTREAM_ERRORS.inc(source=label, kind="error")
+    finally:
+        await pages.aclose()
+    return items
+
+
+async def _flatten(pages):
+    async for page in pages:
+        for item in page:
+            yield item
+
+
+# -------------------------------------------------------------
+# 🔥 REDDIT (posts and comments fetched concurrently)
+# -------------------------------------------------------------
+_REDDIT_LISTINGS = {
+    "submitted": ("reddit.posts", data_extraction.parse_reddit_posts),
+    "comments": ("reddit.comments", data_extraction.parse_reddit_comments),
+}
+
+
+def _reddit_pages(session, username: str, kind: str, since_ms: int = None, rate_limited: list = None,
+                  deadline: float = None):
+    label, parser = _REDDIT_LISTINGS[kind]
+    rate_limited = [] if rate_limited is None else rate_limited
+
+    async def fetch_page(after):
+        url = data_extraction.reddit_listing_url(username, kind, after)
+        return await _get_json(session, url, {"User-Agent": "Mozilla/5.0"}, "reddit", label, rate_limited, deadline)
+
+    return _paginate(fetch_page, parser, data_extraction.reddit_next_cursor, data_extraction.history_floor(since_ms))
+
+
+def iter_reddit_items(session, username: str, kind: str = "submitted", since_ms: int = None,
+                      rate_limited: list = None):
+    """Async generator of a user's posts ("submitted") or comments, newest first, as pages arrive."""
+    return _flatten(_reddit_pages(session, username, kind, since_ms, rate_limited))
+
+
+async def extract_reddit_text_async(session, tokens_task, deadline: float, timed_out: list, since_ms: int = None,
+                                    rate_limited: list = None, on_items=None):
+    rate_limited = [] if rate_limited is None else rate_limited
+    tokens = await _load_tokens(tokens_task, "reddit", deadline)
+    if not tokens:
+        logger.info("❌ No Reddit tokens found")
+        return []
+
+    username = tokens.get("username")
+    if not username:
+        logger.error("❌ No Reddit username stored")
+        return []
+
+    posts, comments = await asyncio.gather(
+        _collect("reddit.posts", _reddit_pages(session, username, "submitted", since_ms, rate_limited, deadline),
+                 deadline, timed_out, on_items),
+        _collect("reddit.comments", _reddit_pages(session, username, "comments", since_ms, rate_limited, deadline),
+                 deadline, timed_out, on_items),
+    )
+    results = posts + comments
+
+    logger.info(f"🟠 Reddit total extracted (posts+comments): {len(results)}")
+    return results
+
+
+# -------------------------------------------------------------
+# 🔵 TWITTER
+# -------------------------------------------------------------
+def _tweet_pages(session, twitter_id: str, bearer: str, since_ms: int = None, rate_limited: list = None,
+                 deadline: float = None):
+    rate_limited = [] if rate_limited is None else rate_limited
+    floor = data_extraction.history_floor(since_ms)
+    headers = {"Authorization": f"Bearer {bearer}"}
+
+    async def fetch_page(token):
+        # start_time filters server-side; page_limits re-checks the exclusive bound
+        url = data_extraction.twitter_timeline_url(twitter_id, floor or None, token)
+        return await _get_json(session, url, headers, "twitter", "twitter", rate_limited, deadline)
+
+    return _paginate(fetch_page, data_extraction.parse_tweets, data_extraction.twitter_next_cursor, floor)
+
+
+def iter_tweets(session, twitter_id: str, bearer: str, since_ms: int = None, rate_limited: list = None):
+    """Async generator of a user's tweets, newest first, as pages arrive."""
+    return _flatten(_tweet_pages(session, twitter_id, bearer, since_ms, rate_limited))
+
+
+async def extract_twitter_text_async(session, tokens_task, deadline: float, timed_out: list, since_ms: int = None,
+                                     rate_limited: list = None, on_items=None):
+    rate_limited = [] if rate_limited is None else rate_limited
+    tokens = await _load_tokens(tokens_task, "twitter", deadline)
+    if not tokens:
+        return []
+
+    bearer = data_extraction.twitter_bearer_token()
+    if not bearer:
+        logger.error("❌ No Twitter bearer token loaded")
+        return []
+
+    twitter_id = tokens.get("twitterId")
+    results = await _collect("twitter", _tweet_pages(session, twitter_id, bearer, since_ms, rate_limited, deadline),
+                             deadline, timed_out, on_items)
+
+    logger.info(f"🔵 Twitter extracted {len(results)} items")
+    return results
+
+
+# -------------------------------------------------------------
+# 🟢 SPOTIFY
+# -------------------------------------------------------------
+async def extract_spotify_text_async(session, tokens_task, deadline: float, timed_out: list, since_ms: int = None,
+                                     rate_limited: list = None, on_items=None):
+    rate_limited = [] if rate_limited is None else rate_limited
+    tokens = await _load_tokens(tokens_task, "spotify", deadline)
+    if not tokens:
+        return []
+
+    access = tokens.get("access_token")
+    if not access:
+        return []
+
+    url = "https://api.spotify.com/v1/me/player/recently-played?limit=20"
+    if since_ms:
+        url += f"&after={int(since_ms)}"
+    headers = {"Authorization": f"Bearer {access}"}
+
+    async def fetch():
+        data = await _get_json(session, url, headers, "spotify", "spotify", rate_limited, deadline)
+        return _newer_than(data_extraction.parse_spotify_items(data), since_ms)
+
+    results = await _endpoint("spotify", fetch(), deadline, timed_out, on_items)
+
+    logger.info(f"🟢 Spotify extracted {len(results)} items")
+    return results
+
+
+# -------------------------------------------------------------
+# 🔥 MERGE ALL SOURCES (CONCURRENT)
+# -------------------------------------------------------------
+async def _run_source(name: str, coro, timed_out: list):
+    try:
+        return await coro
+    except asyncio.TimeoutError:
+        logger.warning(f"⏱ {name} token read missed the extraction deadline")
+        timed_out.append(name)
+    except Exception as e:
+        logger.error(f"❌ {name} extraction failed: {e}")
+    return []
+
+
+async def extract_all_sources_async(user_id: str, timeout: float = None, since: dict = None, on_items=None):
+    """
+    Async counterpart of data_extraction.extract_all_sources.
+    `timeout` is the per-source deadline in seconds (config default when None).
+    `since` maps source → watermark (epoch ms); incremental fetches never
+    substitute fallback data, an empty `items` means nothing new.
+    `on_items` (coroutine function) receives each page/batch of items as soon
+    as it arrives, from whichever source answers first. It should return
+    quickly: time spent in it counts against the source's deadline. Fallback
+    data is never passed to it.
+    """
+    timeout = config.EXTRACTION_SOURCE_TIMEOUT if timeout is None else timeout
+    since = since or {}
+    deadline = asyncio.get_running_loop().time() + timeout
+    timed_out, rate_limited = [], []
+
+    session = get_async_session()
+    tokens_task = asyncio.ensure_future(run_blocking(data_extraction.load_user_tokens, user_id))
+    reddit_data, twitter_data, spotify_data = await asyncio.gather(
+        _run_source("reddit", extract_reddit_text_async(
+            session, tokens_task, deadline, timed_out, since.get("reddit"), rate_limited, on_items), timed_out),
+        _run_source("twitter", extract_twitter_text_async(
+            session, tokens_task, deadline, timed_out, since.get("twitter"), rate_limited, on_items), timed_out),
+        _run_source("spotify", extract_spotify_text_async(
+            session, tokens_task, deadline, timed_out, since.get("spotify"), rate_limited, on_items), timed_out),
+    )
+
+    combined = reddit_data + twitter_data + spotify_data
+    combined.sort(key=lambda x: x["timestamp"], reverse=True)
+    if not combined and not since:
+        combined = data_extraction.fallback_data()
+
+    return {
+        "reddit": len(reddit_data),
+        "twitter": len(twitter_data),
+        "spotify": len(spotify_data),
+        "timed_out": timed_out,
+        "rate_limited": rate_limited,
+        "items": combined,
+    }
@@ -0,0 +1,293 @@
+# components/pipeline/bulk.py
+"""
+Bulk (cohort) re-analysis, e.g. after a model update.
+
+Extraction runs for up to ``parallelism`` users at once; as users finish
+extracting, their texts are pooled into large shared scoring batches (one
+clean + predict_dual call over many users), and every user's Firestore
+writes are packed into shared batched commits. A JSON checkpoint records
+which users are committed so an interrupted run resumes where it stopped.
+A lock file next to it keeps two processes (workers or CLI runs) from
+driving the same checkpoint at once.
+
+Used by POST /predict/batch and by the CLI:
+
+    python -m components.pipeline.bulk --all --parallelism 8 --checkpoint ./checkpoints/retrain.json
+"""
+
+import argparse
+import asyncio
+import fcntl
+import json
+import os
+import sys
+import time
+
+from components.logger import logger
+from components.pipeline import analysis
+from components.pipeline import config
+from components.pipeline import insight_store
+from components.pipeline.executor import Saturated, run_blocking
+
+_END = object()
+
+
+class CheckpointBusy(Exception):
+    """Another process holds the checkpoint's lock."""
+    status_code = 409
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.detail = f"Checkpoint {os.path.basename(path)} is in use by another bulk run."
+
+
+class Checkpoint:
+    """Completed/failed users of a bulk run, persisted as JSON (no path → in memory only)."""
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.done = {}
+        self.failed = {}
+        self._lock = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._lock = open(f"{path}.lock", "w")
+            try:
+                fcntl.flock(self._lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self._lock.close()
+                raise CheckpointBusy(path)
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.done = dict(data.get("done") or {})
+            # failed users are retried on resume
+        logger.info(f"📍 Bulk checkpoint {path}: {len(self.done)} users already done")
+
+    def mark_done(self, user_id: str, status: str = "saved"):
+        self.done[user_id] = status
+        self.failed.pop(user_id, None)
+
+    def mark_failed(self, user_id: str, error: str):
+        self.failed[user_id] = error
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"done": self.done, "failed": self.failed, "updated_at": time.time()}, f)
+        os.replace(tmp, self.path)
+
+    def release(self):
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+
+def _stored_as_items(entries: list) -> list:
+    return [
+        {"text": e["raw_text"], "timestamp": e["timestamp"], "source": e.get("source")}
+        for e in entries
+        if e.get("raw_text")
+    ]
+
+
+def _score_and_stage(predictor, ctxs: list, writer: insight_store.BatchWriter, checkpoint: Checkpoint) -> int:
+    """Blocking: score the pooled texts of `ctxs`, then queue every user's writes."""
+    items = [item for ctx in ctxs if not ctx["cached"] for item in ctx["raw_items"]]
+    scored = analysis.score_items(predictor, items)
+
+    def save(user_id, summary, watermarks, stored):
+        ops, _ = insight_store.plan(
+            user_id,
+            analysis.to_native(summary["text_level_analysis"]),
+            stored,
+            analysis.user_update(summary, watermarks),
+        )
+        writer.add(user_id, ops)
+
+    offset = 0
+    for ctx in ctxs:
+        user_id = ctx["user_id"]
+        if ctx["cached"]:
+            checkpoint.mark_done(user_id, "unchanged")
+            continue
+        part = scored[offset : offset + len(ctx["raw_items"])]
+        offset += len(ctx["raw_items"])
+        try:
+            analysis.finish_analysis(ctx, part, save=save)
+        except Exception as e:
+            logger.error(f"❌ Bulk save failed for {user_id}: {e}")
+            checkpoint.mark_failed(user_id, f"{type(e).__name__}: {e}")
+    return len(items)
+
+
+async def _begin(user_id: str, incremental_mode: bool, admission):
+    """begin_analysis, inside an admission slot when the run shares a server with /predict."""
+    if admission is None:
+        return await analysis.begin_analysis(user_id, incremental_mode)
+    while True:
+        try:
+            async with admission.slot(user_id):
+                return await analysis.begin_analysis(user_id, incremental_mode)
+        except Saturated as e:
+            # background work waits its turn instead of failing the user
+            await asyncio.sleep(e.retry_after)
+
+
+async def run_bulk(
+    predictor,
+    user_ids: list,
+    parallelism: int = None,
+    incremental_mode: bool = None,
+    rescore: bool = True,
+    checkpoint_path: str = None,
+    score_batch: int = None,
+    progress=None,
+    admission=None,
+) -> dict:
+    """
+    rescore: also re-score each user's stored entries (needed after a model
+    change; unchanged predictions are still not rewritten).
+    progress: optional callable(stage, data) as in run_analysis.
+    admission: optional executor.AdmissionController; each user's extraction
+    then takes a slot like a /predict request does.
+    """
+    parallelism = max(1, parallelism or config.BULK_PARALLELISM)
+    score_batch = score_batch or config.BULK_SCORE_TEXTS
+    started = time.monotonic()
+
+    checkpoint = Checkpoint(checkpoint_path)
+    user_ids = list(dict.fromkeys(user_ids))
+    todo = [u for u in user_ids if u not in checkpoint.done]
+    writer = insight_store.BatchWriter(on_committed=checkpoint.mark_done)
+
+    ready: asyncio.Queue = asyncio.Queue()
+    limit = asyncio.Semaphore(parallelism)
+    extracted = 0
+
+    async def extract(user_id: str):
+        nonlocal extracted
+        async with limit:
+            try:
+                ctx = await _begin(user_id, incremental_mode, admission)
+                if rescore and ctx["state"] is not None and ctx["state"]["items"]:
+                    ctx["raw_items"] = ctx["raw_items"] + _stored_as_items(ctx["state"]["items"])
+                    ctx["cached"] = False
+                await ready.put(ctx)
+            except analysis.NoDataError:
+                checkpoint.mark_done(user_id, "no_data")
+            except Exception as e:
+                logger.error(f"❌ Bulk extraction failed for {user_id}: {e}")
+                checkpoint.mark_failed(user_id, f"{type(e).__name__}: {e}")
+            finally:
+                extracted += 1
+                analysis._emit(progress, "fetched", done=extracted, total=len(todo))
+
+    async def produce():
+        await asyncio.gather(*(extract(u) for u in todo))
+        await ready.put(_END)
+
+    producer = asyncio.create_task(produce())
+    texts = 0
+    try:
+        finished = False
+        while not finished:
+            pending, n_texts = [], 0
+            # pool users until the scoring batch is big enough or extraction is over
+            while n_texts < score_batch:
+                ctx = await ready.get()
+                if ctx is _END:
+                    finished = True
+                    break
+                pending.append(ctx)
+                n_texts += 0 if ctx["cached"] else len(ctx["raw_items"])
+            if pending:
+                texts += await run_blocking(_score_and_stage, predictor, pending, writer, checkpoint)
+                await run_blocking(checkpoint.save)
+                analysis._emit(progress, "scored", users=len(checkpoint.done), texts=texts)
+
+        await run_blocking(writer.flush)
+    finally:
+        producer.cancel()
+        await run_blocking(checkpoint.save)
+        checkpoint.release()
+
+    result = {
+        "users": len(user_ids),
+        "skipped": len(user_ids) - len(todo),
+        "done": sum(1 for u in todo if u in checkpoint.done),
+        "no_data": sum(1 for u in todo if checkpoint.done.get(u) == "no_data"),
+        "failed": dict(checkpoint.failed),
+        "texts_scored": texts,
+        "commits": writer.commits,
+        "seconds": round(time.monotonic() - started, 3),
+    }
+    analysis._emit(progress, "saved", **{k: v for k, v in result.items() if k != "failed"})
+    logger.info(f"✅ Bulk analysis finished: {result}")
+    return result
+
+
+# =========================================================
+# 🖥️ CLI
+# =========================================================
+def _all_user_ids() -> list:
+    from components.firebase_client import db
+    return [snap.id for snap in db.collection("users").select([]).stream()]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk re-analysis for many users")
+    parser.add_argument("user_ids", nargs="*", help="user ids to analyse")
+    parser.add_argument("--file", help="file with one user id per line")
+    parser.add_argument("--all", action="store_true", help="every document in the users collection")
+    parser.add_argument("--parallelism", type=int, default=config.BULK_PARALLELISM,
+                        help="users extracted concurrently")
+    parser.add_argument("--score-batch", type=int, default=config.BULK_SCORE_TEXTS,
+                        help="texts pooled per scoring call")
+    parser.add_argument("--checkpoint", help="JSON checkpoint path; rerun with the same path to resume")
+    parser.add_argument("--no-rescore", action="store_true", help="only score items newer than the watermark")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--incremental", dest="incremental", action="store_true", default=None)
+    mode.add_argument("--full", dest="incremental", action="store_false")
+    args = parser.parse_args(argv)
+
+    user_ids = list(args.user_ids)
+    if args.file:
+        with open(args.file) as f:
+            user_ids.extend(line.strip() for line in f if line.strip())
+    if args.all:
+        user_ids.extend(_all_user_ids())
+    if not user_ids:
+        parser.error("no user ids (pass ids, --file or --all)")
+
+    from components import train_test_data
+    from components.pipeline import data_preprocessing, http_client
+
+    data_preprocessing.ensure_nltk_resources()
+    predictor = train_test_data.build_predictor()
+
+    try:
+        result = http_client.run(run_bulk(
+            predictor,
+            user_ids,
+            parallelism=args.parallelism,
+            incremental_mode=args.incremental,
+            rescore=not args.no_rescore,
+            checkpoint_path=args.checkpoint,
+            score_batch=args.score_batch,
+            progress=lambda stage, data: print(f"[{stage}] {data}", file=sys.stderr),
+        ))
+    except CheckpointBusy as e:
+        print(e.detail, file=sys.stderr)
+        return 2
+    finally:
+        data_preprocessing.shutdown_pool()
+    print(json.dumps(result, indent=2))
+    return 1 if result["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -40,6 +40,202 @@ SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 SPOTIFY_REDIRECT_URI = os.getenv("SPOTIFY_REDIRECT_URI")
 
+# ------------------------------
+# ⚡ EXTRACTION ENGINE
+# ------------------------------
+# Wall-clock budget per source (token read + HTTP). Sources that miss it
+# contribute whatever they already fetched.
+EXTRACTION_SOURCE_TIMEOUT = float(os.getenv("EXTRACTION_SOURCE_TIMEOUT", "8"))
+EXTRACTION_HTTP_TIMEOUT = float(os.getenv("EXTRACTION_HTTP_TIMEOUT", "10"))
+
+# Keep-alive connection pools (one pool per upstream host)
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "4"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+
+# History depth per Reddit listing / Twitter timeline: pages are followed
+# (Reddit `after`, Twitter `pagination_token`) until one of these caps is hit,
+# the listing ends, or the items reach the incremental watermark
+HISTORY_MAX_ITEMS = int(os.getenv("HISTORY_MAX_ITEMS", "500"))
+HISTORY_MAX_PAGES = int(os.getenv("HISTORY_MAX_PAGES", "10"))
+# Ignore items older than this many days (0 = no time limit)
+HISTORY_WINDOW_DAYS = float(os.getenv("HISTORY_WINDOW_DAYS", "365"))
+REDDIT_PAGE_SIZE = int(os.getenv("REDDIT_PAGE_SIZE", "100"))
+TWITTER_PAGE_SIZE = int(os.getenv("TWITTER_PAGE_SIZE", "100"))
+
+# Upstream requests/second per source (token bucket, per process; 0 = unlimited).
+# Reddit and Twitter both allow ~100 requests/minute. One user costs up to
+# HISTORY_MAX_PAGES requests per listing (Reddit has two), so burst + rate ×
+# EXTRACTION_SOURCE_TIMEOUT should cover that (10 + 1.5 × 8 = 22 ≥ 2 × 10).
+# Requests that can't get a slot before the deadline are refused and served
+# from the response cache.
+UPSTREAM_RATE_LIMITS = {
+    "reddit": float(os.getenv("REDDIT_RATE_LIMIT", "1.5")),
+    "twitter": float(os.getenv("TWITTER_RATE_LIMIT", "1.5")),
+    "spotify": float(os.getenv("SPOTIFY_RATE_LIMIT", "5")),
+}
+UPSTREAM_RATE_BURST = int(os.getenv("UPSTREAM_RATE_BURST", "10"))
+# Retries on 429/5xx (jittered exponential backoff unless Retry-After says otherwise)
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "4"))
+# A longer Retry-After is not waited out; cached data is used instead
+HTTP_MAX_RETRY_WAIT = float(os.getenv("HTTP_MAX_RETRY_WAIT", "3"))
+# Upstream JSON responses: served as-is for HTTP_CACHE_TTL seconds, then
+# revalidated (ETag / Last-Modified); served stale while rate limited for up
+# to HTTP_CACHE_STALE_TTL seconds
+HTTP_CACHE_TTL = float(os.getenv("HTTP_CACHE_TTL", "60"))
+HTTP_CACHE_STALE_TTL = float(os.getenv("HTTP_CACHE_STALE_TTL", "3600"))
+HTTP_CACHE_SIZE = int(os.getenv("HTTP_CACHE_SIZE", "2048"))
+
+# Per-user OAuth token documents are cached briefly after one batched read
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "30"))
+
+# ------------------------------
+# 🚦 CONCURRENCY / ADMISSION CONTROL
+# ------------------------------
+# Analyses allowed to run at once; more wait in a bounded queue
+PIPELINE_CONCURRENCY = int(os.getenv("PIPELINE_CONCURRENCY", "4"))
+PIPELINE_MAX_QUEUE = int(os.getenv("PIPELINE_MAX_QUEUE", "16"))
+# Seconds a queued request may wait for a slot before a 503
+PIPELINE_QUEUE_TIMEOUT = float(os.getenv("PIPELINE_QUEUE_TIMEOUT", "30"))
+# Threads for blocking stages (Firestore, cleaning, inference)
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", str(PIPELINE_CONCURRENCY * 2)))
+
+# ------------------------------
+# 📨 BACKGROUND JOBS
+# ------------------------------
+# Jobs (POST /jobs, POST /predict/batch) live in the memory of the worker that
+# started them, so with several workers a GET /jobs/{id} can land on a worker
+# that doesn't know the job. The job endpoints are therefore off when
+# WEB_CONCURRENCY > 1 (gunicorn / uvicorn --workers); set JOBS_ENABLED=1 only
+# behind sticky routing, or serve them from a separate single-worker instance.
+SERVER_WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+JOBS_ENABLED = os.getenv("JOBS_ENABLED", "1" if SERVER_WORKERS <= 1 else "0") == "1"
+# Finished jobs stay queryable for this many seconds
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "600"))
+# Progress events kept per job for SSE replay (older ones are dropped)
+JOB_MAX_EVENTS = int(os.getenv("JOB_MAX_EVENTS", "256"))
+# Texts per predict_dual call when progress is reported (scored N/M)
+SCORING_CHUNK_SIZE = int(os.getenv("SCORING_CHUNK_SIZE", "64"))
+# /predict pipeline: "phased" (extract all → clean all → score all) or
+# "overlapped" (pages are cleaned and scored while other sources still fetch)
+ANALYSIS_PIPELINE = os.getenv("ANALYSIS_PIPELINE", "phased")
+# Cleaned batches buffered before the overlapped cleaning stage waits for inference
+OVERLAP_QUEUE_SIZE = int(os.getenv("OVERLAP_QUEUE_SIZE", "4"))
+
+# ------------------------------
+# 📦 BULK RE-ANALYSIS
+# ------------------------------
+# Users extracted concurrently by /predict/batch and the bulk CLI
+BULK_PARALLELISM = int(os.getenv("BULK_PARALLELISM", "8"))
+# Texts pooled across users into one scoring call
+BULK_SCORE_TEXTS = int(os.getenv("BULK_SCORE_TEXTS", "2048"))
+# Where named /predict/batch checkpoints are kept
+BULK_CHECKPOINT_DIR = os.getenv("BULK_CHECKPOINT_DIR", "./checkpoints")
+
+# ------------------------------
+# 🧪 OFFLINE SCORING
+# ------------------------------
+# Rows read, cleaned and scored per chunk by `python -m components.pipeline.offline_scoring`
+OFFLINE_CHUNK_SIZE = int(os.getenv("OFFLINE_CHUNK_SIZE", "4096"))
+
+# ------------------------------
+# 🔁 INCREMENTAL ANALYSIS
+# ------------------------------
+# Only fetch/score items newer than the stored per-source watermark and merge
+# them into the stored insights. Off by default; requests may opt in per call.
+INCREMENTAL_ANALYSIS = os.getenv("INCREMENTAL_ANALYSIS", "0") == "1"
+# Upper bound on scored items kept per user after merging
+INCREMENTAL_MAX_ITEMS = int(os.getenv("INCREMENTAL_MAX_ITEMS", "500"))
+
+# ------------------------------
+# 🗂️ INSIGHT STORAGE
+# ------------------------------
+# Per-text insights live in users/{id}/<subcollection>, one doc per text
+INSIGHTS_SUBCOLLECTION = os.getenv("INSIGHTS_SUBCOLLECTION", "insights")
+# Writes/deletes per batched commit (Firestore caps a batch at 500)
+INSIGHTS_BATCH_SIZE = int(os.getenv("INSIGHTS_BATCH_SIZE", "400"))
+
+# ------------------------------
+# 🗃️ PREDICTION CACHE
+# ------------------------------
+# In-memory LRU entries (0 disables the memory tier)
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+# Optional SQLite file for a persistent tier, e.g. ./cache/predictions.sqlite
+PREDICTION_CACHE_PATH = os.getenv("PREDICTION_CACHE_PATH") or None
+
+# ------------------------------
+# 🧹 PREPROCESSING
+# ------------------------------
+# Process-pool workers for advanced_clean (0/1 = serial)
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", "0"))
+# Batches smaller than this are cleaned serially (pool overhead dominates)
+PREPROCESS_MIN_PARALLEL = int(os.getenv("PREPROCESS_MIN_PARALLEL", "64"))
+PREPROCESS_CHUNK_SIZE = int(os.getenv("PREPROCESS_CHUNK_SIZE", "64"))
+# NLTK corpora bundled with the service (checked before ~/nltk_new_data)
+NLTK_DATA_DIR = os.getenv(
+    "NLTK_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "nltk_data"),
+)
+# Allow fetching missing corpora from the network at startup
+NLTK_ALLOW_DOWNLOAD = os.getenv("NLTK_ALLOW_DOWNLOAD", "0") == "1"
+# Bounded (word, POS) → lemma memo shared by all cleaning calls
+LEMMA_CACHE_SIZE = int(os.getenv("LEMMA_CACHE_SIZE", "100000"))
+
+# ------------------------------
+# 🧠 INFERENCE
+# ------------------------------
+ML_MODEL_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MH_MODEL_DIR = os.getenv("MH_MODEL_DIR", os.path.join(ML_MODEL_DIR, "models", "fine_tuned_mentalbert"))
+SENT_MODEL_PATH = os.getenv("SENT_MODEL_PATH", os.path.join(ML_MODEL_DIR, "models", "sentiment_model", "model.pkl"))
+SENT_VEC_PATH = os.getenv("SENT_VEC_PATH", os.path.join(ML_MODEL_DIR, "models", "sentiment_model", "vectorizer.pkl"))
+# Texts are length-sorted and batched to a padded-token budget (rows × longest
+# row); INFERENCE_BATCH_SIZE only caps the row count of a single forward pass.
+INFERENCE_TOKEN_BUDGET = int(os.getenv("INFERENCE_TOKEN_BUDGET", "4096"))
+INFERENCE_BATCH_SIZE = int(os.getenv("INFERENCE_BATCH_SIZE", "64"))
+# Coalesce texts from concurrent requests into shared forward passes
+INFERENCE_SCHEDULER = os.getenv("INFERENCE_SCHEDULER", "1") == "1"
+SCHEDULER_MAX_BATCH = int(os.getenv("SCHEDULER_MAX_BATCH", "32"))
+SCHEDULER_MAX_WAIT_MS = float(os.getenv("SCHEDULER_MAX_WAIT_MS", "10"))
+# eager | eager-int8 | onnx | onnx-int8 (ONNX needs `onnxruntime`)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "eager")
+# 0 = library default
+INTRA_OP_THREADS = int(os.getenv("INTRA_OP_THREADS", "0"))
+INTER_OP_THREADS = int(os.getenv("INTER_OP_THREADS", "0"))
+# Where ONNX exports are cached (per model version)
+BACKEND_CACHE_DIR = os.getenv("BACKEND_CACHE_DIR") or None
+# Parity check of a non-eager backend against eager PyTorch at startup, over
+# BACKEND_PARITY_PROBES texts: minimum argmax agreement, and the largest
+# |Δlogit| allowed for 99% of the probes
+BACKEND_PARITY_PROBES = int(os.getenv("BACKEND_PARITY_PROBES", "256"))
+BACKEND_PARITY_MIN_AGREEMENT = float(os.getenv("BACKEND_PARITY_MIN_AGREEMENT", "0.97"))
+BACKEND_PARITY_MAX_LOGIT_DIFF = float(os.getenv("BACKEND_PARITY_MAX_LOGIT_DIFF", "0.5"))
+# Cascade: a linear model over the sentiment vectorizer features labels the
+# easy texts; only low-confidence / risk-flagged ones reach the transformer.
+# Fit the linear stage with `python -m components.cascade`.
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "0") == "1"
+CASCADE_MODEL_PATH = os.getenv("CASCADE_MODEL_PATH", os.path.join(ML_MODEL_DIR, "models", "cascade", "model.pkl"))
+# Minimum top-class probability to keep the linear stage's label
+CASCADE_THRESHOLD = float(os.getenv("CASCADE_THRESHOLD", "0.9"))
+
+# ------------------------------
+# 🚦 STARTUP
+# ------------------------------
+# Load models in the background (0) or block app startup until ready (1)
+STARTUP_BLOCKING = os.getenv("STARTUP_BLOCKING", "0") == "1"
+# gunicorn (gunicorn.conf.py): load the models in the master before forking so
+# workers share one copy of the weights
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "1") == "1"
+
+# ------------------------------
+# 📈 OBSERVABILITY
+# ------------------------------
+# Expose Prometheus metrics at GET /metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Add a per-request stage breakdown as a Server-Timing response header
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "0") == "1"
+
 # ------------------------------
 # 🌐 FIREBASE CLIENT SDK (Optional)
 # ------------------------------
@@ -1,22 +1,211 @@
 # components/pipeline/data_extraction.py
 import praw
 import pytz
-import requests
+import threading
+import time
 from datetime import datetime
 from components.logger import logger
+from components import metrics
 from components.firebase_client import db
 from components.pipeline import config
+from components.pipeline import upstream
 import urllib.parse
 
+TOKEN_PROVIDERS = ("reddit", "twitter", "spotify")
+
+# -------------------------------------------------------------
+# 🔹 RESPONSE PARSERS (shared by the sync and async extractors)
+# -------------------------------------------------------------
+def _iso_to_ms(value: str) -> int:
+    return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000)
+
+
+def parse_reddit_posts(data: dict):
+    results = []
+    for item in data.get("data", {}).get("children", []):
+        post = item.get("data", {})
+        text = f"{post.get('title','')} {post.get('selftext','')}".strip()
+        ts = int(post.get("created_utc", 0) * 1000)
+
+        if text:
+            results.append({
+                "text": text,
+                "timestamp": ts,
+                "source": "reddit"
+            })
+    return results
+
+
+def parse_reddit_comments(data: dict):
+    results = []
+    for item in data.get("data", {}).get("children", []):
+        c = item.get("data", {})
+        body = c.get("body", "")
+        parent_title = c.get("link_title", "(Post)")
+        ts = int(c.get("created_utc", 0) * 1000)
+
+        if body:
+            merged = f"{body} (On post: {parent_title})"
+            results.append({
+                "text": merged,
+                "timestamp": ts,
+                "source": "reddit"
+            })
+    return results
+
+
+def parse_tweets(data: dict):
+    results = []
+    for t in data.get("data", []):
+        if "created_at" not in t:
+            continue
+
+        results.append({
+            "source": "twitter",
+            "text": t.get("text", ""),
+            "timestamp": _iso_to_ms(t["created_at"])
+        })
+    return results
+
+
+def parse_spotify_items(data: dict):
+    results = []
+    for item in data.get("items", []):
+        track = item.get("track", {})
+        name = track.get("name")
+        artists = ", ".join([a.get("name", "") for a in track.get("artists", [])])
+        played_at = item.get("played_at")
+
+        if not name or not played_at:
+            continue
+
+        results.append({
+            "source": "spotify",
+            "text": f"Listened to {name} by {artists}",
+            "timestamp": _iso_to_ms(played_at)
+        })
+    return results
+
+
+# -------------------------------------------------------------
+# 🔹 PAGINATION (shared by the sync and async extractors)
+# -------------------------------------------------------------
+def reddit_listing_url(username: str, kind: str, after: str = None) -> str:
+    url = f"https://www.reddit.com/user/{username}/{kind}.json?sort=new&limit={config.REDDIT_PAGE_SIZE}"
+    if after:
+        url += f"&after={after}"
+    return url
+
+
+def reddit_next_cursor(data: dict):
+    return (data.get("data") or {}).get("after")
+
+
+def twitter_timeline_url(twitter_id: str, start_ms: int = None, pagination_token: str = None) -> str:
+    url = (f"https://api.twitter.com/2/users/{twitter_id}/tweets"
+           f"?max_results={config.TWITTER_PAGE_SIZE}&tweet.fields=created_at")
+    if start_ms:
+        start = datetime.fromtimestamp(start_ms // 1000, tz=pytz.utc)
+        url += f"&start_time={start.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+    if pagination_token:
+        url += f"&pagination_token={pagination_token}"
+    return url
+
+
+def twitter_next_cursor(data: dict):
+    return (data.get("meta") or {}).get("next_token")
+
+
+def history_floor(since_ms: int = None) -> int:
+    """Oldest timestamp (ms, exclusive) worth fetching: the watermark or the history window."""
+    floor = since_ms or 0
+    if config.HISTORY_WINDOW_DAYS > 0:
+        window_start = int((time.time() - config.HISTORY_WINDOW_DAYS * 86400) * 1000)
+        floor = max(floor, window_start)
+    return floor
+
+
+def page_limits(items: list, floor_ms: int, budget: int):
+    """
+    Trim one newest-first page to items newer than floor_ms and within the
+    remaining item budget. Returns (kept, exhausted): exhausted means older
+    pages can't contribute anything.
+    """
+    kept = [i for i in items if i["timestamp"] > floor_ms][:budget]
+    # judged by the page's last item: pinned posts can put an old one first
+    exhausted = len(kept) >= budget or bool(items and items[-1]["timestamp"] <= floor_ms)
+    return kept, exhausted
+
+
+def paginate_sync(fetch_page, parse, next_cursor, floor_ms: int):
+    """Blocking generator over a cursor-paginated listing (one page at a time)."""
+    budget = config.HISTORY_MAX_ITEMS
+    cursor = None
+    for _ in range(max(1, config.HISTORY_MAX_PAGES)):
+        data = fetch_page(cursor)
+        items, exhausted = page_limits(parse(data), floor_ms, budget)
+        budget -= len(items)
+        yield from items
+        cursor = next_cursor(data)
+        if exhausted or not cursor:
+            return
+
+
+def twitter_bearer_token() -> str:
+    raw_token = (getattr(config, "TWITTER_BEARER_TOKEN", "") or "").strip()
+    return urllib.parse.unquote(raw_token)
+
+
+# -------------------------------------------------------------
+# 🔹 BATCHED TOKEN LOADER (one Firestore round trip, short TTL cache)
+# -------------------------------------------------------------
+_token_cache = {}
+_token_cache_lock = threading.Lock()
+
+
+def load_user_tokens(user_id: str) -> dict:
+    """
+    Read users/{id}/tokens/{reddit,twitter,spotify} with a single get_all.
+    Returns {provider: dict | None}, cached for config.TOKEN_CACHE_TTL seconds.
+    """
+    now = time.monotonic()
+    with _token_cache_lock:
+        cached = _token_cache.get(user_id)
+        if cached and cached[0] > now:
+            metrics.CACHE_EVENTS.inc(cache="tokens", result="hit")
+            return cached[1]
+    metrics.CACHE_EVENTS.inc(cache="tokens", result="miss")
+
+    tokens_col = db.collection("users").document(user_id).collection("tokens")
+    refs = [tokens_col.document(p) for p in TOKEN_PROVIDERS]
+    tokens = {p: None for p in TOKEN_PROVIDERS}
+    with metrics.stage("firestore.tokens"):
+        for snap in db.get_all(refs):
+            if snap.exists:
+                tokens[snap.id] = snap.to_dict()
+
+    with _token_cache_lock:
+        _token_cache[user_id] = (now + config.TOKEN_CACHE_TTL, tokens)
+    return tokens
+
+
+def invalidate_user_tokens(user_id: str = None):
+    with _token_cache_lock:
+        if user_id is None:
+            _token_cache.clear()
+        else:
+            _token_cache.pop(user_id, None)
+
+
 # -------------------------------------------------------------
 # 🔹 REDDIT TOKEN LOADER
 # -------------------------------------------------------------
 def get_reddit_tokens(user_id: str):
-    snap = db.collection("users").document(user_id).collection("tokens").document("reddit").get()
-    if not snap.exists:
+    tokens = load_user_tokens(user_id).get("reddit")
+    if not tokens:
         logger.info("❌ Reddit tokens not found")
         return None
-    return snap.to_dict()
+    return tokens
 
 
 # -------------------------------------------------------------
@@ -36,6 +225,18 @@ def get_reddit_client(tokens: dict):
         return None
 
 
+# -------------------------------------------------------------
+# 🔹 SYNC FETCH (rate limiting, retries, response cache)
+# -------------------------------------------------------------
+def _get_json_sync(url: str, headers: dict, source: str):
+    """Rate-limited endpoints fall back to their last cached body ({} without one)."""
+    try:
+        return upstream.fetch_json_sync(url, headers, source)
+    except upstream.RateLimited as e:
+        metrics.UPSTREAM_ERRORS.inc(source=source, kind="rate_limited")
+        return e.cached if e.cached is not None else {}
+
+
 # -------------------------------------------------------------
 # 🔥 REDDIT EXTRACTION (FINAL WORKING VERSION)
 # -------------------------------------------------------------
@@ -52,23 +253,14 @@ def extract_reddit_text(user_id: str):
 
     results = []
 
+    def listing(kind):
+        return lambda after: _get_json_sync(
+            reddit_listing_url(username, kind, after), {"User-Agent": "Mozilla/5.0"}, "reddit"
+        )
+
     # ---- Fetch POSTS ----
     try:
-        url_posts = f"https://www.reddit.com/user/{username}/submitted.json"
-        res = requests.get(url_posts, headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
-        data = res.json()
-
-        for item in data.get("data", {}).get("children", []):
-            post = item.get("data", {})
-            text = f"{post.get('title','')} {post.get('selftext','')}".strip()
-            ts = int(post.get("created_utc", 0) * 1000)
-
-            if text:
-                results.append({
-                    "text": text,
-                    "timestamp": ts,
-                    "source": "reddit"
-                })
+        results.extend(paginate_sync(listing("submitted"), parse_reddit_posts, reddit_next_cursor, history_floor()))
 
         logger.info(f"🟠 Reddit posts extracted: {len(results)}")
 
@@ -77,23 +269,9 @@ def extract_reddit_text(user_id: str):
 
     # ---- Fetch COMMENTS ----
     try:
-        url_comments = f"https://www.reddit.com/user/{username}/comments.json"
-        res = requests.get(url_comments, headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
-        data = res.json()
-
-        for item in data.get("data", {}).get("children", []):
-            c = item.get("data", {})
-            body = c.get("body", "")
-            parent_title = c.get("link_title", "(Post)")
-            ts = int(c.get("created_utc", 0) * 1000)
-
-            if body:
-                merged = f"{body} (On post: {parent_title})"
-                results.append({
-                    "text": merged,
-                    "timestamp": ts,
-                    "source": "reddit"
-                })
+        results.extend(
+            paginate_sync(listing("comments"), parse_reddit_comments, reddit_next_cursor, history_floor())
+        )
 
         logger.info(f"🟠 Reddit total extracted (posts+comments): {len(results)}")
 
@@ -107,81 +285,42 @@ def extract_reddit_text(user_id: str):
 # 🔹 TWITTER TOKEN LOADER
 # -------------------------------------------------------------
 def get_twitter_tokens(user_id: str):
-    snap = db.collection("users").document(user_id).collection("tokens").document("twitter").get()
-    if not snap.exists:
-        return None
-    return snap.to_dict()
+    return load_user_tokens(user_id).get("twitter")
 
 
 # -------------------------------------------------------------
-# 🔹 TWITTER EXTRACTION (minimal fixes + rate-limit detection)
+# 🔹 TWITTER EXTRACTION (rate limits handled in upstream)
 # -------------------------------------------------------------
 def extract_twitter_text(user_id: str):
-    print("\n================ TWITTER EXTRACTION DEBUG ================")
-
     tokens = get_twitter_tokens(user_id)
-    print("Tokens from Firestore:", tokens)
-
     if not tokens:
-        print("No Twitter tokens → returning []")
+        logger.info("❌ No Twitter tokens found")
         return []
 
     twitter_id = tokens.get("twitterId")
-    print("Twitter ID:", twitter_id)
 
     # Load static bearer token
-    raw_token = getattr(config, "TWITTER_BEARER_TOKEN", "")
-    raw_token = raw_token.strip()
-    bearer = urllib.parse.unquote(raw_token)
-
-    print("Decoded token:", repr(bearer))
-
+    bearer = twitter_bearer_token()
     if not bearer:
-        print("No bearer token loaded!")
+        logger.error("❌ No Twitter bearer token loaded")
         return []
 
-    url = f"https://api.twitter.com/2/users/{twitter_id}/tweets?max_results=50&tweet.fields=created_at"
-    print("Final Twitter URL:", url)
+    floor = history_floor()
+    logger.debug(f"Twitter timeline: {twitter_timeline_url(twitter_id, floor or None)}")
 
     try:
         headers = {"Authorization": f"Bearer {bearer}"}
-        res = requests.get(url, headers=headers, timeout=10)
-
-        print("Twitter status:", res.status_code)
 
-        # 👉 Detect rate limit (429)
-        if res.status_code == 429:
-            print("❌ Twitter is blocking you (Rate Limit 429)")
-            print("Retry After:", res.headers.get("Retry-After"))
-            return [{"source": "twitter", "text": "TWITTER_RATE_LIMITED", "timestamp": int(datetime.now().timestamp()*1000)}]
+        def fetch_page(token):
+            return _get_json_sync(twitter_timeline_url(twitter_id, floor or None, token), headers, "twitter")
 
-        print("Twitter response text:", res.text[:400])
+        results = list(paginate_sync(fetch_page, parse_tweets, twitter_next_cursor, floor))
 
-        if res.status_code != 200:
-            print("Non-200 → returning []")
-            return []
-
-        data = res.json()
-        tweets = data.get("data", [])
-        print("Tweets found:", len(tweets))
-
-        results = []
-        for t in tweets:
-            if "created_at" not in t:
-                continue
-
-            ts = int(datetime.fromisoformat(t["created_at"].replace("Z", "+00:00")).timestamp() * 1000)
-            results.append({
-                "source": "twitter",
-                "text": t.get("text", ""),
-                "timestamp": ts
-            })
-
-        print("Final extracted tweets:", len(results))
+        logger.info(f"🔵 Twitter extracted {len(results)} tweets")
         return results
 
     except Exception as e:
-        print("TWITTER EXCEPTION:", str(e))
+        logger.error(f"❌ Twitter extraction failed: {e}")
         return []
 
 
@@ -189,10 +328,7 @@ def extract_twitter_text(user_id: str):
 # 🔹 SPOTIFY TOKEN LOADER
 # -------------------------------------------------------------
 def get_spotify_tokens(user_id: str):
-    snap = db.collection("users").document(user_id).collection("tokens").document("spotify").get()
-    if not snap.exists:
-        return None
-    return snap.to_dict()
+    return load_user_tokens(user_id).get("spotify")
 
 
 # -------------------------------------------------------------
@@ -210,27 +346,8 @@ def extract_spotify_text(user_id: str):
     try:
         url = "https://api.spotify.com/v1/me/player/recently-played?limit=20"
         headers = {"Authorization": f"Bearer {access}"}
-        data = requests.get(url, headers=headers, timeout=10).json()
-
-        items = data.get("items", [])
-        results = []
-
-        for item in items:
-            track = item.get("track", {})
-            name = track.get("name")
-            artists = ", ".join([a.get("name", "") for a in track.get("artists", [])])
-            played_at = item.get("played_at")
-
-            if not name or not played_at:
-                continue
-
-            ts = int(datetime.fromisoformat(played_at.replace("Z", "+00:00")).timestamp() * 1000)
-
-            results.append({
-                "source": "spotify",
-                "text": f"Listened to {name} by {artists}",
-                "timestamp": ts
-            })
+        data = _get_json_sync(url, headers, "spotify")
+        results = parse_spotify_items(data)
 
         logger.info(f"🟢 Spotify extracted {len(results)} items")
         return results
@@ -3,61 +3,160 @@
 # components/pipeline/data_preprocessing.py
 """
 Text cleaning & preprocessing — matches training pipeline.
-Uses local NLTK dir: ~/nltk_new_data
+NLTK data: bundled ml-model/nltk_data first, then ~/nltk_new_data.
+Populate the bundled dir once (needs network):
+    python -m components.pipeline.data_preprocessing
 """
 
 import os
 import ssl
 import re
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 import nltk
-from nltk.corpus import stopwords, wordnet
+from nltk.corpus import stopwords
+from nltk.corpus.reader.wordnet import ADJ, ADV, NOUN, VERB
 from nltk.stem import WordNetLemmatizer
 from nltk import pos_tag, word_tokenize
+from components.pipeline import config
 
-# Ensure local nltk folder is used (you already created it previously)
+# NLTK data search order: bundled dir (ml-model/nltk_data) → ~/nltk_new_data → NLTK defaults.
+# Nothing is probed or downloaded at import; see ensure_nltk_resources().
 NLTK_DIR = os.path.expanduser("~/nltk_new_data")
-os.makedirs(NLTK_DIR, exist_ok=True)
-nltk.data.path.append(NLTK_DIR)
-
-# macOS SSL fix for downloader (safe no-op if not needed)
-try:
-    ssl._create_default_https_context = ssl._create_unverified_context
-except Exception:
-    pass
-
-# Ensure required corpora are present (quiet)
-REQUIRED = ["stopwords", "punkt", "averaged_perceptron_tagger", "wordnet"]
-for pkg in REQUIRED:
+for _dir in reversed([config.NLTK_DATA_DIR, NLTK_DIR]):
+    if _dir not in nltk.data.path:
+        nltk.data.path.insert(0, _dir)
+
+# resource name → nltk.data path
+REQUIRED = {
+    "stopwords": "corpora/stopwords",
+    "punkt": "tokenizers/punkt",
+    "averaged_perceptron_tagger": "taggers/averaged_perceptron_tagger",
+    "wordnet": "corpora/wordnet",
+}
+
+STOP_WORDS = None
+_RESOURCES_LOCK = threading.Lock()
+_RESOURCES_READY = False
+
+
+def ensure_nltk_resources(allow_download: bool = None):
+    """
+    Locate (and, only if allowed, download) the NLTK corpora and load them once:
+    stopwords, the punkt tokenizer, the POS tagger and WordNet.
+    Offline by default — set NLTK_ALLOW_DOWNLOAD=1 or pre-populate the bundled
+    dir with `python -m components.pipeline.data_preprocessing`.
+    """
+    global STOP_WORDS, _RESOURCES_READY
+    if _RESOURCES_READY:
+        return
+    if allow_download is None:
+        allow_download = config.NLTK_ALLOW_DOWNLOAD
+
+    with _RESOURCES_LOCK:
+        if _RESOURCES_READY:
+            return
+        for pkg, path in REQUIRED.items():
+            try:
+                nltk.data.find(path)
+            except LookupError:
+                if not allow_download:
+                    raise LookupError(
+                        f"NLTK resource '{pkg}' not found in {nltk.data.path[:2]} "
+                        f"(set NLTK_ALLOW_DOWNLOAD=1 or bundle it in {config.NLTK_DATA_DIR})"
+                    )
+                _download(pkg, NLTK_DIR)
+
+        STOP_WORDS = set(stopwords.words("english"))
+        # touch the tagger + WordNet so the first request doesn't pay for loading them
+        pos_tag(word_tokenize("warm up the tagger"))
+        LEM.lemmatize("warming", VERB)
+        _RESOURCES_READY = True
+
+
+def _download(pkg: str, target: str):
+    os.makedirs(target, exist_ok=True)
+    # macOS SSL fix for downloader (safe no-op if not needed)
     try:
-        # punkt lives under tokenizers; others under corpora or taggers
-        if pkg == "punkt":
-            nltk.data.find(f"tokenizers/{pkg}")
-        elif pkg == "averaged_perceptron_tagger":
-            nltk.data.find(f"taggers/{pkg}")
-        else:
-            nltk.data.find(f"corpora/{pkg}")
-    except LookupError:
-        nltk.download(pkg, download_dir=NLTK_DIR, quiet=True)
-
-STOP_WORDS = set(stopwords.words("english"))
+        ssl._create_default_https_context = ssl._create_unverified_context
+    except Exception:
+        pass
+    nltk.download(pkg, download_dir=target, quiet=True)
+
+
+def _stop_words() -> set:
+    if not _RESOURCES_READY:
+        ensure_nltk_resources()
+    return STOP_WORDS
+
 LEM = WordNetLemmatizer()
 
+# Precompiled once — these run for every item of every request
+_URL_RE = re.compile(r"http\S+|www\.\S+")
+_MENTION_RE = re.compile(r"@\w+")
+_NON_ALPHA_RE = re.compile(r"[^a-z\s]")      # only letters + spaces
+_NON_ALPHA_APOS_RE = re.compile(r"[^a-z\s']")  # keep apostrophes (if you need)
+_SPACES_RE = re.compile(r"\s+")
+
+# Penn Treebank tag prefix → WordNet POS (anything else → adverb).
+# Reader constants, not `wordnet.X`, so the corpus isn't loaded at import.
+_WORDNET_POS = {"V": VERB, "N": NOUN, "J": ADJ}
+
+
+@lru_cache(maxsize=config.LEMMA_CACHE_SIZE)
+def _lemmatize(word: str, pos: str) -> str:
+    return LEM.lemmatize(word, pos)
+
+
+def lemma_cache_stats() -> dict:
+    info = _lemmatize.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+        "hit_rate": (info.hits / lookups) if lookups else 0.0,
+    }
+
+
+def _strip_links(text: str) -> str:
+    """Shared prefix of both cleaners: lowercase, drop URLs and @mentions."""
+    text = text.lower()
+    text = _URL_RE.sub(" ", text)
+    return _MENTION_RE.sub(" ", text)
+
+
+def _sentiment_base(stripped: str) -> str:
+    return _SPACES_RE.sub(" ", _NON_ALPHA_RE.sub(" ", stripped)).strip()
+
+
+def _mh_clean(stripped: str) -> str:
+    text = _SPACES_RE.sub(" ", _NON_ALPHA_APOS_RE.sub(" ", stripped)).strip()
+
+    stop_words = _stop_words()
+    out = []
+    for w, tag in pos_tag(word_tokenize(text)):
+        if w in stop_words:
+            continue
+        out.append(_lemmatize(w, _WORDNET_POS.get(tag[:1], ADV)))
+    return " ".join(out)
+
+
 def basic_clean(text: str) -> str:
     """Light cleaning used for sentiment pipeline."""
     if not isinstance(text, str):
         return ""
-    text = text.lower()
-    text = re.sub(r"http\S+|www\.\S+", " ", text)
-    text = re.sub(r"@\w+", " ", text)
-    text = re.sub(r"[^a-z\s]", " ", text)   # only letters + spaces
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+    return _sentiment_base(_strip_links(text))
 
 def clean_text(text: str) -> str:
     """Used for sentiment model (keeps simple tokens, removes stopwords)."""
     text = basic_clean(text)
     tokens = text.split()
-    filtered = [t for t in tokens if t not in STOP_WORDS]
+    stop_words = _stop_words()
+    filtered = [t for t in tokens if t not in stop_words]
     return " ".join(filtered)
 
 def clean_text_batch(texts):
@@ -67,31 +166,70 @@ def advanced_clean(text: str) -> str:
     """Advanced cleaning used for MH model: tokenization, POS-based lemmatization."""
     if not isinstance(text, str):
         return ""
-    text = text.lower()
-    text = re.sub(r"http\S+|www\.\S+", " ", text)
-    text = re.sub(r"@\w+", " ", text)
-    text = re.sub(r"[^a-z\s']", " ", text)   # keep apostrophes (if you need)
-    text = re.sub(r"\s+", " ", text).strip()
+    return _mh_clean(_strip_links(text))
 
-    tokens = word_tokenize(text)
-    tags = pos_tag(tokens)
+def clean_text_batch_v2(texts, workers: int = None):
+    """
+    advanced_clean over a batch. With workers > 1 (default: config.PREPROCESS_WORKERS)
+    large batches are split into chunks across a process pool; small batches
+    stay serial. Output is identical either way.
+    """
+    workers = config.PREPROCESS_WORKERS if workers is None else workers
+    texts = list(texts)
+    if workers <= 1 or len(texts) < config.PREPROCESS_MIN_PARALLEL:
+        return [advanced_clean(t) for t in texts]
 
+    chunk = max(1, min(config.PREPROCESS_CHUNK_SIZE, -(-len(texts) // workers)))
+    chunks = [texts[i : i + chunk] for i in range(0, len(texts), chunk)]
     out = []
-    for w, tag in tags:
-        if w in STOP_WORDS:
-            continue
-        # map tag to wordnet pos
-        if tag.startswith("V"):
-            p = wordnet.VERB
-        elif tag.startswith("N"):
-            p = wordnet.NOUN
-        elif tag.startswith("J"):
-            p = wordnet.ADJ
-        else:
-            p = wordnet.ADV
-        out.append(LEM.lemmatize(w, p))
+    for part in get_pool(workers).map(_clean_chunk, chunks):
+        out.extend(part)
+    return out
+
+
+# -------------------------------------------------------------
+# Process pool for clean_text_batch_v2
+# -------------------------------------------------------------
+_POOL = None
+_POOL_WORKERS = 0
+_POOL_LOCK = threading.Lock()
+
+
+def _init_worker():
+    """Load stopwords, the POS tagger and WordNet once per worker process."""
+    ensure_nltk_resources()
+
+
+def _clean_chunk(texts):
+    return [advanced_clean(t) for t in texts]
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    global _POOL, _POOL_WORKERS
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_WORKERS != workers:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False)
+            # spawn, not fork: the parent has torch/OpenMP threads running
+            _POOL = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            _POOL_WORKERS = workers
+        return _POOL
+
+
+def shutdown_pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=True)
+            _POOL = None
 
-    return " ".join(out)
 
-def clean_text_batch_v2(texts):
-    return [advanced_clean(t) for t in texts]
\ No newline at end of file
+if __name__ == "__main__":
+    # Build-time helper: download every required corpus into the bundled dir
+    for _pkg in REQUIRED:
+        _download(_pkg, config.NLTK_DATA_DIR)
+    print(f"NLTK resources saved to {config.NLTK_DATA_DIR}")
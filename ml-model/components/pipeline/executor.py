@@ -0,0 +1,107 @@
+# components/pipeline/executor.py
+"""
+Bounded execution for the analysis pipeline.
+
+* `run_blocking` runs blocking stages (Firestore, NLTK cleaning, torch) on a
+  dedicated, bounded thread pool so they never stall the event loop.
+* `AdmissionController` caps how many analyses run at once and how many may
+  wait for a slot; beyond that requests are rejected straight away with a
+  Retry-After hint instead of piling up behind one slow upstream.
+"""
+
+import asyncio
+import contextvars
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+
+from components.pipeline import config
+
+_EXECUTOR = ThreadPoolExecutor(
+    max_workers=config.PIPELINE_WORKERS,
+    thread_name_prefix="pipeline",
+)
+
+
+async def run_blocking(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # carry contextvars (request trace) into the worker thread, like asyncio.to_thread
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_EXECUTOR, partial(ctx.run, fn, *args, **kwargs))
+
+
+def shutdown_executor():
+    _EXECUTOR.shutdown(wait=False, cancel_futures=True)
+
+
+class Saturated(Exception):
+    """Request rejected by admission control (maps to HTTP 429/503 + Retry-After)."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._running = 0
+        self._active_keys = set()
+        # EWMA of slot hold time, used for the Retry-After estimate
+        self._avg_seconds = 5.0
+
+    def retry_after(self) -> int:
+        backlog = (self._waiting + 1) / max(self.max_concurrency, 1)
+        return int(min(max(math.ceil(self._avg_seconds * backlog), 1), 120))
+
+    @asynccontextmanager
+    async def slot(self, key: str):
+        if key in self._active_keys:
+            raise Saturated(429, "An analysis for this user is already running.", self.retry_after())
+
+        if not self._sem.locked():
+            # free slot: acquire() returns without suspending
+            await self._sem.acquire()
+            self._active_keys.add(key)
+        else:
+            if self._waiting >= self.max_queue:
+                raise Saturated(503, "Server busy, analysis queue is full.", self.retry_after())
+            self._active_keys.add(key)
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._sem.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._active_keys.discard(key)
+                raise Saturated(503, "Timed out waiting for an analysis slot.", self.retry_after())
+            except BaseException:
+                self._active_keys.discard(key)
+                raise
+            finally:
+                self._waiting -= 1
+
+        self._running += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.monotonic() - started)
+            self._running -= 1
+            self._active_keys.discard(key)
+            self._sem.release()
+
+    def stats(self) -> dict:
+        return {
+            "running": self._running,
+            "waiting": self._waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "avg_seconds": round(self._avg_seconds, 3),
+        }
@@ -0,0 +1,103 @@
+# components/pipeline/http_client.py
+"""
+Process-wide, connection-pooled HTTP clients for the extraction layer.
+
+Both clients keep connections alive per upstream host (reddit.com,
+api.twitter.com, api.spotify.com) so repeated /predict calls reuse TCP+TLS
+connections instead of paying a fresh handshake per request.
+
+aiohttp sessions belong to one event loop. Each loop gets its own session;
+whoever owns the loop closes it with `close_async_session()` before the loop
+ends (the FastAPI shutdown handler), or runs its coroutine through `run()`,
+which does that for short-lived loops (bulk CLI, worker threads).
+"""
+
+import asyncio
+import threading
+import weakref
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from components.pipeline import config
+
+_session = None
+_session_lock = threading.Lock()
+# loop → session. Weak keys: entries of loops that were closed without
+# close_async_session() are dropped, so the loop can be collected.
+_async_sessions = weakref.WeakKeyDictionary()
+_async_lock = threading.Lock()
+
+
+# -------------------------------------------------------------
+# 🔹 SYNC CLIENT (requests)
+# -------------------------------------------------------------
+def get_session() -> requests.Session:
+    """Shared requests.Session; urllib3 keeps one pool per host."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=config.HTTP_POOL_HOSTS,
+                    pool_maxsize=config.HTTP_POOL_SIZE,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+# -------------------------------------------------------------
+# 🔹 ASYNC CLIENT (aiohttp) — one session per event loop
+# -------------------------------------------------------------
+def _drop_closed_loops():
+    for loop in [loop for loop in list(_async_sessions) if loop.is_closed()]:
+        _async_sessions.pop(loop, None)
+
+
+def get_async_session() -> aiohttp.ClientSession:
+    loop = asyncio.get_running_loop()
+    with _async_lock:
+        session = _async_sessions.get(loop)
+        if session is None or session.closed:
+            _drop_closed_loops()
+            connector = aiohttp.TCPConnector(
+                limit=config.HTTP_POOL_SIZE * config.HTTP_POOL_HOSTS,
+                limit_per_host=config.HTTP_POOL_SIZE,
+                keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=300,
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=config.EXTRACTION_HTTP_TIMEOUT),
+            )
+            _async_sessions[loop] = session
+    return session
+
+
+async def close_async_session():
+    """Close the running loop's session (call before the loop shuts down)."""
+    with _async_lock:
+        session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+def run(main):
+    """asyncio.run(main), closing the loop's session before the loop is torn down."""
+    async def wrapper():
+        try:
+            return await main
+        finally:
+            await close_async_session()
+
+    return asyncio.run(wrapper())
+
+
+def close_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,95 @@
+# components/pipeline/incremental.py
+"""
+Incremental analysis state.
+
+Each user document keeps a per-source fetch watermark (latest item timestamp
+seen, epoch ms); the already-scored entries live in the insights subcollection
+(see insight_store). A run only fetches and scores items newer than the
+watermark and merges them into the stored list; when nothing is new the stored
+analysis is reused as-is. Per-day label counts and sentiment sums
+(``daily_aggregates``) are kept next to the watermarks, so the date-grouped
+summary is updated from the items that came in or dropped out instead of
+being recomputed over the whole list.
+"""
+
+from components.firebase_client import db
+from components.pipeline import config
+from components.pipeline import insight_store
+from components.pipeline.data_extraction import TOKEN_PROVIDERS
+
+# data_extraction.fallback_data() placeholder items: shown, never stored
+FALLBACK_SOURCE = "fallback"
+
+
+def load_state(user_id: str) -> dict:
+    """
+    Blocking Firestore read of the stored watermarks + scored items.
+    `stored` (insight id → fingerprint) lets the save only write what changed.
+    """
+    snap = db.collection("users").document(user_id).get()
+    data = snap.to_dict() if snap.exists else {}
+    data = data or {}
+
+    items, stored = insight_store.load(user_id, config.INCREMENTAL_MAX_ITEMS)
+    if not items and data.get("recent_text_insights"):
+        # not migrated yet: read the legacy list, the next save moves it over
+        items = list(data["recent_text_insights"])
+    return {
+        "watermarks": dict(data.get("fetch_watermarks") or {}),
+        # placeholders stored by older runs are dropped; `stored` still lists
+        # them, so the next save deletes them
+        "items": without_fallback(items),
+        # analysis_plot.DailyAggregator state over `items` (None before the first save)
+        "aggregates": data.get("daily_aggregates"),
+        "stored": stored,
+    }
+
+
+def select_new(items: list, watermarks: dict) -> list:
+    """Drop anything at or below the source's watermark (upstreams may re-send the boundary item)."""
+    return [
+        i for i in items
+        if i["timestamp"] > (watermarks.get(i.get("source")) or 0)
+    ]
+
+
+def advance_watermarks(watermarks: dict, items: list, timed_out: list) -> dict:
+    """
+    Move each source's watermark to its newest fetched item. Sources with a
+    timed-out or rate-limited endpoint keep their old watermark so the missed
+    items are picked up next run.
+    """
+    updated = dict(watermarks)
+    for item in items:
+        source = item.get("source")
+        if source not in TOKEN_PROVIDERS:
+            continue
+        if any(t == source or t.startswith(f"{source}.") for t in timed_out):
+            continue
+        if item["timestamp"] > (updated.get(source) or 0):
+            updated[source] = item["timestamp"]
+    return updated
+
+
+def without_fallback(entries: list) -> list:
+    return [e for e in entries if e.get("source") != FALLBACK_SOURCE]
+
+
+def _item_key(entry: dict):
+    return entry.get("source"), entry.get("timestamp"), entry.get("raw_text")
+
+
+def merge_items(stored: list, fresh: list, limit: int) -> list:
+    """
+    Newest-first union of stored and freshly scored entries, deduplicated and
+    capped. Fallback placeholders are left out: they get new timestamps every
+    run, so keeping them would add another copy each time.
+    """
+    merged, seen = [], set()
+    for entry in sorted(without_fallback(fresh + stored), key=lambda e: e.get("timestamp", 0), reverse=True):
+        key = _item_key(entry)
+        if key in seen:
+            continue
+        seen.add(key)
+        merged.append(entry)
+    return merged[:limit]
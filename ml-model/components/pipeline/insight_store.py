@@ -0,0 +1,199 @@
+# components/pipeline/insight_store.py
+"""
+Per-text insights stored as documents in ``users/{id}/insights``.
+
+Every scored entry gets a content-keyed document id (source, timestamp, raw
+text) plus a fingerprint of its scored fields. `sync` diffs the entries of a
+run against the stored fingerprints and only writes new/changed documents and
+deletes ones that fell out of the kept window, in batched commits; the user
+document itself only carries compact summaries.
+"""
+
+import hashlib
+import json
+
+from components import metrics
+from components.firebase_client import db
+from components.pipeline import config
+
+# Pre-subcollection layout: everything lived on the user document
+LEGACY_FIELDS = ("recent_text_insights", "mental_health_preds", "sentiment_preds")
+
+# Firestore rejects batches with more than 500 operations
+MAX_BATCH_OPS = 500
+
+
+def insight_id(entry: dict) -> str:
+    key = f"{entry.get('source')}\0{entry.get('timestamp')}\0{entry.get('raw_text')}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def fingerprint(entry: dict) -> str:
+    payload = json.dumps(entry, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _collection(user_id: str):
+    return db.collection("users").document(user_id).collection(config.INSIGHTS_SUBCOLLECTION)
+
+
+def load(user_id: str, limit: int = None):
+    """
+    Newest-first stored entries (blocking). Returns (entries, stored) where
+    stored maps document id → fingerprint.
+    """
+    query = _collection(user_id).order_by("timestamp", direction="DESCENDING")
+    if limit:
+        query = query.limit(limit)
+
+    entries, stored = [], {}
+    for snap in query.stream():
+        entry = snap.to_dict() or {}
+        stored[snap.id] = entry.pop("fp", None)
+        entries.append(entry)
+    return entries, stored
+
+
+def stored_fingerprints(user_id: str) -> dict:
+    """Document id → fingerprint, without transferring the insight bodies."""
+    return {snap.id: (snap.to_dict() or {}).get("fp") for snap in _collection(user_id).select(["fp"]).stream()}
+
+
+def plan(user_id: str, entries: list, stored: dict = None, user_update: dict = None):
+    """
+    Operations that make the subcollection hold exactly `entries`, touching
+    only what changed. `stored` (id → fingerprint) comes from `load`; it's read
+    here when None. `user_update` is applied to the user document last.
+    Returns (ops, counts).
+    """
+    if stored is None:
+        stored = stored_fingerprints(user_id)
+
+    col = _collection(user_id)
+    current = set()
+    ops = _set_ops(col, entries, stored, current)
+    written = len(ops)
+    ops.extend(_delete_ops(col, stored, current))
+    deleted = len(ops) - written
+    if user_update:
+        ops.append(("update", db.collection("users").document(user_id), user_update))
+
+    return ops, {"written": written, "deleted": deleted, "unchanged": len(current) - written}
+
+
+def _set_ops(col, entries: list, stored: dict, current: set) -> list:
+    """Writes for new/changed entries; ids seen before (in `current`) are skipped and added to it."""
+    ops = []
+    for entry in entries:
+        doc_id = insight_id(entry)
+        if doc_id in current:
+            continue
+        current.add(doc_id)
+        fp = fingerprint(entry)
+        if stored.get(doc_id) != fp:
+            ops.append(("set", col.document(doc_id), {**entry, "fp": fp}))
+    return ops
+
+
+def _delete_ops(col, stored: dict, current: set) -> list:
+    return [("delete", col.document(doc_id), None) for doc_id in stored if doc_id not in current]
+
+
+def _commit(ops: list):
+    batch = db.batch()
+    for op, ref, data in ops:
+        if op == "set":
+            batch.set(ref, data)
+        elif op == "delete":
+            batch.delete(ref)
+        else:
+            batch.update(ref, data)
+    with metrics.stage("firestore.save"):
+        batch.commit()
+
+
+def _batch_size() -> int:
+    return max(1, min(config.INSIGHTS_BATCH_SIZE, MAX_BATCH_OPS))
+
+
+def sync(user_id: str, entries: list, stored: dict = None, user_update: dict = None) -> dict:
+    """plan() + batched commits for one user."""
+    ops, counts = plan(user_id, entries, stored, user_update)
+    step = _batch_size()
+    for i in range(0, len(ops), step):
+        _commit(ops[i : i + step])
+    return counts
+
+
+class BatchWriter:
+    """
+    Packs the operations of many users into shared batched commits (bulk runs).
+    `on_committed(user_id)` fires once every operation of that user is committed.
+    Not thread-safe; drive it from one thread.
+    """
+
+    def __init__(self, on_committed=None):
+        self.on_committed = on_committed
+        self._ops = []  # (user_id, op)
+        self._remaining = {}
+        self.commits = 0
+
+    def add(self, user_id: str, ops: list):
+        if not ops:
+            self._done(user_id)
+            return
+        self._remaining[user_id] = self._remaining.get(user_id, 0) + len(ops)
+        self._ops.extend((user_id, op) for op in ops)
+        step = _batch_size()
+        while len(self._ops) >= step:
+            self._flush(step)
+
+    def flush(self):
+        while self._ops:
+            self._flush(_batch_size())
+
+    def _flush(self, n: int):
+        chunk, self._ops = self._ops[:n], self._ops[n:]
+        _commit([op for _, op in chunk])
+        self.commits += 1
+        for user_id, _ in chunk:
+            self._remaining[user_id] -= 1
+            if self._remaining[user_id] == 0:
+                del self._remaining[user_id]
+                self._done(user_id)
+
+    def _done(self, user_id: str):
+        if self.on_committed is not None:
+            self.on_committed(user_id)
+
+
+class ChunkedSync:
+    """
+    sync() for one user whose entries arrive in chunks (streamed runs): writes
+    are committed as batches fill up, so the entries never have to be held
+    together. `finish` deletes what no chunk contained and applies the user
+    document update last. Blocking and not thread-safe; drive it from one
+    thread at a time.
+    """
+
+    def __init__(self, user_id: str, stored: dict = None):
+        self.user_id = user_id
+        self._stored = stored_fingerprints(user_id) if stored is None else stored
+        self._col = _collection(user_id)
+        self._current = set()
+        self._writer = BatchWriter()
+        self._written = 0
+
+    def add(self, entries: list):
+        ops = _set_ops(self._col, entries, self._stored, self._current)
+        self._written += len(ops)
+        self._writer.add(self.user_id, ops)
+
+    def finish(self, user_update: dict = None) -> dict:
+        ops = _delete_ops(self._col, self._stored, self._current)
+        deleted = len(ops)
+        if user_update:
+            ops.append(("update", db.collection("users").document(self.user_id), user_update))
+        self._writer.add(self.user_id, ops)
+        self._writer.flush()
+        return {"written": self._written, "deleted": deleted, "unchanged": len(self._current) - self._written}
@@ -0,0 +1,182 @@
+# components/pipeline/jobs.py
+"""
+Background analysis jobs.
+
+`JobManager.submit` returns immediately with a job; the pipeline runs as an
+asyncio task and publishes per-stage progress events (fetched, cleaned,
+scored N/M, saved) that clients can poll (`snapshot`) or follow as
+Server-Sent Events (`sse`). A second submit for a user whose job is still
+queued/running attaches to that job instead of starting another.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+from components.logger import logger
+from components.pipeline import config
+
+TERMINAL = ("done", "failed")
+
+
+class Job:
+    def __init__(self, user_id: str, params: dict = None):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        # what the job was submitted with (e.g. a bulk run's user ids)
+        self.params = params or {}
+        self.status = "queued"
+        self.stage = None
+        self.progress: dict = {}
+        # latest JOB_MAX_EVENTS events; `seq` numbers every event ever published
+        self.events: deque = deque(maxlen=config.JOB_MAX_EVENTS)
+        self.seq = 0
+        self.result: Optional[dict] = None
+        self.error: Optional[dict] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        # set (and replaced) on every published event
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def snapshot(self, include_result: bool = True) -> dict:
+        snap = {
+            "job_id": self.id,
+            "user_id": self.user_id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+        if include_result:
+            snap["result"] = self.result
+        return snap
+
+
+class JobManager:
+    def __init__(self, ttl_seconds: float = None):
+        self.ttl = config.JOB_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._jobs: Dict[str, Job] = {}
+        self._by_user: Dict[str, str] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # --------------------------
+    # Submit / lookup
+    # --------------------------
+    def submit(self, user_id: str, runner: Callable[[Callable], Awaitable[dict]], params: dict = None):
+        """
+        runner(progress) → coroutine producing the analysis result.
+        Returns (job, attached) — attached=True when an in-flight job was reused.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._purge()
+
+        existing = self.active(user_id)
+        if existing is not None:
+            return existing, True
+
+        job = Job(user_id, params)
+        self._jobs[job.id] = job
+        self._by_user[user_id] = job.id
+        # keep a reference — the loop only holds weak refs to tasks
+        job._task = asyncio.create_task(self._run(job, runner))
+        return job, False
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def active(self, user_id: str) -> Optional[Job]:
+        """The queued/running job for `user_id`, if any."""
+        job = self._jobs.get(self._by_user.get(user_id, ""))
+        return job if job is not None and job.status not in TERMINAL else None
+
+    # --------------------------
+    # Execution + progress
+    # --------------------------
+    async def _run(self, job: Job, runner):
+        def progress(stage: str, data: dict):
+            try:
+                on_loop = asyncio.get_running_loop() is self._loop
+            except RuntimeError:
+                on_loop = False
+            if on_loop:
+                self._publish(job, "running", stage, data)
+            else:
+                # pipeline worker thread
+                self._loop.call_soon_threadsafe(self._publish, job, "running", stage, data)
+
+        self._publish(job, "running", "started", {})
+        try:
+            result = await runner(progress)
+        except Exception as e:
+            error = {
+                "type": type(e).__name__,
+                "detail": getattr(e, "detail", str(e)),
+                "status_code": getattr(e, "status_code", 500),
+            }
+            logger.error(f"❌ Job {job.id} for {job.user_id} failed: {error}")
+            job.error = error
+            await asyncio.sleep(0)
+            self._publish(job, "failed", "failed", error)
+            return
+
+        job.result = result
+        # let progress already queued from worker threads land before the terminal event
+        await asyncio.sleep(0)
+        self._publish(job, "done", "done", {})
+
+    def _publish(self, job: Job, status: str, stage: str, data: dict):
+        """Record an event (event-loop thread only) and wake every SSE follower."""
+        if job.status in TERMINAL:
+            return
+        job.status = status
+        job.stage = stage
+        job.progress = {**job.progress, stage: data}
+        job.updated_at = time.time()
+        job.seq += 1
+        job.events.append({"seq": job.seq, "stage": stage, "status": status, "data": data, "ts": job.updated_at})
+        job._changed.set()
+        job._changed = asyncio.Event()
+
+    def _purge(self):
+        cutoff = time.time() - self.ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.status in TERMINAL and job.updated_at < cutoff:
+                del self._jobs[job_id]
+                if self._by_user.get(job.user_id) == job_id:
+                    del self._by_user[job.user_id]
+
+    # --------------------------
+    # Server-Sent Events
+    # --------------------------
+    async def sse(self, job: Job, heartbeat: float = 15.0):
+        """
+        Yield the retained events (history first, then live) until the job
+        finishes. A follower that falls more than JOB_MAX_EVENTS behind skips
+        the dropped ones; the terminal event is always the newest, so it is
+        never skipped.
+        """
+        last = 0
+        while True:
+            while job.seq > last:
+                # oldest retained event after `last` (re-checked after every yield)
+                event = next(e for e in job.events if e["seq"] > last)
+                last = event["seq"]
+                payload = dict(event)
+                if event["stage"] == "done":
+                    payload["result"] = job.result
+                yield f"id: {last}\nevent: {event['stage']}\ndata: {json.dumps(payload)}\n\n"
+
+            if job.status in TERMINAL:
+                return
+
+            # no await since the check above, so no event can have been missed
+            try:
+                await asyncio.wait_for(job._changed.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
@@ -0,0 +1,396 @@
+# components/pipeline/offline_scoring.py
+"""
+Offline batch scoring of a text corpus: no Firestore, no social APIs.
+
+    python -m components.pipeline.offline_scoring posts.jsonl scored.jsonl --text-field body --id-field id
+    python -m components.pipeline.offline_scoring posts.parquet scored/ --checkpoint scored.ckpt.json
+
+Input (JSONL, CSV or Parquet, by extension or --input-format) is streamed in
+chunks. While one chunk is being scored, the next one is already being
+cleaned by the preprocessing process pool, so cleaning and inference run on
+all cores at the same time (--workers cleaning processes, --threads torch
+threads). Results are appended after every chunk: JSONL/CSV output grows in
+place, Parquet output is a directory of part files.
+
+With --checkpoint, the number of finished rows and the output size are
+recorded after each chunk. Rerunning the same command resumes: the input is
+skipped up to that row and output written after the checkpoint is truncated.
+Parquet needs `pyarrow`.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from components.labels import ILLNESS_MAP
+from components.logger import logger
+from components.pipeline import config
+from components.pipeline import data_preprocessing
+
+FORMATS = {".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "jsonl", ".csv": "csv", ".parquet": "parquet"}
+
+
+def _format(path: str, explicit: str = None) -> str:
+    if explicit:
+        return explicit
+    fmt = FORMATS.get(os.path.splitext(path.rstrip("/"))[1].lower())
+    if fmt is None:
+        raise ValueError(f"can't tell the format of {path}; pass --input-format / --output-format")
+    return fmt
+
+
+# -------------------------------------------------------------
+# 🔹 READERS — yield lists of records (dicts)
+# -------------------------------------------------------------
+def _read_jsonl(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _read_csv(path: str):
+    csv.field_size_limit(sys.maxsize)
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def _resume_groups(group_sizes: list, skip: int):
+    """
+    Row groups to read when resuming after `skip` rows, plus how many rows of
+    the first one were already scored. Whole groups before `skip` are skipped
+    instead of decoded; everything from the first group reaching past it is kept.
+    """
+    offset = 0
+    for i, n in enumerate(group_sizes):
+        if offset + n > skip:
+            return list(range(i, len(group_sizes))), skip - offset
+        offset += n
+    return [], 0
+
+
+def _read_parquet(path: str, columns: list, chunk_size: int, skip: int):
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    sizes = [pf.metadata.row_group(i).num_rows for i in range(pf.num_row_groups)]
+    groups, remaining = _resume_groups(sizes, skip)
+    if not groups:
+        return
+    # `remaining` rows of the first kept group may span several batches
+    for batch in pf.iter_batches(batch_size=chunk_size, row_groups=groups, columns=columns):
+        if remaining >= batch.num_rows:
+            remaining -= batch.num_rows
+            continue
+        rows = batch.slice(remaining).to_pylist()
+        remaining = 0
+        if rows:
+            yield rows
+
+
+def iter_chunks(path: str, fmt: str, chunk_size: int, skip: int = 0, columns: list = None):
+    """Chunks of input records, starting after the first `skip` rows."""
+    if fmt == "parquet":
+        buffer = []
+        for rows in _read_parquet(path, columns, chunk_size, skip):
+            buffer.extend(rows)
+            while len(buffer) >= chunk_size:
+                yield buffer[:chunk_size]
+                buffer = buffer[chunk_size:]
+        if buffer:
+            yield buffer
+        return
+
+    records = _read_jsonl(path) if fmt == "jsonl" else _read_csv(path)
+    records = islice(records, skip, None)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def count_rows(path: str, fmt: str):
+    """Total rows when cheap to know (Parquet metadata), else None."""
+    if fmt != "parquet":
+        return None
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(path).metadata.num_rows
+
+
+# -------------------------------------------------------------
+# 🔹 WRITERS — append one chunk at a time
+# -------------------------------------------------------------
+class Writer:
+    def __init__(self, path: str, fmt: str, fields: list):
+        self.path = path
+        self.fmt = fmt
+        self.fields = fields
+        if fmt == "parquet":
+            os.makedirs(path, exist_ok=True)
+
+    def position(self) -> int:
+        """Bytes written (JSONL/CSV) or part files written (Parquet)."""
+        if self.fmt == "parquet":
+            return len([f for f in os.listdir(self.path) if f.startswith("part-")])
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def rewind(self, position: int):
+        """Drop anything written after a checkpoint (a chunk interrupted mid-write)."""
+        if self.fmt == "parquet":
+            for name in os.listdir(self.path):
+                if name.startswith("part-") and int(name[5:10]) >= position:
+                    os.remove(os.path.join(self.path, name))
+        elif os.path.exists(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(position)
+
+    def write(self, rows: list):
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            part = os.path.join(self.path, f"part-{self.position():05d}.parquet")
+            pq.write_table(pa.Table.from_pylist(rows), part)
+            return
+
+        with open(self.path, "a", encoding="utf-8", newline="") as f:
+            if self.fmt == "jsonl":
+                f.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+            else:
+                writer = csv.DictWriter(f, fieldnames=self.fields, extrasaction="ignore")
+                if f.tell() == 0:
+                    writer.writeheader()
+                writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+# -------------------------------------------------------------
+# 🔹 CHECKPOINT
+# -------------------------------------------------------------
+def _load_checkpoint(path: str, input_path: str) -> dict:
+    if not path or not os.path.exists(path):
+        return {"rows_done": 0, "output_position": 0}
+    with open(path) as f:
+        data = json.load(f)
+    if data.get("input") != os.path.abspath(input_path):
+        raise ValueError(f"checkpoint {path} belongs to {data.get('input')}")
+    return data
+
+
+def _save_checkpoint(path: str, data: dict):
+    if not path:
+        return
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+# -------------------------------------------------------------
+# 🔹 SCORING LOOP
+# -------------------------------------------------------------
+def _texts(chunk: list, text_field: str) -> list:
+    return [str(r.get(text_field) or "") for r in chunk]
+
+
+def _output_rows(chunk, start_row, raw, clean, mh_preds, sent_preds, id_field, keep, with_text):
+    rows = []
+    for i, (record, text, cleaned, mh, sent) in enumerate(zip(chunk, raw, clean, mh_preds, sent_preds)):
+        row = {"row": start_row + i}
+        if id_field:
+            row["id"] = record.get(id_field)
+        for field in keep:
+            row[field] = record.get(field)
+        if with_text:
+            row["text"] = text
+            row["cleaned_text"] = cleaned
+        row["prediction_value"] = int(mh)
+        row["prediction_label"] = ILLNESS_MAP.get(int(mh), "Unknown")
+        row["sentiment"] = float(sent)
+        rows.append(row)
+    return rows
+
+
+def score_file(
+    predictor,
+    input_path: str,
+    output_path: str,
+    text_field: str = "text",
+    id_field: str = None,
+    keep: list = (),
+    with_text: bool = False,
+    input_format: str = None,
+    output_format: str = None,
+    chunk_size: int = None,
+    workers: int = None,
+    checkpoint_path: str = None,
+    limit: int = None,
+    report=None,
+) -> dict:
+    """
+    Stream `input_path` through cleaning + predict_dual into `output_path`.
+    report: optional callable(stats) after every chunk. Returns final stats.
+    """
+    chunk_size = chunk_size or config.OFFLINE_CHUNK_SIZE
+    workers = config.PREPROCESS_WORKERS if workers is None else workers
+    in_fmt = _format(input_path, input_format)
+    out_fmt = _format(output_path, output_format)
+
+    fields = ["row"] + (["id"] if id_field else []) + list(keep)
+    fields += (["text", "cleaned_text"] if with_text else []) + ["prediction_value", "prediction_label", "sentiment"]
+    writer = Writer(output_path, out_fmt, fields)
+
+    state = _load_checkpoint(checkpoint_path, input_path)
+    writer.rewind(state["output_position"])
+    start_rows = rows_done = state["rows_done"]
+    if start_rows:
+        logger.info(f"📍 Resuming {input_path} after row {start_rows}")
+
+    columns = [c for c in dict.fromkeys([text_field, id_field, *keep]) if c] if in_fmt == "parquet" else None
+    total = count_rows(input_path, in_fmt)
+    if limit is not None:
+        total = min(total, limit) if total is not None else limit
+
+    chunks = iter_chunks(input_path, in_fmt, chunk_size, skip=start_rows, columns=columns)
+    if limit is not None:
+        chunks = _limit_chunks(chunks, max(limit - start_rows, 0))
+
+    started = time.perf_counter()
+    timings = {"clean": 0.0, "predict": 0.0, "write": 0.0}
+
+    def clean(chunk):
+        t = time.perf_counter()
+        out = data_preprocessing.clean_text_batch_v2(_texts(chunk, text_field), workers=workers)
+        return out, time.perf_counter() - t
+
+    # one chunk is cleaned (process pool) while the previous one is scored (torch threads)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="offline-clean") as cleaner:
+        chunk = next(chunks, None)
+        pending = cleaner.submit(clean, chunk) if chunk else None
+        while pending is not None:
+            clean_texts, clean_seconds = pending.result()
+            timings["clean"] += clean_seconds
+            current = chunk
+            chunk = next(chunks, None)
+            pending = cleaner.submit(clean, chunk) if chunk else None
+
+            t = time.perf_counter()
+            raw = _texts(current, text_field)
+            mh_preds, sent_preds = predictor.predict_dual(raw, clean_texts)
+            timings["predict"] += time.perf_counter() - t
+
+            t = time.perf_counter()
+            writer.write(_output_rows(current, rows_done, raw, clean_texts, mh_preds, sent_preds,
+                                      id_field, keep, with_text))
+            rows_done += len(current)
+            _save_checkpoint(checkpoint_path, {
+                "input": os.path.abspath(input_path),
+                "output": os.path.abspath(output_path),
+                "rows_done": rows_done,
+                "output_position": writer.position(),
+                "updated_at": time.time(),
+            })
+            timings["write"] += time.perf_counter() - t
+
+            if report is not None:
+                report(_stats(rows_done, start_rows, total, started, timings))
+
+    stats = _stats(rows_done, start_rows, total, started, timings)
+    logger.info(f"✅ Offline scoring finished: {stats}")
+    return stats
+
+
+def _limit_chunks(chunks, remaining: int):
+    for chunk in chunks:
+        if remaining <= 0:
+            return
+        chunk = chunk[:remaining]
+        remaining -= len(chunk)
+        yield chunk
+
+
+def _stats(rows_done, start_rows, total, started, timings) -> dict:
+    elapsed = time.perf_counter() - started
+    scored = rows_done - start_rows
+    rate = scored / elapsed if elapsed > 0 else 0.0
+    stats = {
+        "rows_done": rows_done,
+        "rows_this_run": scored,
+        "seconds": round(elapsed, 2),
+        "rows_per_s": round(rate, 1),
+        # clean overlaps predict, so these can add up to more than `seconds`
+        "stage_seconds": {k: round(v, 2) for k, v in timings.items()},
+    }
+    if total is not None:
+        stats["total"] = total
+        stats["eta_seconds"] = round((total - rows_done) / rate, 1) if rate > 0 else None
+    return stats
+
+
+# =========================================================
+# 🖥️ CLI
+# =========================================================
+def main(argv=None) -> int:
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Score a text corpus offline (JSONL / CSV / Parquet)")
+    parser.add_argument("input")
+    parser.add_argument("output", help="JSONL/CSV file, or a directory for Parquet parts")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--id-field", help="input field copied to the output as `id`")
+    parser.add_argument("--keep", action="append", default=[], help="extra input field to copy (repeatable)")
+    parser.add_argument("--with-text", action="store_true", help="include raw and cleaned text in the output")
+    parser.add_argument("--input-format", choices=sorted(set(FORMATS.values())))
+    parser.add_argument("--output-format", choices=sorted(set(FORMATS.values())))
+    parser.add_argument("--chunk-size", type=int, default=config.OFFLINE_CHUNK_SIZE, help="rows read per chunk")
+    parser.add_argument("--workers", type=int, default=max(1, cores // 2), help="cleaning processes")
+    parser.add_argument("--threads", type=int, default=max(1, cores - cores // 2), help="torch intra-op threads")
+    parser.add_argument("--batch-size", type=int, default=config.INFERENCE_BATCH_SIZE, help="max rows per forward pass")
+    parser.add_argument("--token-budget", type=int, default=config.INFERENCE_TOKEN_BUDGET,
+                        help="max padded tokens per forward pass")
+    parser.add_argument("--checkpoint", help="JSON checkpoint path; rerun with the same path to resume")
+    parser.add_argument("--limit", type=int, help="stop after this many input rows")
+    args = parser.parse_args(argv)
+
+    from components import train_test_data
+
+    data_preprocessing.ensure_nltk_resources()
+    predictor = train_test_data.build_predictor(
+        cache_path=None,
+        scheduler=False,
+        batch_size=args.batch_size,
+        token_budget=args.token_budget,
+        intra_op_threads=args.threads,
+    )
+    try:
+        stats = score_file(
+            predictor,
+            args.input,
+            args.output,
+            text_field=args.text_field,
+            id_field=args.id_field,
+            keep=args.keep,
+            with_text=args.with_text,
+            input_format=args.input_format,
+            output_format=args.output_format,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            checkpoint_path=args.checkpoint,
+            limit=args.limit,
+            report=lambda s: print(f"[scored] {json.dumps(s)}", file=sys.stderr),
+        )
+    finally:
+        data_preprocessing.shutdown_pool()
+    print(json.dumps(stats, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
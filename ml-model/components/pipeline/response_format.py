@@ -0,0 +1,168 @@
+# components/pipeline/response_format.py
+"""
+Negotiated /predict response encodings.
+
+``Accept: application/json`` (or none) keeps the original response. Two
+compact variants carry the same analysis once, column by column:
+
+    application/vnd.neurasense.compact+json   orjson-encoded
+    application/msgpack                       msgpack (optional dependency)
+
+Compact layout::
+
+    {
+      "format": "compact/1",
+      "labels": ["Anxiety", ...],            # label index → name
+      "sources": ["reddit", ...],            # source index → name
+      "texts": {"label": [int], "sentiment": [float], "timestamp": [int],
+                "source": [int], "raw_text": [str]?, "cleaned_text": [str]?},
+      "dates": {"date": [str], "mental_health_mode": [int|null],
+                "mental_health_count": [int], "sentiment_avg": [float|null]},
+      "most_probable_illness": str, "mode_probability": float|null,
+      "extraction_logs": {...}, "incremental": {...}?
+    }
+
+`mental_health_preds` / `sentiment_preds` are dropped (they repeat the
+`label` / `sentiment` columns). Columns are built with explicit casts, so the
+summary doesn't need a to_native pass first.
+"""
+
+import json
+
+import numpy as np
+
+from components.labels import ILLNESS_MAP
+
+JSON = "application/json"
+COMPACT_JSON = "application/vnd.neurasense.compact+json"
+MSGPACK = "application/msgpack"
+_MSGPACK_ALIASES = ("application/msgpack", "application/x-msgpack")
+
+# ?text= choices: which text columns a compact response carries
+TEXT_FIELDS = {
+    "none": (),
+    "raw": ("raw_text",),
+    "cleaned": ("cleaned_text",),
+    "both": ("raw_text", "cleaned_text"),
+}
+
+_LABEL_NAMES = [ILLNESS_MAP[i] for i in sorted(ILLNESS_MAP)]
+
+
+def _msgpack_available() -> bool:
+    try:
+        import msgpack  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# -------------------------------------------------------------
+# 🔹 NEGOTIATION
+# -------------------------------------------------------------
+def negotiate(accept: str) -> str:
+    """
+    Pick JSON, COMPACT_JSON or MSGPACK from an Accept header (q-values
+    respected, ties go to the listed order). Anything else → JSON.
+    msgpack is only offered when the package is installed.
+    """
+    best, best_q = JSON, 0.0
+    for part in (accept or "").split(","):
+        fields = [f.strip() for f in part.split(";")]
+        media = fields[0].lower()
+        q = 1.0
+        for param in fields[1:]:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media in _MSGPACK_ALIASES:
+            if not _msgpack_available():
+                continue
+            media = MSGPACK
+        elif media not in (COMPACT_JSON, JSON):
+            continue
+        if q > best_q:
+            best, best_q = media, q
+    return best
+
+
+# -------------------------------------------------------------
+# 🔹 COMPACT PAYLOAD
+# -------------------------------------------------------------
+def _opt_int(value):
+    return None if value is None else int(value)
+
+
+def _opt_float(value):
+    return None if value is None else float(value)
+
+
+def compact(summary: dict, text: str = "raw") -> dict:
+    if text not in TEXT_FIELDS:
+        raise ValueError(f"text must be one of {sorted(TEXT_FIELDS)}")
+    entries = summary["text_level_analysis"]
+
+    sources, source_idx = [], {}
+    source_col = []
+    for e in entries:
+        name = e.get("source")
+        if name not in source_idx:
+            source_idx[name] = len(sources)
+            sources.append(name)
+        source_col.append(source_idx[name])
+
+    texts = {
+        "label": [int(e["prediction_value"]) for e in entries],
+        "sentiment": [float(e["sentiment"]) for e in entries],
+        "timestamp": [int(e["timestamp"]) for e in entries],
+        "source": source_col,
+    }
+    for field in TEXT_FIELDS[text]:
+        texts[field] = [e[field] for e in entries]
+
+    days = summary["date_grouped_analysis"]
+    payload = {
+        "format": "compact/1",
+        "count": len(entries),
+        "labels": _LABEL_NAMES,
+        "sources": sources,
+        "texts": texts,
+        "dates": {
+            "date": [d["date"] for d in days],
+            "mental_health_mode": [_opt_int(d["mental_health_mode"]) for d in days],
+            "mental_health_count": [int(d["mental_health_count"]) for d in days],
+            "sentiment_avg": [_opt_float(d["sentiment_avg"]) for d in days],
+        },
+        "most_probable_illness": str(summary["most_probable_illness"]),
+        "mode_probability": _opt_float(summary["mode_probability"]),
+        "extraction_logs": summary.get("extraction_logs"),
+    }
+    if "incremental" in summary:
+        payload["incremental"] = summary["incremental"]
+    return payload
+
+
+# -------------------------------------------------------------
+# 🔹 ENCODING
+# -------------------------------------------------------------
+def _default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"{type(obj).__name__} is not serializable")
+
+
+def encode(payload, media_type: str) -> bytes:
+    if media_type == MSGPACK:
+        import msgpack
+
+        return msgpack.packb(payload, use_bin_type=True, default=_default)
+    try:
+        import orjson
+    except ImportError:
+        return json.dumps(payload, separators=(",", ":"), default=_default).encode("utf-8")
+    return orjson.dumps(payload, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
@@ -0,0 +1,336 @@
+# components/pipeline/upstream.py
+"""
+Rate-limit-aware GETs against the Reddit / Twitter / Spotify APIs.
+
+* A token bucket per source spaces requests out before they are sent; a 429
+  pauses the whole source until its Retry-After has passed. A caller whose
+  turn would come after its deadline is refused up front, and a caller that
+  is cancelled while waiting gives its token back, so requests that never go
+  out don't leave the bucket in debt.
+* 429 / 5xx responses are retried with jittered exponential backoff, or after
+  the server's Retry-After when it fits in ``HTTP_MAX_RETRY_WAIT``.
+* Successful JSON bodies are kept in a TTL cache keyed by URL + credentials.
+  Fresh entries are served without a request; expired ones are revalidated
+  with If-None-Match / If-Modified-Since (a 304 costs no body).
+* When a source stays rate limited, `RateLimited` carries the last cached
+  body (up to ``HTTP_CACHE_STALE_TTL`` old) so callers can use it instead of
+  failing.
+
+Limits are per process: with several workers each gets its own buckets.
+"""
+
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+from components import metrics
+from components.logger import logger
+from components.pipeline import config
+from components.pipeline.http_client import get_session
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimited(Exception):
+    """Source still rate limited after retries; `cached` is the last good body or None."""
+
+    def __init__(self, url: str, cached=None):
+        super().__init__(url)
+        self.url = url
+        self.cached = cached
+
+
+# -------------------------------------------------------------
+# 🔹 TOKEN BUCKET (one per source)
+# -------------------------------------------------------------
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token; returns how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            if self.rate > 0:
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 and self.rate > 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def release(self):
+        """Return a reserved token that was never used."""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+    def pause(self, seconds: float):
+        """Hold every caller of this source for `seconds` (server asked us to back off)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def paused_for(self) -> float:
+        with self._lock:
+            return max(self._paused_until - time.monotonic(), 0.0)
+
+    async def acquire(self, deadline: float = None) -> bool:
+        """
+        Wait for a token. False (token returned) when the wait would run past
+        `deadline` (event-loop time).
+        """
+        wait = self.reserve()
+        if wait <= 0:
+            return True
+        if deadline is not None and asyncio.get_running_loop().time() + wait > deadline:
+            self.release()
+            return False
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            self.release()
+            raise
+        return True
+
+    def acquire_sync(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket(source: str) -> TokenBucket:
+    with _buckets_lock:
+        if source not in _buckets:
+            rate = config.UPSTREAM_RATE_LIMITS.get(source, 0.0)
+            _buckets[source] = TokenBucket(rate, config.UPSTREAM_RATE_BURST)
+        return _buckets[source]
+
+
+# -------------------------------------------------------------
+# 🔹 RESPONSE CACHE (TTL + validators)
+# -------------------------------------------------------------
+class ResponseCache:
+    def __init__(self, ttl: float, stale_ttl: float, max_items: int):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_items = max_items
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url: str, headers: dict) -> str:
+        # per-user endpoints (Spotify /me) differ only by the token
+        auth = (headers or {}).get("Authorization", "")
+        return hashlib.sha1(f"{url}\0{auth}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Entry ({data, etag, last_modified, stored_at}) within the stale window, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry["stored_at"] > self.stale_ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def fresh(self, entry) -> bool:
+        return entry is not None and time.monotonic() - entry["stored_at"] <= self.ttl
+
+    def put(self, key: str, data, response_headers):
+        if self.max_items <= 0:
+            return
+        etag = response_headers.get("ETag")
+        last_modified = response_headers.get("Last-Modified")
+        with self._lock:
+            self._entries[key] = {
+                "data": data,
+                "etag": etag,
+                "last_modified": last_modified,
+                "stored_at": time.monotonic(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    def touch(self, key: str):
+        """304 Not Modified: the cached body is current again."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["stored_at"] = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = ResponseCache(config.HTTP_CACHE_TTL, config.HTTP_CACHE_STALE_TTL, config.HTTP_CACHE_SIZE)
+
+
+def _conditional(headers: dict, entry) -> dict:
+    headers = dict(headers or {})
+    if entry is not None:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+# -------------------------------------------------------------
+# 🔹 RETRY POLICY
+# -------------------------------------------------------------
+def retry_after(headers, reset_headers: bool = True) -> float:
+    """
+    Seconds the server asked us to wait, or None. Understands Retry-After
+    (seconds or HTTP date) and, with reset_headers, Twitter's
+    x-rate-limit-reset (epoch seconds) and Reddit's x-ratelimit-reset
+    (seconds). Those two come with every response, so only a 429 means them.
+    """
+    value = headers.get("Retry-After")
+    if value:
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                pass
+    if not reset_headers:
+        return None
+    value = headers.get("x-rate-limit-reset")
+    if value:
+        try:
+            return max(float(value) - time.time(), 0.0)
+        except ValueError:
+            pass
+    value = headers.get("x-ratelimit-reset")
+    if value:
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+    return None
+
+
+def _backoff(attempt: int) -> float:
+    """Full jitter: uniform in [0, min(cap, base × 2^attempt)]."""
+    return random.uniform(0, min(config.HTTP_BACKOFF_MAX, config.HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _retry_delay(status: int, headers, attempt: int, source: str, url: str):
+    """Seconds to wait before the next attempt, or None to give up."""
+    server_wait = retry_after(headers, reset_headers=status == 429)
+    if status == 429:
+        logger.warning(f"❌ Rate limited by {url} (Retry-After: {server_wait})")
+        if server_wait is not None:
+            bucket(source).pause(server_wait)
+    if attempt >= config.HTTP_MAX_RETRIES:
+        return None
+    delay = server_wait if server_wait is not None else _backoff(attempt)
+    if delay > config.HTTP_MAX_RETRY_WAIT:
+        return None
+    metrics.UPSTREAM_RETRIES.inc(source=source, status=status)
+    return delay
+
+
+def _give_up(status: int, url: str, entry):
+    if status == 429:
+        if entry is not None:
+            metrics.CACHE_EVENTS.inc(cache="http", result="stale")
+        raise RateLimited(url, entry["data"] if entry is not None else None)
+    logger.error(f"❌ {url} returned {status}")
+    if entry is not None and status in RETRY_STATUSES:
+        metrics.CACHE_EVENTS.inc(cache="http", result="stale")
+        return entry["data"]
+    return {}
+
+
+# -------------------------------------------------------------
+# 🔹 FETCH (async + sync)
+# -------------------------------------------------------------
+async def fetch_json(session, url: str, headers: dict, source: str, deadline: float = None):
+    """
+    GET a JSON body through the source's limiter and the response cache.
+    Non-retryable errors return {} (as before); exhausting retries on a 429,
+    or no token before `deadline` (event-loop time), raises RateLimited.
+    """
+    key = cache.key(url, headers)
+    entry = cache.get(key)
+    if cache.fresh(entry):
+        metrics.CACHE_EVENTS.inc(cache="http", result="hit")
+        return entry["data"]
+
+    if bucket(source).paused_for() > config.HTTP_MAX_RETRY_WAIT:
+        # still inside a Retry-After window: don't spend a request on a certain 429
+        return _give_up(429, url, entry)
+
+    attempt = 0
+    while True:
+        if not await bucket(source).acquire(deadline):
+            logger.warning(f"🚦 {source} limiter has no slot for {url} before the deadline")
+            return _give_up(429, url, entry)
+        async with session.get(url, headers=_conditional(headers, entry)) as res:
+            metrics.UPSTREAM_RESPONSES.inc(source=source, status=res.status)
+            if res.status == 304 and entry is not None:
+                cache.touch(key)
+                metrics.CACHE_EVENTS.inc(cache="http", result="revalidated")
+                return entry["data"]
+            if res.status == 200:
+                data = await res.json(content_type=None)
+                cache.put(key, data, res.headers)
+                metrics.CACHE_EVENTS.inc(cache="http", result="miss")
+                return data
+            delay = _retry_delay(res.status, res.headers, attempt, source, url) if res.status in RETRY_STATUSES else None
+            status = res.status
+        if delay is None:
+            return _give_up(status, url, entry)
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+def fetch_json_sync(url: str, headers: dict, source: str, timeout: float = 10):
+    """Blocking counterpart of fetch_json on the shared requests.Session."""
+    key = cache.key(url, headers)
+    entry = cache.get(key)
+    if cache.fresh(entry):
+        metrics.CACHE_EVENTS.inc(cache="http", result="hit")
+        return entry["data"]
+
+    if bucket(source).paused_for() > config.HTTP_MAX_RETRY_WAIT:
+        return _give_up(429, url, entry)
+
+    attempt = 0
+    while True:
+        bucket(source).acquire_sync()
+        res = get_session().get(url, headers=_conditional(headers, entry), timeout=timeout)
+        metrics.UPSTREAM_RESPONSES.inc(source=source, status=res.status_code)
+        if res.status_code == 304 and entry is not None:
+            cache.touch(key)
+            metrics.CACHE_EVENTS.inc(cache="http", result="revalidated")
+            return entry["data"]
+        if res.status_code == 200:
+            data = res.json()
+            cache.put(key, data, res.headers)
+            metrics.CACHE_EVENTS.inc(cache="http", result="miss")
+            return data
+        delay = None
+        if res.status_code in RETRY_STATUSES:
+            delay = _retry_delay(res.status_code, res.headers, attempt, source, url)
+        if delay is None:
+            return _give_up(res.status_code, url, entry)
+        time.sleep(delay)
+        attempt += 1
@@ -0,0 +1,168 @@
+# components/prediction_cache.py
+# -------------------------------------------------------------
+# 🗃️ Content-addressed prediction cache
+# -------------------------------------------------------------
+"""
+Caches per-text model outputs (MH label, MH logits, sentiment) keyed by
+sha256(model_version + normalized text).
+
+Two tiers:
+  * bounded in-memory LRU (always on when size > 0)
+  * optional SQLite file that survives restarts
+
+The model version is part of the key, so swapping either model silently
+invalidates every old entry (stale rows are simply never read again).
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalization that cannot change either model's output (NFC + whitespace collapse)."""
+    if not isinstance(text, str):
+        return ""
+    return _WS.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def model_version(*paths: str) -> str:
+    """
+    Cheap fingerprint of model artifacts: file name, size and mtime for every
+    file (recursing into directories). Avoids hashing hundreds of MB of weights.
+    """
+    h = hashlib.sha1()
+    for path in paths:
+        files = []
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, n) for n in names)
+        elif os.path.exists(path):
+            files.append(path)
+        for f in sorted(files):
+            st = os.stat(f)
+            h.update(f"{os.path.basename(f)}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()[:16]
+
+
+class PredictionCache:
+    def __init__(self, version: str, max_items: int = 10000, disk_path: Optional[str] = None):
+        self.version = version
+        self.max_items = max_items
+        self._mem: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT PRIMARY KEY, version TEXT, label INTEGER, logits TEXT, sentiment REAL)"
+            )
+            self._db.commit()
+
+    # --------------------------
+    # Keys
+    # --------------------------
+    def key(self, text: str) -> str:
+        payload = f"{self.version}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    # --------------------------
+    # Lookup / store
+    # --------------------------
+    def get_many(self, keys: List[str]) -> Dict[str, dict]:
+        """Look up unique keys; returns {key: entry} for the ones found in either tier."""
+        found, missing = {}, []
+        with self._lock:
+            for k in keys:
+                entry = self._mem.get(k)
+                if entry is not None:
+                    self._mem.move_to_end(k)
+                    found[k] = entry
+                else:
+                    missing.append(k)
+
+            if missing and self._db is not None:
+                for i in range(0, len(missing), 500):
+                    chunk = missing[i : i + 500]
+                    rows = self._db.execute(
+                        f"SELECT key, label, logits, sentiment FROM predictions "
+                        f"WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+                    for k, label, logits, sentiment in rows:
+                        entry = {"label": label, "logits": json.loads(logits), "sentiment": sentiment}
+                        found[k] = entry
+                        self._remember(k, entry)
+                        self.disk_hits += 1
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, entries: Dict[str, dict]):
+        if not entries:
+            return
+        with self._lock:
+            for k, entry in entries.items():
+                self._remember(k, entry)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO predictions (key, version, label, logits, sentiment) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (k, self.version, int(e["label"]), json.dumps(e["logits"]), float(e["sentiment"]))
+                        for k, e in entries.items()
+                    ],
+                )
+                self._db.commit()
+
+    def _remember(self, k: str, entry: dict):
+        if self.max_items <= 0:
+            return
+        self._mem[k] = entry
+        self._mem.move_to_end(k)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
+
+    # --------------------------
+    # Housekeeping
+    # --------------------------
+    def purge_stale(self) -> int:
+        """Delete on-disk rows written by other model versions."""
+        if self._db is None:
+            return 0
+        with self._lock:
+            cur = self._db.execute("DELETE FROM predictions WHERE version != ?", (self.version,))
+            self._db.commit()
+            return cur.rowcount
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "version": self.version,
+            "memory_items": len(self._mem),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
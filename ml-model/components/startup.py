@@ -0,0 +1,77 @@
+# components/startup.py
+# -------------------------------------------------------------
+# 🚦 Service startup: parallel model loading, warm-up and readiness
+# -------------------------------------------------------------
+"""
+The app binds its port immediately; heavy components (transformer + sentiment
+models, NLTK corpora) load in background threads in parallel, a warm-up
+forward pass runs, and only then does `/ready` report ready. Per-component
+load times are kept for the probe.
+"""
+
+import asyncio
+import time
+
+from components.logger import logger
+
+
+class Readiness:
+    def __init__(self):
+        self.ready = False
+        self.error = None
+        self.components = {}
+        self._started = time.monotonic()
+        self.total_seconds = None
+
+    async def run(self, name: str, fn, *args):
+        """Run a blocking loader in a thread, recording status + duration."""
+        self.components[name] = {"status": "loading", "seconds": None}
+        start = time.perf_counter()
+        try:
+            result = await asyncio.to_thread(fn, *args)
+        except Exception as e:
+            self.components[name] = {
+                "status": "failed",
+                "seconds": round(time.perf_counter() - start, 3),
+                "error": str(e),
+            }
+            raise
+        self.components[name] = {"status": "ok", "seconds": round(time.perf_counter() - start, 3)}
+        return result
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "uptime_seconds": round(time.monotonic() - self._started, 3),
+            "startup_seconds": self.total_seconds,
+            "components": self.components,
+        }
+
+
+async def warm_start(readiness: Readiness, build_predictor, loaders: dict = None):
+    """
+    build_predictor: blocking factory for the MetaModelPredictor.
+    loaders: extra {name: blocking callable} loaded alongside it (e.g. NLTK).
+    Returns the predictor once it has been warmed up.
+    """
+    loaders = loaders or {}
+    try:
+        results = await asyncio.gather(
+            readiness.run("predictor", build_predictor),
+            *(readiness.run(name, fn) for name, fn in loaders.items()),
+        )
+        predictor = results[0]
+        for name, seconds in getattr(predictor, "load_times", {}).items():
+            readiness.components[f"predictor.{name}"] = {"status": "ok", "seconds": seconds}
+
+        await readiness.run("warmup", predictor.warmup)
+    except Exception as e:
+        readiness.error = f"{type(e).__name__}: {e}"
+        logger.error(f"❌ Startup failed: {readiness.error}")
+        raise
+
+    readiness.total_seconds = round(time.monotonic() - readiness._started, 3)
+    readiness.ready = True
+    logger.info(f"✅ Service ready in {readiness.total_seconds}s: {readiness.components}")
+    return predictor
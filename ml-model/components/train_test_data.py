@@ -2,23 +2,29 @@
 # -------------------------------------------------------------
 # 🧠 Mental Health Transformer + Sentiment Predictor (Dual Input Support)
 # -------------------------------------------------------------
+import hashlib
 import os
 import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import joblib
 import numpy as np
 import logging
 from typing import List
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import torch
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from textblob import TextBlob
+from components import metrics
+from components.prediction_cache import PredictionCache, model_version
+from components.inference_scheduler import InferenceScheduler
+from components import inference_backend
+from components.cascade import CascadeRouter
 
 # -------------------------------------------------------------
 # Logger Setup
 # -------------------------------------------------------------
 logger = logging.getLogger("train_test")
 logger.setLevel(logging.INFO)
-SIA = SentimentIntensityAnalyzer()
 
 # -------------------------------------------------------------
 # Helpers
@@ -33,6 +39,59 @@ def load_pickle(path: str):
     except Exception:
         return joblib.load(path)
     
+def token_budget_batches(lengths: List[int], token_budget: int, max_count: int) -> List[List[int]]:
+    """
+    Group indices into batches ordered by token length. A batch grows while
+    (rows × longest row) stays within token_budget and rows ≤ max_count;
+    a single over-budget text still gets its own batch.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches, current = [], []
+    for i in order:
+        # ascending order → lengths[i] is the padded width if i joins the batch
+        if current and ((len(current) + 1) * lengths[i] > token_budget or len(current) >= max_count):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+# -------------------------------------------------------------
+# Pre-fork preload (gunicorn --preload)
+# -------------------------------------------------------------
+# Artifacts loaded once in the master process. Forked workers pick them up
+# instead of loading private copies; inference never writes the weights, so
+# their pages stay shared copy-on-write.
+_PRELOADED = {}
+
+
+def _shared_key(kind: str, *paths: str) -> tuple:
+    return (kind,) + tuple(os.path.abspath(p) for p in paths)
+
+
+def preload(transformer_model_dir: str, sent_model_path: str, sent_vec_path: str) -> dict:
+    """
+    Load tokenizer + transformer and the sentiment model/vectorizer into the
+    shared table. No forward pass runs here: torch thread pools started before
+    fork() are not usable in the children. Returns load times per component.
+    """
+    times = {}
+    start = time.perf_counter()
+    _PRELOADED[_shared_key("transformer", transformer_model_dir)] = (
+        MetaModelPredictor._load_transformer(transformer_model_dir)
+    )
+    times["transformer"] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    _PRELOADED[_shared_key("sentiment", sent_model_path, sent_vec_path)] = (
+        MetaModelPredictor._load_sentiment(sent_model_path, sent_vec_path)
+    )
+    times["sentiment"] = round(time.perf_counter() - start, 3)
+    logger.info(f"✅ Models preloaded for forked workers: {times}")
+    return times
+
 # -------------------------------------------------------------
 # 🧠 Hybrid Predictor (Transformer + Sentiment)
 # -------------------------------------------------------------
@@ -44,55 +103,277 @@ class MetaModelPredictor:
         sent_model_path: str,
         sent_vec_path: str,
         device: str = None,
+        cache_size: int = 10000,
+        cache_path: str = None,
+        batch_size: int = 64,
+        token_budget: int = 4096,
+        max_length: int = 256,
+        scheduler: bool = False,
+        scheduler_max_batch: int = 32,
+        scheduler_max_wait_ms: float = 10.0,
+        backend: str = "eager",
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 0,
+        backend_cache_dir: str = None,
+        parity_min_agreement: float = 0.97,
+        parity_max_logit_diff: float = 0.5,
+        parity_probes: int = 256,
+        cascade: bool = False,
+        cascade_model_path: str = None,
+        cascade_threshold: float = 0.9,
     ):
-        # ---- Load Mental Health Transformer ----
-        logger.info(f"🔹 Loading Transformer model from {transformer_model_dir}")
-        self.tokenizer = AutoTokenizer.from_pretrained(transformer_model_dir)
-        self.model = AutoModelForSequenceClassification.from_pretrained(transformer_model_dir)
+        # ---- Load Transformer + Sentiment models in parallel ----
+        # (torch/safetensors and unpickling both release the GIL for most of the work)
+        self.load_times = {}
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="model-load") as pool:
+            transformer = pool.submit(self._timed, "transformer", self._load_transformer, transformer_model_dir)
+            sentiment = pool.submit(self._timed, "sentiment", self._load_sentiment, sent_model_path, sent_vec_path)
+            self.tokenizer, self.model = transformer.result()
+            self.sent_model, self.sent_vec = sentiment.result()
+
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        if backend != "eager":
+            # quantized / ONNX Runtime backends are CPU-only
+            self.device = "cpu"
         self.model.to(self.device)
         self.model.eval()
+        self.batch_size = batch_size
+        self.token_budget = token_budget
+        self.max_length = max_length
+        # Tokenizer + model are not safe to drive from several threads at once
+        self._infer_lock = threading.Lock()
+
+        self.model_version = model_version(transformer_model_dir, sent_model_path, sent_vec_path)
+
+        # ---- Cascade: linear first stage, transformer only when needed ----
+        self.cascade = None
+        cache_version = self.model_version
+        if cascade:
+            try:
+                self.cascade = CascadeRouter.load(
+                    cascade_model_path,
+                    self.model.config.num_labels,
+                    threshold=cascade_threshold,
+                )
+                # cached predictions depend on the routing, not just the models
+                routing = f"{model_version(cascade_model_path)}:{cascade_threshold}"
+                cache_version += "-" + hashlib.sha1(routing.encode()).hexdigest()[:8]
+                logger.info(f"🔹 Cascade enabled (threshold {cascade_threshold}, model {cascade_model_path})")
+            except Exception as e:
+                logger.error(f"❌ Cascade model unavailable ({e}); every text goes to the transformer.")
+
+        # ---- Inference backend (eager / int8 / ONNX Runtime) ----
+        self.backend = self._timed(
+            "backend",
+            self._select_backend,
+            backend,
+            backend_cache_dir or os.path.join(os.path.dirname(os.path.abspath(transformer_model_dir)), "backend_cache"),
+            intra_op_threads,
+            inter_op_threads,
+            parity_min_agreement,
+            parity_max_logit_diff,
+            parity_probes,
+        )
 
-        # ---- Load Sentiment Model ----
-        logger.info(f"🔹 Loading Sentiment model: {sent_model_path}")
-        self.sent_model = load_pickle(sent_model_path)
-        self.sent_vec = load_pickle(sent_vec_path)
+        # ---- Prediction cache (keyed by model version + routing + backend + text) ----
+        # int8 / ONNX logits differ slightly from eager ones, so each backend
+        # actually in use (after any fallback to eager) gets its own entries
+        cache_version += f"-{self.backend.name}"
+        self.cache = None
+        if cache_size > 0 or cache_path:
+            self.cache = PredictionCache(cache_version, max_items=cache_size, disk_path=cache_path)
+            logger.info(f"🔹 Prediction cache enabled (version {cache_version}, disk: {cache_path})")
+
+        # ---- Cross-request micro-batching ----
+        self.scheduler = None
+        if scheduler:
+            self.scheduler = InferenceScheduler(
+                self._forward_logits,
+                max_batch_size=scheduler_max_batch,
+                max_wait_ms=scheduler_max_wait_ms,
+            )
+            logger.info(
+                f"🔹 Inference scheduler enabled (max batch {scheduler_max_batch}, max wait {scheduler_max_wait_ms}ms)"
+            )
 
         logger.info("✅ MetaModelPredictor initialized successfully.")
 
+    # --------------------------
+    # Loading + warm-up
+    # --------------------------
+    def _timed(self, name: str, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        self.load_times[name] = round(time.perf_counter() - start, 3)
+        return result
+
+    @staticmethod
+    def _load_transformer(model_dir: str):
+        shared = _PRELOADED.get(_shared_key("transformer", model_dir))
+        if shared is not None:
+            logger.info(f"🔹 Using preloaded Transformer model from {model_dir}")
+            return shared
+        logger.info(f"🔹 Loading Transformer model from {model_dir}")
+        tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+        return tokenizer, model
+
+    @staticmethod
+    def _load_sentiment(model_path: str, vec_path: str):
+        shared = _PRELOADED.get(_shared_key("sentiment", model_path, vec_path))
+        if shared is not None:
+            return shared
+        logger.info(f"🔹 Loading Sentiment model: {model_path}")
+        return load_pickle(model_path), load_pickle(vec_path)
+
+    def warmup(self) -> float:
+        """
+        One forward pass over short + long probes (allocator, kernels, backend
+        graph init) and one sentiment call, bypassing cache and scheduler.
+        Returns the seconds spent.
+        """
+        start = time.perf_counter()
+        self._forward_logits(inference_backend.PARITY_PROBES)
+        self._predict_sentiment(inference_backend.PARITY_PROBES)
+        self.load_times["warmup"] = round(time.perf_counter() - start, 3)
+        return self.load_times["warmup"]
+
+    # --------------------------
+    # Backend selection + parity check against eager PyTorch
+    # --------------------------
+    def _select_backend(self, name, cache_dir, intra_op, inter_op, min_agreement, max_logit_diff, n_probes):
+        eager = inference_backend.EagerBackend(self.model)
+        if name == "eager":
+            inference_backend.configure_torch_threads(intra_op, inter_op)
+            return eager
+        try:
+            candidate = inference_backend.build_backend(
+                name, self.model, self.tokenizer, cache_dir, self.model_version, intra_op, inter_op
+            )
+            probes = inference_backend.parity_probes(n_probes)
+            rows = self._encode(probes)
+            lengths = [len(ids) for ids in rows]
+            batches = [
+                self._pad_batch(rows, idx, max(lengths[i] for i in idx))
+                for idx in token_budget_batches(lengths, self.token_budget, self.batch_size)
+            ]
+            parity = inference_backend.parity_check(eager, candidate, batches)
+        except Exception as e:
+            logger.error(f"❌ Inference backend '{name}' unavailable ({e}); using eager PyTorch.")
+            return eager
+
+        if not inference_backend.parity_ok(parity, min_agreement, max_logit_diff):
+            logger.error(f"❌ Backend '{name}' failed parity check {parity}; using eager PyTorch.")
+            return eager
+        logger.info(f"✅ Inference backend '{name}' passed parity check {parity}")
+        self.backend_parity = parity
+        return candidate
+
     # --------------------------
     # Sentiment prediction (TF-IDF Logistic Regression)
     # --------------------------
-    def _predict_sentiment(self, texts: List[str]):
+    def _predict_sentiment(self, texts: List[str], feats=None):
+        """feats: precomputed sent_vec features of `texts` (shared with the cascade)."""
         if not texts:
             return []
-        sent_feats = self.sent_vec.transform(texts)
-        preds = list(self.sent_model.predict(sent_feats))
+        with metrics.stage("sentiment"):
+            sent_feats = self.sent_vec.transform(texts) if feats is None else feats
+            preds = list(self.sent_model.predict(sent_feats))
         return preds
 
+    # --------------------------
+    # Both models over aligned raw/clean texts (cascade-aware)
+    # --------------------------
+    def _score(self, raw_texts: List[str], clean_texts: List[str]):
+        """
+        Returns (mh_logits, sentiments). With the cascade on, MH rows for texts
+        resolved by the linear stage are its log-probabilities; argmax is the label either way.
+        """
+        if self.cascade is None:
+            return self._mental_health_logits(raw_texts), self._predict_sentiment(clean_texts)
+        if not raw_texts:
+            return self._mental_health_logits([]), []
+
+        with metrics.stage("cascade"):
+            feats = self.sent_vec.transform(clean_texts)
+            logits, escalate = self.cascade.route(raw_texts, feats)
+        idx = np.flatnonzero(escalate)
+        if len(idx):
+            logits[idx] = self._mental_health_logits([raw_texts[i] for i in idx])
+        return logits, self._predict_sentiment(clean_texts, feats)
+
     # --------------------------
     # Mental health transformer prediction
     # --------------------------
+    def _mental_health_logits(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.model.config.num_labels), dtype=np.float32)
+        if self.scheduler is not None and not self.scheduler.in_worker():
+            # Shared batches with every other in-flight request
+            return self.scheduler.infer(texts)
+        return self._forward_logits(texts)
+
+    def _forward_logits(self, texts: List[str]) -> np.ndarray:
+        """
+        Tokenize once, sort by token length and run batches built to a token
+        budget (batch rows × longest row), so short texts never pad to a long one.
+        Logits are scattered back into the original order.
+        """
+        out = np.zeros((len(texts), self.model.config.num_labels), dtype=np.float32)
+        with self._infer_lock, torch.no_grad():
+            with metrics.stage("tokenize"):
+                rows = self._encode(texts)
+                lengths = [len(ids) for ids in rows]
+            for idx in token_budget_batches(lengths, self.token_budget, self.batch_size):
+                width = max(lengths[i] for i in idx)
+                batch = self._pad_batch(rows, idx, width)
+                with metrics.stage("forward"):
+                    out[idx] = self.backend(batch)
+                self._record_batch(len(idx), sum(lengths[i] for i in idx), width)
+        return out
+
+    @staticmethod
+    def _record_batch(rows: int, real_tokens: int, width: int):
+        padded = rows * width - real_tokens
+        metrics.INFERENCE_BATCH_SIZE.observe(rows)
+        metrics.INFERENCE_LAST_BATCH_SIZE.set(rows)
+        metrics.INFERENCE_PADDING_RATIO.set(padded / (rows * width) if width else 0.0)
+        metrics.INFERENCE_TOKENS.inc(real_tokens, kind="real")
+        metrics.INFERENCE_TOKENS.inc(padded, kind="padding")
+
+    def _encode(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Token ids per text as compact int32 arrays. Tokenizes a batch_size
+        window at a time so the tokenizer's per-token Python lists never
+        exist for the whole input at once.
+        """
+        rows = []
+        for start in range(0, len(texts), self.batch_size):
+            enc = self.tokenizer(texts[start:start + self.batch_size], truncation=True,
+                                 max_length=self.max_length, return_attention_mask=False,
+                                 return_token_type_ids=False)
+            rows.extend(np.asarray(ids, dtype=np.int32) for ids in enc["input_ids"])
+        return rows
+
+    def _pad_batch(self, rows: List[np.ndarray], idx: List[int], width: int) -> dict:
+        """Right-pad the selected token rows to `width` (same as padding=True on single texts)."""
+        pad_id = self.tokenizer.pad_token_id or 0
+        input_ids = torch.full((len(idx), width), pad_id, dtype=torch.long)
+        mask = torch.zeros((len(idx), width), dtype=torch.long)
+        for row, i in enumerate(idx):
+            input_ids[row, : len(rows[i])] = torch.from_numpy(rows[i])
+            mask[row, : len(rows[i])] = 1
+        batch = {}
+        for key in self.tokenizer.model_input_names:
+            # single-sequence inputs: token_type_ids (if the model takes them) are all zero
+            t = input_ids if key == "input_ids" else mask if key == "attention_mask" else torch.zeros_like(mask)
+            batch[key] = t.to(self.device)
+        return batch
+
     def _predict_mental_health(self, texts: List[str]):
         if not texts:
             return []
-        all_preds = []
-        batch_size = 8
-        with torch.no_grad():
-            for i in range(0, len(texts), batch_size):
-                batch = texts[i : i + batch_size]
-                enc = self.tokenizer(
-                    batch,
-                    padding=True,
-                    truncation=True,
-                    return_tensors="pt",
-                    max_length=256,
-                )
-                enc = {k: v.to(self.device) for k, v in enc.items()}
-                outputs = self.model(**enc)
-                preds = torch.argmax(outputs.logits, dim=1).cpu().numpy()
-                all_preds.extend(preds)
-        return all_preds
+        return list(np.argmax(self._mental_health_logits(texts), axis=1))
 
     # --------------------------
     # Old-style predict() — uses same text for both (backward compatibility)
@@ -120,8 +401,14 @@ class MetaModelPredictor:
         clean_texts → used for Sentiment (TF-IDF + Logistic Regression)
         """
         try:
-            mh_preds = self._predict_mental_health(raw_texts)
-            sent_preds = self._predict_sentiment(clean_texts)
+            if self.cache is not None and len(raw_texts) == len(clean_texts):
+                mh_preds, sent_preds = self._predict_dual_cached(raw_texts, clean_texts)
+            elif self.cascade is not None and len(raw_texts) == len(clean_texts):
+                logits, sent_preds = self._score(raw_texts, clean_texts)
+                mh_preds = list(np.argmax(logits, axis=1))
+            else:
+                mh_preds = self._predict_mental_health(raw_texts)
+                sent_preds = self._predict_sentiment(clean_texts)
 
             if len(mh_preds) != len(sent_preds):
                 logger.warning("⚠ Mismatch in prediction lengths — aligning to shortest length.")
@@ -132,4 +419,73 @@ class MetaModelPredictor:
             return mh_preds, sent_preds
         except Exception as e:
             logger.error(f"❌ Dual prediction error: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    # --------------------------
+    # Cached dual predict — dedupes within the batch, only scores cache misses
+    # --------------------------
+    def _predict_dual_cached(self, raw_texts: List[str], clean_texts: List[str]):
+        keys = [self.cache.key(f"{raw}\0{clean}") for raw, clean in zip(raw_texts, clean_texts)]
+
+        # In-batch dedupe: first occurrence of every key represents the group
+        first_idx = {}
+        for i, k in enumerate(keys):
+            first_idx.setdefault(k, i)
+
+        entries = self.cache.get_many(list(first_idx))
+        todo = [k for k in first_idx if k not in entries]
+        metrics.CACHE_EVENTS.inc(len(entries), cache="predictions", result="hit")
+        metrics.CACHE_EVENTS.inc(len(todo), cache="predictions", result="miss")
+
+        if todo:
+            idx = [first_idx[k] for k in todo]
+            logits, sents = self._score([raw_texts[i] for i in idx], [clean_texts[i] for i in idx])
+            fresh = {
+                k: {
+                    "label": int(np.argmax(row)),
+                    "logits": [float(v) for v in row],
+                    "sentiment": float(sent),
+                }
+                for k, row, sent in zip(todo, logits, sents)
+            }
+            self.cache.put_many(fresh)
+            entries.update(fresh)
+
+        logger.info(
+            f"🗃️ Prediction cache: {len(raw_texts)} texts, {len(first_idx)} unique, {len(todo)} scored"
+        )
+        mh_preds = [entries[k]["label"] for k in keys]
+        sent_preds = [entries[k]["sentiment"] for k in keys]
+        return mh_preds, sent_preds
+
+
+# -------------------------------------------------------------
+# Factory — predictor configured from components.pipeline.config
+# -------------------------------------------------------------
+def build_predictor(**overrides) -> MetaModelPredictor:
+    from components.pipeline import config
+
+    kwargs = dict(
+        transformer_model_dir=config.MH_MODEL_DIR,
+        sent_model_path=config.SENT_MODEL_PATH,
+        sent_vec_path=config.SENT_VEC_PATH,
+        cache_size=config.PREDICTION_CACHE_SIZE,
+        cache_path=config.PREDICTION_CACHE_PATH,
+        batch_size=config.INFERENCE_BATCH_SIZE,
+        token_budget=config.INFERENCE_TOKEN_BUDGET,
+        scheduler=config.INFERENCE_SCHEDULER,
+        scheduler_max_batch=config.SCHEDULER_MAX_BATCH,
+        scheduler_max_wait_ms=config.SCHEDULER_MAX_WAIT_MS,
+        backend=config.INFERENCE_BACKEND,
+        intra_op_threads=config.INTRA_OP_THREADS,
+        inter_op_threads=config.INTER_OP_THREADS,
+        backend_cache_dir=config.BACKEND_CACHE_DIR,
+        parity_min_agreement=config.BACKEND_PARITY_MIN_AGREEMENT,
+        parity_max_logit_diff=config.BACKEND_PARITY_MAX_LOGIT_DIFF,
+        parity_probes=config.BACKEND_PARITY_PROBES,
+        cascade=config.CASCADE_ENABLED,
+        cascade_model_path=config.CASCADE_MODEL_PATH,
+        cascade_threshold=config.CASCADE_THRESHOLD,
+    )
+    kwargs.update(overrides)
+    return MetaModelPredictor(**kwargs)
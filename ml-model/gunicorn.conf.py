@@ -0,0 +1,64 @@
+# gunicorn.conf.py
+# -------------------------------------------------------------
+# 🧬 Multi-worker serving with models shared across workers
+# -------------------------------------------------------------
+"""
+    gunicorn -c gunicorn.conf.py main:app
+
+The master loads the tokenizer, MentalBERT and the sentiment pickles once,
+then forks the uvicorn workers. Each worker's startup reuses those objects,
+so the weights are shared copy-on-write instead of loaded once per worker.
+Threads, the inference scheduler, the SQLite cache, ONNX sessions and the
+Firestore client are still created per worker, after the fork.
+
+Each worker is a separate process with its own in-memory state:
+
+* Metrics are per worker: a /metrics scrape returns the counters of
+  whichever worker answered it, not the totals of the server.
+* Background jobs (/jobs, /predict/batch) can't be followed across workers,
+  so those endpoints are disabled with more than one worker (JOBS_ENABLED
+  overrides this when the proxy routes sticky). Bulk checkpoints are
+  additionally guarded by a lock file.
+
+Environment:
+    WEB_CONCURRENCY    workers (default 2)
+    BIND               listen address (default 0.0.0.0:8000)
+    PRELOAD_MODELS     0 = every worker loads its own copy
+    INTRA_OP_THREADS   torch threads per worker (default: cores / workers)
+    JOBS_ENABLED       1 = keep the job endpoints on (sticky routing only)
+
+Check the sharing with ``python -m components.memstat <master pid>``. With
+preload on, each worker's private memory should be a small fraction of the
+model size. GET /metrics also reports mh_process_memory_bytes per worker.
+"""
+
+import gc
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+# exported so each worker's config sees the worker count
+os.environ.setdefault("WEB_CONCURRENCY", "2")
+workers = int(os.environ["WEB_CONCURRENCY"])
+worker_class = "uvicorn.workers.UvicornWorker"
+# Model load + warm-up happen in the worker's startup event
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# Split the cores between workers instead of each torch pool claiming all of them
+os.environ.setdefault("INTRA_OP_THREADS", str(max(1, (os.cpu_count() or 1) // workers)))
+
+from components.pipeline import config  # noqa: E402  (reads INTRA_OP_THREADS)
+
+# The app itself is imported per worker: importing main in the master would
+# open the Firestore gRPC channel before fork(), which gRPC does not support.
+preload_app = False
+
+
+def when_ready(server):
+    """Runs in the master before the first worker is forked."""
+    if not config.PRELOAD_MODELS:
+        return
+    from components import train_test_data
+
+    train_test_data.preload(config.MH_MODEL_DIR, config.SENT_MODEL_PATH, config.SENT_VEC_PATH)
+    # Keep the collector from touching (and so copying) the preloaded objects in every worker
+    gc.freeze()
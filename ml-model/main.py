@@ -1,19 +1,30 @@
 # main.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from datetime import datetime
+from typing import List, Optional
 import os
-import numpy as np
+import re
+import asyncio
+import json
+import time
+import uuid
+from contextlib import AsyncExitStack
 
 # Pipeline imports
+from components.pipeline import config
+from components.pipeline import http_client
 from components.pipeline import data_preprocessing
-import components.pipeline.data_extraction as data_extraction
-import components.analysis_plot as analysis_plot
+from components.pipeline import analysis
+from components.pipeline import bulk
+from components.pipeline import executor
+from components.pipeline import jobs
+from components.pipeline import response_format
+from components.pipeline.analysis import to_native
 from components.logger import logger
-from components import train_test_data
-
-# Firestore
-from components.firebase_client import db
+from components import memstat
+from components import metrics
+from components import startup
 
 # CORS
 from fastapi.middleware.cors import CORSMiddleware
@@ -28,116 +39,310 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-ILLNESS_MAP = {
-    0: "Anxiety",
-    1: "Bipolar",
-    2: "Depression",
-    3: "Normal",
-    4: "PTSD",
-}
-
-def to_native(obj):
-    if isinstance(obj, dict):
-        return {k: to_native(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [to_native(v) for v in obj]
-    elif isinstance(obj, np.generic):
-        return obj.item()
-    return obj
-
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-MH_MODEL_DIR = os.path.join(BASE_DIR, "models", "fine_tuned_mentalbert")
-SENT_MODEL_PATH = os.path.join(BASE_DIR, "models", "sentiment_model", "model.pkl")
-SENT_VEC_PATH = os.path.join(BASE_DIR, "models", "sentiment_model", "vectorizer.pkl")
-
-predictor = train_test_data.MetaModelPredictor(
-    transformer_model_dir=MH_MODEL_DIR,
-    sent_model_path=SENT_MODEL_PATH,
-    sent_vec_path=SENT_VEC_PATH,
+# =========================================================
+# 🚦 Startup — models load in the background; /ready reports progress
+# =========================================================
+predictor = None
+readiness = startup.Readiness()
+_startup_task = None
+
+
+def build_predictor():
+    # torch + transformers are imported here, not when main.py is imported
+    from components import train_test_data
+    return train_test_data.build_predictor()
+
+
+async def _load_models():
+    global predictor
+    try:
+        predictor = await startup.warm_start(
+            readiness,
+            build_predictor,
+            loaders={"nltk": data_preprocessing.ensure_nltk_resources},
+        )
+    except Exception:
+        # already logged + reported on /ready; only abort the app when blocking
+        if config.STARTUP_BLOCKING:
+            raise
+
+
+@app.on_event("startup")
+async def start_model_loading():
+    global _startup_task
+    _startup_task = asyncio.create_task(_load_models())
+    if config.STARTUP_BLOCKING:
+        await _startup_task
+
+
+@app.get("/ready")
+async def ready():
+    report = readiness.report()
+    if predictor is not None and predictor.cascade is not None:
+        # how many texts each cascade stage resolved since startup
+        report["cascade"] = predictor.cascade.stats()
+    return JSONResponse(report, status_code=200 if readiness.ready else 503)
+
+
+def require_ready():
+    if not readiness.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Models are still loading." if readiness.error is None else "Model loading failed.",
+            headers={"Retry-After": "5"},
+        )
+
+
+def require_jobs():
+    if not config.JOBS_ENABLED:
+        raise HTTPException(
+            status_code=503,
+            detail="Background jobs are disabled with multiple workers (job state is per worker); "
+                   "use a single-worker instance or set JOBS_ENABLED=1 behind sticky routing.",
+        )
+
+
+@app.on_event("shutdown")
+async def shutdown_resources():
+    await http_client.close_async_session()
+    http_client.close_session()
+    data_preprocessing.shutdown_pool()
+    executor.shutdown_executor()
+
+
+admission = executor.AdmissionController(
+    max_concurrency=config.PIPELINE_CONCURRENCY,
+    max_queue=config.PIPELINE_MAX_QUEUE,
+    queue_timeout=config.PIPELINE_QUEUE_TIMEOUT,
 )
 
+
+# =========================================================
+# 📈 Metrics + per-request timing
+# =========================================================
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    trace = metrics.start_trace()
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+
+    route = request.scope.get("route")
+    metrics.REQUEST_SECONDS.observe(
+        elapsed,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=response.status_code,
+    )
+    if config.SERVER_TIMING_HEADER and trace:
+        # streamed bodies only include the stages that ran before the first byte
+        response.headers["Server-Timing"] = metrics.server_timing(trace, elapsed)
+    return response
+
+
+@metrics.on_collect
+def _collect_runtime_stats():
+    slots = admission.stats()
+    metrics.PIPELINE_SLOTS.set(slots["running"], state="running")
+    metrics.PIPELINE_SLOTS.set(slots["waiting"], state="waiting")
+    metrics.CACHE_HIT_RATIO.set(data_preprocessing.lemma_cache_stats()["hit_rate"], cache="lemmas")
+    if predictor is not None and predictor.cache is not None:
+        metrics.CACHE_HIT_RATIO.set(predictor.cache.stats()["hit_rate"], cache="predictions")
+    if os.path.exists("/proc/self/smaps_rollup"):
+        for kind, value in memstat.read().items():
+            metrics.PROCESS_MEMORY.set(value, kind=kind)
+
+
+if config.METRICS_ENABLED:
+    @app.get("/metrics")
+    async def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 class UserRequest(BaseModel):
     user_id: str
+    # None → config.INCREMENTAL_ANALYSIS
+    incremental: Optional[bool] = None
 
 
 # =========================================================
 # 🚀 Prediction Endpoint (Reddit + Twitter + Spotify)
 # =========================================================
 @app.post("/predict")
-async def predict(req: UserRequest):
+async def predict(req: UserRequest, request: Request, text: str = "raw"):
+    """
+    Accept: application/json (default) → the original response.
+    Accept: application/vnd.neurasense.compact+json or application/msgpack →
+    columnar response (see response_format); ?text=none|raw|cleaned|both
+    picks the text columns it carries.
+    """
     logger.info(f"📩 Received analysis request for user: {req.user_id}")
+    media_type = response_format.negotiate(request.headers.get("accept", ""))
+    if media_type != response_format.JSON and text not in response_format.TEXT_FIELDS:
+        raise HTTPException(status_code=422, detail=f"text must be one of {sorted(response_format.TEXT_FIELDS)}.")
+    require_ready()
 
-    # 🔥 UPDATED — extract with counts
-    extraction = data_extraction.extract_all_sources(req.user_id)
+    try:
+        async with admission.slot(req.user_id):
+            if media_type == response_format.JSON:
+                # 🔥 Return extraction logs for frontend console
+                return await analysis.run_analysis(predictor, req.user_id, incremental_mode=req.incremental)
+            summary = await analysis.run_analysis(
+                predictor, req.user_id, incremental_mode=req.incremental, native=False
+            )
+        body = response_format.encode(response_format.compact(summary, text), media_type)
+        return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
+    except executor.Saturated as e:
+        logger.warning(f"🚦 Rejected {req.user_id}: {e.detail} ({admission.stats()})")
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except analysis.NoDataError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
-    reddit_count = extraction["reddit"]
-    twitter_count = extraction["twitter"]
-    spotify_count = extraction["spotify"]
 
-    raw_items = extraction["items"]
+# =========================================================
+# 📦 Bulk re-analysis (runs as a background job)
+# =========================================================
+class BatchRequest(BaseModel):
+    user_ids: List[str]
+    parallelism: Optional[int] = None
+    incremental: Optional[bool] = None
+    # re-score stored entries too (after a model update)
+    rescore: bool = True
+    # name of a resumable checkpoint under BULK_CHECKPOINT_DIR
+    checkpoint: Optional[str] = None
 
-    logger.info(f"🟠 Reddit extracted: {reddit_count}")
-    logger.info(f"🔵 Twitter extracted: {twitter_count}")
-    logger.info(f"🟢 Spotify extracted: {spotify_count}")
 
-    if not raw_items:
-        raise HTTPException(status_code=404, detail="No social media data found.")
+@app.post("/predict/batch", status_code=202)
+async def predict_batch(req: BatchRequest):
+    require_jobs()
+    require_ready()
+    if not req.user_ids:
+        raise HTTPException(status_code=422, detail="user_ids must not be empty.")
+    if req.parallelism is not None and req.parallelism < 1:
+        raise HTTPException(status_code=422, detail="parallelism must be at least 1.")
+    if req.checkpoint is not None and not re.fullmatch(r"[A-Za-z0-9_.-]{1,64}", req.checkpoint):
+        raise HTTPException(status_code=422, detail="checkpoint must be a simple name.")
 
-    raw_texts = [item["text"] for item in raw_items]
-    timestamps = [item["timestamp"] for item in raw_items]
+    checkpoint_path = (
+        os.path.join(config.BULK_CHECKPOINT_DIR, f"{req.checkpoint}.json") if req.checkpoint else None
+    )
 
-    clean_texts = data_preprocessing.clean_text_batch_v2(raw_texts)
-    mh_preds, sent_preds = predictor.predict_dual(raw_texts, clean_texts)
+    user_ids = list(dict.fromkeys(req.user_ids))
+    if req.checkpoint:
+        # one bulk run per checkpoint at a time; the same request attaches to it
+        key = f"bulk:{req.checkpoint}"
+        running = job_manager.active(key)
+        if running is not None and running.params.get("user_ids") != user_ids:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Checkpoint {req.checkpoint!r} is in use by job {running.id} with other users.",
+            )
+    else:
+        key = f"bulk:{uuid.uuid4().hex}"
 
-    text_level_analysis = []
-    for raw, clean, mh, sent, ts in zip(raw_texts, clean_texts, mh_preds, sent_preds, timestamps):
-        text_level_analysis.append({
-            "raw_text": raw,
-            "cleaned_text": clean,
-            "prediction_value": int(mh),
-            "prediction_label": ILLNESS_MAP.get(int(mh), "Unknown"),
-            "sentiment": float(sent),
-            "timestamp": ts,
-        })
+    async def runner(progress):
+        return await bulk.run_bulk(
+            predictor,
+            user_ids,
+            parallelism=req.parallelism,
+            incremental_mode=req.incremental,
+            rescore=req.rescore,
+            checkpoint_path=checkpoint_path,
+            progress=progress,
+            admission=admission,
+        )
 
-    python_dates = [datetime.fromtimestamp(ts / 1000) for ts in timestamps]
+    job, attached = job_manager.submit(key, runner, params={"user_ids": user_ids})
+    logger.info(f"📦 Bulk job {job.id} for {len(req.user_ids)} users ({'attached' if attached else 'started'})")
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "attached": attached,
+        "users": len(user_ids),
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+    }
 
-    date_grouped_analysis = analysis_plot.prepare_date_grouped_analysis(
-        python_dates, mh_preds, sent_preds
-    )
 
-    mode_label, mode_prob = analysis_plot.calculate_most_probable_illness(
-        mh_preds, normal_label=3, threshold=0.4
-    )
+# =========================================================
+# 📡 Streaming prediction (NDJSON, one record per line)
+# =========================================================
+@app.post("/predict/stream")
+async def predict_stream(req: UserRequest):
+    logger.info(f"📩 Received streaming analysis request for user: {req.user_id}")
+    require_ready()
 
-    most_probable_illness = (
-        ILLNESS_MAP.get(int(mode_label), "Normal")
-        if isinstance(mode_label, (int, np.integer))
-        else str(mode_label)
-    )
+    # Admission happens before the response starts so 429/503 are still real
+    # status codes; the slot is held until the stream ends.
+    stack = AsyncExitStack()
+    try:
+        await stack.enter_async_context(admission.slot(req.user_id))
+    except executor.Saturated as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    async def body():
+        try:
+            async for record in analysis.stream_analysis(predictor, req.user_id, incremental_mode=req.incremental):
+                yield json.dumps(to_native(record)) + "\n"
+        finally:
+            await stack.aclose()
 
-    db.collection("users").document(req.user_id).update({
-        "most_probable_condition": most_probable_illness,
-        "mode_probability": float(mode_prob) if mode_prob else None,
-        "mental_health_preds": [int(v) for v in mh_preds],
-        "sentiment_preds": [float(v) for v in sent_preds],
-        "recent_text_insights": text_level_analysis,
-        "last_analysis_run": datetime.now().isoformat(),
-    })
-
-    logger.info(f"✅ Analysis completed & saved for {req.user_id}")
-
-    # 🔥 Return extraction logs for frontend console
-    return to_native({
-        "text_level_analysis": text_level_analysis,
-        "date_grouped_analysis": date_grouped_analysis,
-        "most_probable_illness": most_probable_illness,
-        "mode_probability": float(mode_prob) if mode_prob else None,
-        "mental_health_preds": [int(v) for v in mh_preds],
-        "sentiment_preds": [float(v) for v in sent_preds],
-        "extraction_logs": {
-            "reddit": reddit_count,
-            "twitter": twitter_count,
-            "spotify": spotify_count
-        }
-    })
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+# =========================================================
+# 📨 Background analysis jobs (+ SSE progress)
+# =========================================================
+job_manager = jobs.JobManager()
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(req: UserRequest):
+    require_jobs()
+    require_ready()
+
+    async def runner(progress):
+        async with admission.slot(req.user_id):
+            return await analysis.run_analysis(
+                predictor, req.user_id, incremental_mode=req.incremental, progress=progress
+            )
+
+    job, attached = job_manager.submit(req.user_id, runner)
+    logger.info(f"📨 Job {job.id} for {req.user_id} ({'attached' if attached else 'started'})")
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "attached": attached,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    require_jobs()
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job.snapshot()
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    require_jobs()
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return StreamingResponse(
+        job_manager.sse(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
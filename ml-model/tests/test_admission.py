@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from components.pipeline.executor import AdmissionController, Saturated
+
+
+async def _hold(admission, key, started, release):
+    async with admission.slot(key):
+        started.set()
+        await release.wait()
+
+
+def _status(coro):
+    async def run():
+        with pytest.raises(Saturated) as exc:
+            await coro
+        return exc.value
+
+    return run()
+
+
+def test_second_request_for_a_running_user_gets_429():
+    async def scenario():
+        admission = AdmissionController(max_concurrency=4, max_queue=4, queue_timeout=1)
+        started, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.ensure_future(_hold(admission, "u1", started, release))
+        await started.wait()
+        rejected = await _status(_hold(admission, "u1", asyncio.Event(), release))
+        release.set()
+        await holder
+        return rejected
+
+    rejected = asyncio.run(scenario())
+    assert rejected.status_code == 429
+    assert rejected.retry_after >= 1
+
+
+def test_full_queue_gets_503_and_queued_requests_run_when_a_slot_frees():
+    async def scenario():
+        admission = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=5)
+        release = asyncio.Event()
+        first, queued = asyncio.Event(), asyncio.Event()
+        running = asyncio.ensure_future(_hold(admission, "u1", first, release))
+        await first.wait()
+        waiting = asyncio.ensure_future(_hold(admission, "u2", queued, release))
+        await asyncio.sleep(0)
+        assert admission.stats()["waiting"] == 1
+
+        rejected = await _status(_hold(admission, "u3", asyncio.Event(), release))
+        release.set()
+        await asyncio.gather(running, waiting)
+        return rejected, queued.is_set(), admission.stats()
+
+    rejected, queued_ran, stats = asyncio.run(scenario())
+    assert rejected.status_code == 503
+    assert queued_ran
+    assert stats["running"] == stats["waiting"] == 0
+
+
+def test_queue_timeout_gets_503_and_frees_the_user():
+    async def scenario():
+        admission = AdmissionController(max_concurrency=1, max_queue=4, queue_timeout=0.05)
+        started, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.ensure_future(_hold(admission, "u1", started, release))
+        await started.wait()
+        timed_out = await _status(_hold(admission, "u2", asyncio.Event(), release))
+        release.set()
+        await holder
+        # u2 is not left marked as running
+        retried = asyncio.Event()
+        await _hold(admission, "u2", retried, release)
+        return timed_out, retried.is_set()
+
+    timed_out, retried = asyncio.run(scenario())
+    assert timed_out.status_code == 503
+    assert retried
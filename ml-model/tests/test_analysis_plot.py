@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import numpy as np
+
+from components import analysis_plot
+
+
+def _columns(rows):
+    return [datetime(2024, 1, day, 12) for day, _, _ in rows], [mh for _, mh, _ in rows], [s for _, _, s in rows]
+
+
+# label 4 is seen first on both days, but 1 ties with it
+TIED = [(1, 4, 0.0), (1, 1, 1.0), (1, 4, 2.0), (1, 1, 0.0), (2, 4, 1.0), (2, 1, 1.0)]
+
+
+def test_full_and_incremental_paths_break_ties_the_same_way():
+    dates, mh, sent = _columns(TIED)
+    full = analysis_plot.prepare_date_grouped_analysis(dates, mh, sent)
+    agg = analysis_plot.DailyAggregator().add(dates, mh, sent)
+    stored = analysis_plot.DailyAggregator(agg.to_dict())
+
+    assert [d["mental_health_mode"] for d in full] == [1, 1]
+    assert stored.date_grouped() == full
+    assert stored.most_probable_illness(normal_label=3, threshold=0.4) == \
+        analysis_plot.calculate_most_probable_illness(mh, normal_label=3, threshold=0.4) == (1, 0.5)
+
+
+def test_resum_keeps_sentiment_sums_free_of_drift():
+    rng = np.random.default_rng(0)
+    kept = [(1 + i % 3, int(rng.integers(0, 5)), float(rng.random())) for i in range(30)]
+    agg = analysis_plot.DailyAggregator().add(*_columns(kept))
+    for _ in range(200):
+        # one item in, the oldest out: what a capped incremental run does
+        new = (1 + int(rng.integers(0, 3)), int(rng.integers(0, 5)), float(rng.random()))
+        old, kept = kept[0], kept[1:] + [new]
+        agg = analysis_plot.DailyAggregator(agg.to_dict()).add(*_columns([new])).remove(*_columns([old]))
+        dates, _, sent = _columns(kept)
+        agg.resum(dates, sent, _columns([new, old])[0])
+
+    assert agg.date_grouped() == analysis_plot.prepare_date_grouped_analysis(*_columns(kept))
@@ -0,0 +1,35 @@
+import asyncio
+
+from components.pipeline import http_client
+
+
+async def _session():
+    session = http_client.get_async_session()
+    assert http_client.get_async_session() is session
+    return session
+
+
+def test_run_closes_the_loops_session():
+    session = http_client.run(_session())
+    assert session.closed
+    assert len(http_client._async_sessions) == 0
+
+
+def test_each_loop_gets_its_own_session():
+    async def both():
+        first = await _session()
+        await http_client.close_async_session()
+        return first, await _session()
+
+    first, second = http_client.run(both())
+    assert first is not second
+    assert first.closed and second.closed
+
+
+def test_sessions_of_loops_closed_without_cleanup_are_dropped():
+    loop = asyncio.new_event_loop()
+    leaked = loop.run_until_complete(_session())
+    loop.close()
+    http_client.run(_session())
+    assert loop not in http_client._async_sessions
+    asyncio.run(leaked.close())
@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("firebase_admin")
+pytest.importorskip("praw")
+
+from components.pipeline import analysis, data_extraction, incremental  # noqa: E402
+
+
+def _run(state, items, saved):
+    """One incremental finish_analysis pass over `items`; the saved entries become the next state."""
+    scored = analysis.to_entries(items, [i["text"] for i in items], [3] * len(items), [0.5] * len(items))
+    ctx = {
+        "user_id": "u1",
+        "state": state,
+        "raw_items": items,
+        "timed_out": [],
+        "extraction_logs": {},
+        "cached": False,
+    }
+
+    def save(user_id, summary, watermarks, stored):
+        saved.append(summary["text_level_analysis"])
+
+    summary = analysis.finish_analysis(ctx, scored, save=save)
+    return summary, {"watermarks": state["watermarks"], "items": saved[-1], "stored": {}}
+
+
+def test_fallback_entries_are_never_stored_across_runs():
+    state, saved = {"watermarks": {}, "items": [], "stored": {}}, []
+    for run in range(3):
+        items = data_extraction.fallback_data()
+        for item in items:
+            item["timestamp"] += run  # each run sees fresh "now" timestamps
+        summary, state = _run(state, items, saved)
+        assert len(summary["text_level_analysis"]) == 2
+    assert saved == [[], [], []]
+
+
+def test_real_items_replace_fallback_and_dedupe():
+    state, saved = {"watermarks": {}, "items": [], "stored": {}}, []
+    _, state = _run(state, data_extraction.fallback_data(), saved)
+    post = {"source": "reddit", "text": "first post", "timestamp": 1000}
+    _, state = _run(state, [post], saved)
+    _, state = _run(state, [dict(post)], saved)
+    assert [e["raw_text"] for e in state["items"]] == ["first post"]
+
+
+def test_merge_items_drops_stored_fallback():
+    stored = [{"source": "fallback", "timestamp": 5, "raw_text": "x"}]
+    fresh = [{"source": "reddit", "timestamp": 1, "raw_text": "y"}]
+    assert incremental.merge_items(stored, fresh, 10) == fresh
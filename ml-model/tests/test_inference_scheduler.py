@@ -0,0 +1,85 @@
+import contextvars
+import threading
+
+import numpy as np
+import pytest
+
+from components import metrics
+from components.inference_scheduler import InferenceScheduler
+
+
+def _rows(texts):
+    return np.array([[len(t)] for t in texts])
+
+
+def test_concurrent_requests_share_batches_and_get_their_own_rows():
+    batches = []
+
+    def infer(texts):
+        batches.append(len(texts))
+        return _rows(texts)
+
+    scheduler = InferenceScheduler(infer, max_batch_size=64, max_wait_ms=200)
+    try:
+        requests = [["x" * (i + 1)] * 3 for i in range(8)]
+        futures = [scheduler.submit(texts) for texts in requests]
+        for texts, future in zip(requests, futures):
+            assert future.result(timeout=5).tolist() == _rows(texts).tolist()
+    finally:
+        scheduler.close()
+    assert sum(batches) == 24
+    assert len(batches) < len(requests)
+    assert scheduler.stats()["requests"] == 8
+
+
+def test_batches_stop_at_max_batch_size():
+    batches = []
+    release = threading.Event()
+
+    def infer(texts):
+        release.wait(5)
+        batches.append(len(texts))
+        return _rows(texts)
+
+    scheduler = InferenceScheduler(infer, max_batch_size=4, max_wait_ms=50)
+    try:
+        futures = [scheduler.submit(["a", "b"]) for _ in range(5)]
+        release.set()
+        for future in futures:
+            future.result(timeout=5)
+    finally:
+        scheduler.close()
+    assert sum(batches) == 10
+    assert max(batches) <= 4
+
+
+def test_failures_reach_every_caller_in_the_batch():
+    def infer(texts):
+        raise RuntimeError("boom")
+
+    scheduler = InferenceScheduler(infer, max_wait_ms=50)
+    try:
+        futures = [scheduler.submit(["a"]), scheduler.submit(["b"])]
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result(timeout=5)
+    finally:
+        scheduler.close()
+
+
+def test_batch_stage_times_land_in_the_callers_trace():
+    def infer(texts):
+        with metrics.stage("forward"):
+            return _rows(texts)
+
+    def call():
+        trace = metrics.start_trace()
+        scheduler.infer(["hello"])
+        return trace
+
+    scheduler = InferenceScheduler(infer, max_wait_ms=1)
+    try:
+        trace = contextvars.Context().run(call)
+    finally:
+        scheduler.close()
+    assert "forward" in trace
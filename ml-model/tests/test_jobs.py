@@ -0,0 +1,41 @@
+import asyncio
+import json
+
+from components.pipeline import config, jobs
+
+
+def _events(lines):
+    return [json.loads(line.split("data: ", 1)[1]) for line in lines if "data: " in line]
+
+
+def test_events_are_bounded_and_sse_resumes_by_sequence(monkeypatch):
+    monkeypatch.setattr(config, "JOB_MAX_EVENTS", 5)
+
+    async def scenario():
+        manager = jobs.JobManager()
+        release = asyncio.Event()
+
+        async def runner(progress):
+            for i in range(20):
+                progress("scored", {"done": i})
+            await release.wait()
+            return {"ok": True}
+
+        job, _ = manager.submit("u1", runner)
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(_collect(manager.sse(job)))
+        await asyncio.sleep(0.01)
+        release.set()
+        return job, await asyncio.wait_for(follower, 5)
+
+    async def _collect(stream):
+        return [line async for line in stream]
+
+    job, lines = asyncio.run(scenario())
+    events = _events(lines)
+    assert len(job.events) == 5
+    assert job.seq == 22  # started + 20 scored + done
+    seqs = [e["seq"] for e in events]
+    assert seqs == sorted(seqs) and len(set(seqs)) == len(seqs)
+    assert events[-1]["stage"] == "done" and events[-1]["result"] == {"ok": True}
+    assert job.progress["scored"] == {"done": 19}
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from components.pipeline import data_preprocessing, offline_scoring
+
+
+class _Predictor:
+    def predict_dual(self, raw, clean):
+        return [len(t) % 4 for t in raw], [0.5] * len(raw)
+
+
+def _rows(n):
+    return [{"id": i, "text": f"r{i}"} for i in range(n)]
+
+
+def test_resume_groups_keeps_everything_after_the_first_group_past_skip():
+    # uneven groups: rows 0-99, 100-149, 150-159
+    assert offline_scoring._resume_groups([100, 50, 10], 0) == ([0, 1, 2], 0)
+    assert offline_scoring._resume_groups([100, 50, 10], 100) == ([1, 2], 0)
+    assert offline_scoring._resume_groups([100, 50, 10], 120) == ([1, 2], 20)
+    assert offline_scoring._resume_groups([100, 50, 10], 155) == ([2], 5)
+    assert offline_scoring._resume_groups([100, 50, 10], 160) == ([], 0)
+
+
+def test_parquet_resume_over_uneven_row_groups(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    path = str(tmp_path / "in.parquet")
+    rows = _rows(160)
+    with pq.ParquetWriter(path, pa.Table.from_pylist(rows[:1]).schema) as writer:
+        for lo, hi in ((0, 100), (100, 150), (150, 160)):
+            writer.write_table(pa.Table.from_pylist(rows[lo:hi]))
+
+    chunks = list(offline_scoring.iter_chunks(path, "parquet", 32, skip=120))
+    got = [r["text"] for chunk in chunks for r in chunk]
+    assert got == [f"r{i}" for i in range(120, 160)]
+
+
+def test_jsonl_checkpoint_resume_matches_a_single_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_preprocessing, "clean_text_batch_v2", lambda texts, workers=None: list(texts))
+    src = tmp_path / "in.jsonl"
+    src.write_text("".join(json.dumps(r) + "\n" for r in _rows(25)))
+
+    full = tmp_path / "full.jsonl"
+    offline_scoring.score_file(_Predictor(), str(src), str(full), id_field="id", chunk_size=10, workers=0)
+
+    out, ckpt = tmp_path / "out.jsonl", str(tmp_path / "ckpt.json")
+    first = offline_scoring.score_file(_Predictor(), str(src), str(out), id_field="id", chunk_size=10,
+                                       workers=0, checkpoint_path=ckpt, limit=10)
+    assert first["rows_done"] == 10
+    with open(out, "a") as f:
+        f.write('{"row": 10, "partial')  # interrupted mid-write
+    offline_scoring.score_file(_Predictor(), str(src), str(out), id_field="id", chunk_size=10,
+                               workers=0, checkpoint_path=ckpt)
+
+    assert out.read_text() == full.read_text()
@@ -0,0 +1,54 @@
+import numpy as np
+
+from components.prediction_cache import PredictionCache, normalize_text
+from components.train_test_data import MetaModelPredictor
+
+
+def _entry(label):
+    return {"label": label, "logits": [0.0, float(label)], "sentiment": 0.5}
+
+
+def test_keys_ignore_whitespace_but_not_model_version():
+    cache = PredictionCache("v1")
+    assert normalize_text("  so\ttired \n today ") == "so tired today"
+    assert cache.key("so tired  today") == cache.key(" so tired today")
+    assert cache.key("so tired today") != PredictionCache("v2").key("so tired today")
+
+
+def test_memory_tier_is_a_bounded_lru():
+    cache = PredictionCache("v1", max_items=2)
+    cache.put_many({"a": _entry(0), "b": _entry(1)})
+    cache.get_many(["a"])  # b is now least recently used
+    cache.put_many({"c": _entry(1)})
+    assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
+    assert cache.stats()["misses"] == 1
+
+
+def test_disk_tier_survives_restarts_and_purges_other_versions(tmp_path):
+    path = str(tmp_path / "predictions.sqlite")
+    cache = PredictionCache("v1", max_items=0, disk_path=path)
+    cache.put_many({"a": _entry(1)})
+    cache.close()
+
+    reopened = PredictionCache("v1", disk_path=path)
+    assert reopened.get_many(["a"]) == {"a": _entry(1)}
+    assert reopened.stats()["disk_hits"] == 1
+    reopened.close()
+
+    assert PredictionCache("v2", disk_path=path).purge_stale() == 1
+
+
+def test_predictor_only_scores_unique_cache_misses():
+    predictor = MetaModelPredictor.__new__(MetaModelPredictor)
+    predictor.cache = PredictionCache("v1")
+    scored = []
+
+    def score(raw, clean):
+        scored.append(list(raw))
+        return np.array([[0.0, 1.0]] * len(raw)), [0.25] * len(raw)
+
+    predictor._score = score
+    raw = ["a", "b", "a"]
+    assert predictor._predict_dual_cached(raw, raw) == ([1, 1, 1], [0.25, 0.25, 0.25])
+    assert predictor._predict_dual_cached(["b", "c"], ["b", "c"]) == ([1, 1], [0.25, 0.25])
+    assert scored == [["a", "b"], ["c"]]
@@ -0,0 +1,63 @@
+import json
+
+import numpy as np
+import pytest
+
+from components.pipeline import response_format as rf
+
+SUMMARY = {
+    "text_level_analysis": [
+        {"raw_text": "a", "cleaned_text": "a", "prediction_value": np.int64(1), "prediction_label": "Bipolar",
+         "sentiment": np.float32(0.5), "timestamp": 2000, "source": "reddit"},
+        {"raw_text": "b", "cleaned_text": "b", "prediction_value": 3, "prediction_label": "Normal",
+         "sentiment": 1.0, "timestamp": 1000, "source": "twitter"},
+        {"raw_text": "c", "cleaned_text": "c", "prediction_value": 1, "prediction_label": "Bipolar",
+         "sentiment": 0.0, "timestamp": 500, "source": "reddit"},
+    ],
+    "date_grouped_analysis": [
+        {"date": "1970-01-01", "mental_health_mode": np.int64(1), "mental_health_count": 2, "sentiment_avg": 0.5},
+    ],
+    "most_probable_illness": "Bipolar",
+    "mode_probability": 0.66,
+    "mental_health_preds": [1, 3, 1],
+    "sentiment_preds": [0.5, 1.0, 0.0],
+    "extraction_logs": {"reddit": 2, "twitter": 1},
+}
+
+
+def test_negotiate_honours_q_values_and_defaults_to_json():
+    assert rf.negotiate(None) == rf.JSON
+    assert rf.negotiate("text/html") == rf.JSON
+    assert rf.negotiate(rf.COMPACT_JSON) == rf.COMPACT_JSON
+    assert rf.negotiate(f"{rf.COMPACT_JSON};q=0.5, application/json") == rf.JSON
+
+
+def test_compact_is_columnar_and_drops_duplicate_prediction_lists():
+    payload = rf.compact(SUMMARY, text="none")
+    assert payload["sources"] == ["reddit", "twitter"]
+    assert payload["texts"] == {
+        "label": [1, 3, 1],
+        "sentiment": [0.5, 1.0, 0.0],
+        "timestamp": [2000, 1000, 500],
+        "source": [0, 1, 0],
+    }
+    assert payload["labels"][1] == "Bipolar"
+    assert "mental_health_preds" not in payload and "sentiment_preds" not in payload
+    assert rf.compact(SUMMARY, text="both")["texts"]["cleaned_text"] == ["a", "b", "c"]
+    with pytest.raises(ValueError):
+        rf.compact(SUMMARY, text="all")
+
+
+def test_compact_json_round_trips_without_a_to_native_pass():
+    body = rf.encode(rf.compact(SUMMARY), rf.COMPACT_JSON)
+    decoded = json.loads(body)
+    assert decoded["texts"]["raw_text"] == ["a", "b", "c"]
+    assert decoded["dates"]["mental_health_mode"] == [1]
+    assert len(body) < len(json.dumps(SUMMARY, default=float))
+
+
+def test_msgpack_round_trip():
+    msgpack = pytest.importorskip("msgpack")
+    payload = rf.compact(SUMMARY)
+    assert rf.negotiate("application/x-msgpack") == rf.MSGPACK
+    assert msgpack.unpackb(rf.encode(payload, rf.MSGPACK), raw=False) == json.loads(rf.encode(payload, rf.COMPACT_JSON))
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("firebase_admin")
+pytest.importorskip("praw")
+
+from components.pipeline import analysis, async_extraction, insight_store  # noqa: E402
+
+
+class _Predictor:
+    def predict_dual(self, raw, clean):
+        return [len(t) % 5 for t in raw], [(len(t) % 3) / 2 for t in raw]
+
+
+class _Ref:
+    def __init__(self, path):
+        self.path = path
+
+    def collection(self, name):
+        return _Ref(f"{self.path}/{name}")
+
+    def document(self, doc_id):
+        return _Ref(f"{self.path}/{doc_id}")
+
+
+def _extraction(pages):
+    async def extract(user_id, since=None, on_items=None):
+        for page in pages:
+            await on_items(page)
+        return {"reddit": sum(map(len, pages)), "twitter": 0, "spotify": 0, "timed_out": [], "rate_limited": [],
+                "items": [i for p in pages for i in p]}
+
+    return extract
+
+
+def _stream(**kwargs):
+    async def run():
+        return [r async for r in analysis.stream_analysis(_Predictor(), "u1", chunk_size=4, **kwargs)]
+
+    return asyncio.run(asyncio.wait_for(run(), 10))
+
+
+def _page(start, n):
+    return [{"source": "reddit", "text": "post " * (i % 4 + 1) + str(i), "timestamp": 1_700_000_000_000 + i * 3_600_000}
+            for i in range(start, start + n)]
+
+
+@pytest.fixture
+def committed(monkeypatch):
+    ops = []
+    monkeypatch.setattr(analysis, "clean_texts_of", lambda items: [i["text"] for i in items])
+    monkeypatch.setattr(insight_store, "db", _Ref(""))
+    monkeypatch.setattr(insight_store, "stored_fingerprints", lambda user_id: {"stale": "x"})
+    monkeypatch.setattr(insight_store, "_commit", ops.extend)
+    return ops
+
+
+def test_full_run_streams_before_extraction_ends_and_saves_every_chunk(monkeypatch, committed):
+    pages = [_page(0, 5), _page(5, 7), _page(12, 3)]
+    more = asyncio.Event()
+
+    async def extract(user_id, since=None, on_items=None):
+        await on_items(pages[0])
+        await more.wait()  # the first texts must be out before the rest is fetched
+        for page in pages[1:]:
+            await on_items(page)
+        return {"reddit": 15, "twitter": 0, "spotify": 0, "timed_out": [], "rate_limited": [],
+                "items": [i for p in pages for i in p]}
+
+    monkeypatch.setattr(async_extraction, "extract_all_sources_async", extract)
+
+    async def run():
+        records = []
+        async for record in analysis.stream_analysis(_Predictor(), "u1", incremental_mode=False, chunk_size=4):
+            records.append(record)
+            more.set()
+        return records
+
+    records = asyncio.run(asyncio.wait_for(run(), 10))
+    texts = [r for r in records if r["type"] == "text"]
+    assert [r["type"] for r in records[-2:]] == ["extraction", "summary"]
+    assert len(texts) == 15
+
+    expected = analysis.summarize(analysis.to_entries(
+        [i for p in pages for i in p], [i["text"] for p in pages for i in p],
+        *_Predictor().predict_dual([i["text"] for p in pages for i in p], [])))
+    summary = records[-1]
+    assert summary["count"] == 15
+    assert summary["date_grouped_analysis"] == analysis.to_native(expected["date_grouped_analysis"])
+    assert summary["most_probable_illness"] == expected["most_probable_illness"]
+    assert summary["mode_probability"] == pytest.approx(expected["mode_probability"])
+
+    kinds = [op for op, _, _ in committed]
+    assert kinds.count("set") == 15
+    assert kinds[-2:] == ["delete", "update"]
+    assert committed[-1][2]["insight_count"] == 15
+
+
+def test_incremental_run_streams_new_texts_then_the_kept_stored_ones(monkeypatch, committed):
+    stored = analysis.to_entries(_page(0, 3), [i["text"] for i in _page(0, 3)], [1, 1, 2], [0.5] * 3)
+    state = {"watermarks": {"reddit": stored[-1]["timestamp"]}, "items": stored, "aggregates": None, "stored": {}}
+
+    async def load_state(user_id, incremental_mode=None):
+        return state
+
+    monkeypatch.setattr(analysis, "_load_state", load_state)
+    monkeypatch.setattr(async_extraction, "extract_all_sources_async", _extraction([_page(0, 6)]))
+    records = _stream(incremental_mode=True)
+
+    new = [r for r in records if r["type"] == "text" and not r.get("stored")]
+    kept = [r for r in records if r.get("stored")]
+    assert [r["raw_text"] for r in new] == [i["text"] for i in _page(3, 3)]
+    assert [r["raw_text"] for r in kept] == [e["raw_text"] for e in reversed(stored)]  # newest first
+    assert records[-1]["count"] == 6
+    assert records[-1]["incremental"] == {"new_items": 3, "cached": False}
+
+
+def test_full_run_without_items_streams_fallback_but_stores_nothing(monkeypatch, committed):
+    monkeypatch.setattr(async_extraction, "extract_all_sources_async", _extraction([]))
+    records = _stream(incremental_mode=False)
+
+    assert [r["source"] for r in records if r["type"] == "text"] == ["fallback", "fallback"]
+    assert records[-1]["count"] == 2
+    assert [op for op, _, _ in committed] == ["delete", "update"]
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from components.pipeline import config, upstream
+
+
+class _Response:
+    def __init__(self, status, body=None, headers=None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+    async def json(self, content_type=None):
+        return self.body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _Session:
+    """Replays canned responses and records the headers of every GET."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    def get(self, url, headers=None):
+        self.sent.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+@pytest.fixture(autouse=True)
+def _fast_retries(monkeypatch):
+    monkeypatch.setattr(config, "HTTP_MAX_RETRIES", 2)
+    monkeypatch.setattr(config, "HTTP_BACKOFF_BASE", 0.001)
+    monkeypatch.setattr(config, "HTTP_BACKOFF_MAX", 0.001)
+    monkeypatch.setattr(config, "HTTP_MAX_RETRY_WAIT", 1.0)
+    monkeypatch.setattr(upstream, "cache", upstream.ResponseCache(ttl=60, stale_ttl=600, max_items=16))
+    monkeypatch.setattr(upstream, "_buckets", {})
+
+
+def _fetch(session, source="test"):
+    return asyncio.run(upstream.fetch_json(session, "https://api.test/x", {"Authorization": "Bearer t"}, source))
+
+
+def test_5xx_and_429_are_retried_until_success():
+    session = _Session(
+        _Response(503),
+        _Response(429, headers={"Retry-After": "0"}),
+        _Response(200, {"ok": 1}),
+    )
+    assert _fetch(session) == {"ok": 1}
+    assert len(session.sent) == 3
+
+
+def test_gives_up_after_max_retries():
+    session = _Session(*[_Response(500) for _ in range(3)])
+    assert _fetch(session) == {}
+    assert len(session.sent) == 3
+
+
+def test_persistent_429_raises_rate_limited():
+    session = _Session(*[_Response(429, headers={"Retry-After": "0"}) for _ in range(3)])
+    with pytest.raises(upstream.RateLimited) as exc:
+        _fetch(session)
+    assert exc.value.cached is None
+
+
+def test_fresh_bodies_are_served_from_cache():
+    session = _Session(_Response(200, {"ok": 1}))
+    assert _fetch(session) == _fetch(session) == {"ok": 1}
+    assert len(session.sent) == 1
+
+
+def test_expired_bodies_are_revalidated_with_their_etag(monkeypatch):
+    monkeypatch.setattr(upstream.cache, "ttl", 0)
+    session = _Session(
+        _Response(200, {"ok": 1}, {"ETag": '"v1"', "Last-Modified": "Wed, 01 May 2024 00:00:00 GMT"}),
+        _Response(304),
+    )
+    assert _fetch(session) == {"ok": 1}
+    assert _fetch(session) == {"ok": 1}
+    assert session.sent[1]["If-None-Match"] == '"v1"'
+    assert session.sent[1]["If-Modified-Since"] == "Wed, 01 May 2024 00:00:00 GMT"
+
+
+def test_rate_limited_carries_the_stale_body(monkeypatch):
+    monkeypatch.setattr(upstream.cache, "ttl", 0)
+    session = _Session(
+        _Response(200, {"ok": 1}),
+        *[_Response(429, headers={"Retry-After": "0"}) for _ in range(3)],
+    )
+    _fetch(session)
+    with pytest.raises(upstream.RateLimited) as exc:
+        _fetch(session)
+    assert exc.value.cached == {"ok": 1}
+
+
+def test_retry_after_understands_seconds_and_reset_headers():
+    assert upstream.retry_after({"Retry-After": "7"}) == 7.0
+    assert upstream.retry_after({"x-ratelimit-reset": "12"}) == 12.0
+    assert upstream.retry_after({"x-ratelimit-reset": "12"}, reset_headers=False) is None